@@ -1,9 +1,36 @@
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from ninja import NinjaAPI
+
 from apps.core.api import router as content_router
 from apps.user.api import router as user_router
 from apps.payments.api import router as payments_router
+from tools.renderers import JSON, content_type, negotiate
+
+
+class API(NinjaAPI):
+    # JSON through orjson, MessagePack when the client asks for it in Accept
+    def create_response(self, request, data, *, status=None, temporal_response=None):
+        if temporal_response:
+            status = temporal_response.status_code
+        assert status
+
+        renderer = negotiate(request)
+
+        response = temporal_response or self.create_temporal_response(request)
+        response.status_code = status
+        response.content = renderer.render(request, data, response_status=status)
+
+        response["Content-Type"] = content_type(renderer)
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    def create_temporal_response(self, request):
+        renderer = negotiate(request)
+        return HttpResponse("", content_type=content_type(renderer))
+
 
-api = NinjaAPI(docs_url="docs/", csrf=False)
+api = API(docs_url="docs/", csrf=False, renderer=JSON)
 
 api.add_router("/payments/", payments_router)
 api.add_router("/content/", content_router)
@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import TopicForm, TopicImportForm
+from .importer import import_topics
 from .models import Subject, Grade, Topic
-from .forms import TopicForm
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
@@ -24,3 +28,39 @@ class TopicAdmin(admin.ModelAdmin):
     search_fields = ['name', 'grade']
     ordering = ['name']
     autocomplete_fields = ['grade']
+
+    def get_urls(self):
+        urls = [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="core_topic_import",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        form = TopicImportForm(request.POST or None, request.FILES or None)
+        summary = None
+
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                summary = import_topics(
+                    upload.file,
+                    upload.name,
+                    dry_run=form.cleaned_data["dry_run"],
+                    upsert=form.cleaned_data["upsert"],
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "თემების იმპორტი",
+            "form": form,
+            "summary": summary,
+            "dry_run": form.cleaned_data.get("dry_run") if form.is_bound and form.is_valid() else False,
+        }
+        return TemplateResponse(request, "admin/core/topic/import.html", context)
@@ -1,44 +1,200 @@
 # apps/core/router.py
 from ninja import Router
 from typing import List
+import gzip
+
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
 from django.shortcuts import get_object_or_404
+from ninja.errors import HttpError
 
-from apps.user.utils import decode_jwt_token
+from apps.user.utils import decode_jwt_payload, decode_jwt_token
+from tools.pagination import clamp_limit, decode_cursor, encode_cursor
 from ninja.security import HttpBearer
+from .autocomplete import autocomplete
+from .cache import catalog_response, not_modified
 from .models import Subject, Grade, Topic
+from .renditions import image_renditions
+from .search import search
+from .snapshot import get_snapshot, identity_etag
 from .schema import (
     SubjectSchema,
     GradeSchema,
+    TopicSchema,
+    TopicPageSchema,
+    SearchPageSchema,
+    SuggestionSchema,
+    SuccessSchema,
+    TreeGradeSchema,
 )
 
 router = Router()
 
+# sparse fieldsets: ?fields=id,name picks response fields and the columns read for them
+def parse_fields(fields: str, schema) -> list:
+    available = list(schema.model_fields)
+    if not fields:
+        return available
+
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - set(available)
+    if unknown:
+        raise HttpError(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # id is always returned, clients and cursors key on it
+    return [name for name in available if name in selected or name == "id"]
+
+def topic_columns(fields: list) -> list:
+    columns = []
+    for name in fields:
+        if name == "grade":
+            columns += ["grade__id", "grade__level"]
+        elif name != "subjects":
+            columns.append(name)
+    return columns
+
+def topic_data(topic: Topic, fields: list) -> dict:
+    data = {}
+    for name in fields:
+        if name == "grade":
+            data["grade"] = {"id": topic.grade.id, "level": topic.grade.level} if topic.grade else None
+        elif name == "subjects":
+            data["subjects"] = [{"id": s.id, "name": s.name} for s in topic.subjects.all()]
+        elif name == "image" and topic.image:
+            data["image"] = {**topic.image, "renditions": image_renditions(topic.image)}
+        else:
+            data[name] = getattr(topic, name)
+    return data
+
 class AuthBearer(HttpBearer):
+    # catalog data isn't per-account, so a valid signature is enough and
+    # cached responses are served without a database round trip
     def authenticate(self, request, token):
-        account, state = decode_jwt_token(token)
+        payload, state = decode_jwt_payload(token)
 
         if not state:
             return None
 
+        return payload
+
+class AccountAuthBearer(HttpBearer):
+    # mutating routes still load the account, so deleted or disabled ones are refused
+    def authenticate(self, request, token):
+        account, state = decode_jwt_token(token)
+
+        if not state or not account.is_active:
+            return None
+
         return account
 
 @router.get("/subjects/", response=List[SubjectSchema], auth=AuthBearer())
-def list_subjects(request):
-    subjects = Subject.objects.filter(is_active=True)
-    
-    return subjects
+def list_subjects(request, fields: str = None):
+    fields = parse_fields(fields, SubjectSchema)
+
+    def build():
+        return list(Subject.objects.filter(is_active=True).values(*fields))
+
+    return catalog_response(request, f"subjects:{','.join(fields)}", build)
 
 @router.get("/subjects/{subject_id}/", response=SubjectSchema, auth=AuthBearer())
-def get_subject(request, subject_id: int):
-    return get_object_or_404(Subject, id=subject_id)
+def get_subject(request, subject_id: int, fields: str = None):
+    fields = parse_fields(fields, SubjectSchema)
+
+    def build():
+        return get_object_or_404(Subject.objects.values(*fields), id=subject_id)
+
+    return catalog_response(request, f"subject:{subject_id}:{','.join(fields)}", build)
 
-@router.delete("/subjects/{subject_id}/", response={"success": bool}, auth=AuthBearer())
+@router.delete("/subjects/{subject_id}/", response=SuccessSchema, auth=AccountAuthBearer())
 def delete_subject(request, subject_id: int):
     subject = get_object_or_404(Subject, id=subject_id)
     subject.delete()
     return {"success": True}
 
 @router.get("/grades/", response=List[GradeSchema], auth=AuthBearer())
-def list_grades(request):
-    return Grade.objects.all()
+def list_grades(request, fields: str = None):
+    fields = parse_fields(fields, GradeSchema)
+
+    def build():
+        return list(Grade.objects.values(*fields))
+
+    return catalog_response(request, f"grades:{','.join(fields)}", build)
+
+@router.get("/topics/", response=TopicPageSchema, auth=AuthBearer())
+def list_topics(
+    request, grade: int = None, subject: int = None, cursor: str = None, limit: int = 20, fields: str = None
+):
+    limit = clamp_limit(limit)
+    fields = parse_fields(fields, TopicSchema)
+
+    last_id = 0
+    if cursor:
+        position = decode_cursor(cursor, 1)
+        if position is None or not isinstance(position[0], int):
+            raise HttpError(400, "Invalid cursor")
+        last_id = position[0]
+
+    # topics (+ grade join), then one prefetch query for subjects, whatever the page size
+    def build():
+        topics = Topic.objects.filter(id__gt=last_id).only(*topic_columns(fields)).order_by("id")
+
+        if "grade" in fields:
+            topics = topics.select_related("grade")
+        if "subjects" in fields:
+            topics = topics.prefetch_related(Prefetch("subjects", queryset=Subject.objects.only("id", "name")))
+        if grade:
+            topics = topics.filter(grade_id=grade)
+        if subject:
+            topics = topics.filter(subjects__id=subject)
+
+        topics = list(topics[: limit + 1])
+
+        next_cursor = None
+        if len(topics) > limit:
+            topics = topics[:limit]
+            next_cursor = encode_cursor(topics[-1].id)
+
+        return {
+            "results": [topic_data(topic, fields) for topic in topics],
+            "next_cursor": next_cursor,
+        }
+
+    return catalog_response(request, f"topics:{grade}:{subject}:{last_id}:{limit}:{','.join(fields)}", build)
+
+@router.get("/search/", response=SearchPageSchema, auth=AuthBearer())
+def search_catalog(request, q: str, grade: int = None, subject: int = None, page: int = 1, limit: int = 20):
+    query = " ".join(q.split())[:100]
+    if len(query) < 2:
+        raise HttpError(400, "Query is too short")
+
+    limit = clamp_limit(limit)
+    page = max(page, 1)
+    count, results = search(query, grade=grade, subject=subject, offset=(page - 1) * limit, limit=limit)
+
+    return {"count": count, "page": page, "results": results}
+
+@router.get("/autocomplete/", response=List[SuggestionSchema], auth=AuthBearer())
+def autocomplete_catalog(request, q: str, limit: int = 10):
+    return autocomplete.suggest(q[:100], clamp_limit(limit, default=10, maximum=20))
+
+@router.get("/tree/", response=List[TreeGradeSchema], auth=AuthBearer())
+def curriculum_tree(request):
+    # prebuilt gzipped bytes, sent as-is to clients that accept gzip
+    etag, body = get_snapshot()
+    gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+    if not gzipped:
+        etag = identity_etag(etag)
+
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    elif gzipped:
+        response = HttpResponse(body, content_type="application/json; charset=utf-8")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type="application/json; charset=utf-8")
 
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from unidecode import unidecode
+
+from .cache import get_catalog_version
+from .models import Subject, Topic
+
+# how often (seconds) a worker asks the cache whether the catalog changed
+VERSION_CHECK_INTERVAL = 1.0
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def _forms(name: str):
+    georgian = normalize(name)
+    latin = normalize(unidecode(name).replace("`", ""))
+
+    for form in {georgian, latin}:
+        words = form.split(" ")
+        # every word start is a key, so names match from any of their words
+        for i in range(len(words)):
+            yield " ".join(words[i:])
+
+
+class PrefixIndex:
+    # `keys` is sorted, `refs[i]` points key i at its entry in `items`
+    def __init__(self, items: list):
+        pairs = sorted(
+            (key, ref) for ref, (_, _, name) in enumerate(items) for key in _forms(name) if key
+        )
+        self.items = tuple(items)
+        self.keys = tuple(key for key, _ in pairs)
+        self.refs = tuple(ref for _, ref in pairs)
+
+    def lookup(self, prefix: str, limit: int = 10) -> list:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        found = []
+        i = bisect_left(self.keys, prefix)
+
+        while i < len(self.keys) and self.keys[i].startswith(prefix) and len(found) < limit:
+            ref = self.refs[i]
+            if ref not in found:
+                found.append(ref)
+            i += 1
+
+        return [self.items[ref] for ref in found]
+
+
+def build_index() -> PrefixIndex:
+    items = [("subject", pk, name) for pk, name in Subject.objects.filter(is_active=True).values_list("id", "name")]
+    items += [("topic", pk, name) for pk, name in Topic.objects.values_list("id", "name")]
+    return PrefixIndex(items)
+
+
+class Autocomplete:
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_index(self) -> PrefixIndex:
+        now = time.monotonic()
+
+        if self.index is not None and now - self.checked_at < VERSION_CHECK_INTERVAL:
+            return self.index
+
+        version = get_catalog_version()
+        self.checked_at = now
+
+        if self.index is None or version != self.version:
+            with self._lock:
+                if self.index is None or version != self.version:
+                    self.index = build_index()
+                    self.version = version
+
+        return self.index
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        return [
+            {"kind": kind, "id": pk, "name": name}
+            for kind, pk, name in self.get_index().lookup(prefix, limit)
+        ]
+
+
+autocomplete = Autocomplete()
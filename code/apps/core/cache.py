@@ -0,0 +1,64 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from tools.renderers import content_type, negotiate
+
+CATALOG_VERSION_KEY = "content:catalog:version"
+CATALOG_TTL = 60 * 60 * 24
+
+
+def get_catalog_version() -> int:
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # seeded from the clock so an evicted counter never reuses an older version
+        cache.add(CATALOG_VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> int:
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = int(time.time())
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+        return version
+
+
+def not_modified(request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in etags
+
+
+# `build()` runs and is serialized once per catalog version; a matching
+# If-None-Match is answered with 304 straight from the cache entry
+def catalog_response(request, name: str, build) -> HttpResponse:
+    renderer = negotiate(request)
+    key = f"content:catalog:{get_catalog_version()}:{renderer.media_type}:{name}"
+    entry = cache.get(key)
+
+    if entry is None:
+        body = renderer.dumps(build())
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        entry = (etag, body)
+        cache.set(key, entry, timeout=CATALOG_TTL)
+
+    etag, body = entry
+
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=content_type(renderer))
+
+    patch_vary_headers(response, ["Accept"])
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
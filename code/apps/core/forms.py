@@ -18,4 +18,9 @@ class TopicForm(forms.ModelForm):
             "description": TinymceWidget(name="default"),
             "image": ImageWidget(),
             "video": VideoWidget(),
-        }
\ No newline at end of file
+        }
+
+class TopicImportForm(forms.Form):
+    file = forms.FileField(label="ფაილი (CSV ან XLSX)")
+    upsert = forms.BooleanField(required=False, label="არსებული თემების განახლება")
+    dry_run = forms.BooleanField(required=False, initial=True, label="მხოლოდ შემოწმება")
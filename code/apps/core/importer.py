@@ -0,0 +1,189 @@
+import csv
+import io
+import logging
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from tools import split
+from .cache import bump_catalog_version
+from .models import Grade, Subject, Topic
+from .search import schedule_reindex
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("name", "grade", "subjects", "description")
+BATCH_SIZE = 500
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    yield from reader
+
+
+def _xlsx_rows(file):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+# yields (row number, {column: value}) without loading the whole sheet
+def read_rows(file, filename: str):
+    rows = _xlsx_rows(file) if filename.lower().endswith(".xlsx") else _csv_rows(file)
+
+    header = [cell.strip().lower() for cell in next(rows, [])]
+    missing = {"name", "grade"} - set(header)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    for number, row in enumerate(rows, start=2):
+        values = dict(zip(header, (cell.strip() for cell in row)))
+        if any(values.get(column) for column in COLUMNS):
+            yield number, values
+
+
+def _split_names(value: str) -> list:
+    return [name.strip() for name in re.split(r"[;,]", value or "") if name.strip()]
+
+
+# name -> every id carrying it; a name shared by several rows can't be resolved to one FK
+def _ids_by_name(pairs) -> dict:
+    ids = defaultdict(list)
+    for pk, name in pairs:
+        ids[name].append(pk)
+    return dict(ids)
+
+
+def _validate(rows, grades: dict, subjects: dict, errors: list):
+    seen = set()
+
+    for number, values in rows:
+        name = values.get("name", "")
+        level = values.get("grade", "")
+        subject_names = _split_names(values.get("subjects"))
+
+        if not name:
+            errors.append((number, "name is required"))
+            continue
+        if len(name) > Topic._meta.get_field("name").max_length:
+            errors.append((number, "name is too long"))
+            continue
+        if level not in grades:
+            errors.append((number, f"unknown grade '{level}'"))
+            continue
+        if len(grades[level]) > 1:
+            errors.append((number, f"ambiguous grade '{level}', {len(grades[level])} grades have this name"))
+            continue
+
+        unknown = [s for s in subject_names if s not in subjects]
+        if unknown:
+            errors.append((number, f"unknown subjects: {', '.join(unknown)}"))
+            continue
+        ambiguous = [s for s in subject_names if len(subjects[s]) > 1]
+        if ambiguous:
+            errors.append((number, f"ambiguous subjects, several have the name: {', '.join(ambiguous)}"))
+            continue
+
+        grade_id = grades[level][0]
+        key = (grade_id, name)
+        if key in seen:
+            errors.append((number, "duplicate row"))
+            continue
+        seen.add(key)
+
+        yield {
+            "grade_id": grade_id,
+            "name": name,
+            "description": values.get("description") or None,
+            "subject_ids": [subjects[s][0] for s in subject_names],
+        }
+
+
+def _save_batch(batch: list, upsert: bool, summary: dict) -> list:
+    existing = {
+        (topic.grade_id, topic.name): topic
+        for topic in Topic.objects.filter(
+            grade_id__in={row["grade_id"] for row in batch},
+            name__in={row["name"] for row in batch},
+        ).only("id", "grade_id", "name", "description")
+    }
+
+    now = timezone.now()
+    created, updated, linked = [], [], []
+
+    for row in batch:
+        topic = existing.get((row["grade_id"], row["name"]))
+
+        if topic is None:
+            topic = Topic(grade_id=row["grade_id"], name=row["name"], description=row["description"])
+            created.append(topic)
+        elif upsert:
+            topic.description = row["description"]
+            topic.update_at = now
+            updated.append(topic)
+        else:
+            summary["skipped"] += 1
+            continue
+
+        linked.append((topic, row["subject_ids"]))
+
+    Topic.objects.bulk_create(created)
+    Topic.objects.bulk_update(updated, ["description", "update_at"])
+
+    Link = Subject.topic.through
+    wanted = {(topic.id, subject_id) for topic, subject_ids in linked for subject_id in subject_ids}
+    # links that already exist are left out, so the summary counts only new ones
+    existing = set(
+        Link.objects.filter(
+            topic_id__in={topic_id for topic_id, _ in wanted},
+            subject_id__in={subject_id for _, subject_id in wanted},
+        ).values_list("topic_id", "subject_id")
+    )
+    links = [Link(topic_id=topic_id, subject_id=subject_id) for topic_id, subject_id in wanted - existing]
+    # a concurrent import may still add the same link
+    Link.objects.bulk_create(links, ignore_conflicts=True)
+
+    summary["created"] += len(created)
+    summary["updated"] += len(updated)
+    summary["links"] += len(links)
+
+    return [topic.id for topic, _ in linked]
+
+
+def import_topics(file, filename: str, dry_run: bool = False, upsert: bool = False) -> dict:
+    summary = {"created": 0, "updated": 0, "skipped": 0, "links": 0, "errors": []}
+
+    grades = _ids_by_name(Grade.objects.values_list("id", "level"))
+    subjects = _ids_by_name(Subject.objects.values_list("id", "name"))
+
+    rows = _validate(read_rows(file, filename), grades, subjects, summary["errors"])
+    touched = []
+
+    with transaction.atomic():
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                touched += _save_batch(batch, upsert, summary)
+                batch = []
+        if batch:
+            touched += _save_batch(batch, upsert, summary)
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    # bulk writes skip model signals, so caches and the search index are refreshed here
+    if not dry_run and touched:
+        bump_catalog_version()
+        for ids in split(touched, BATCH_SIZE):
+            schedule_reindex("topic", ids)
+
+    logger.info("Topic import from %s%s: %s", filename, " (dry run)" if dry_run else "", summary)
+    return summary
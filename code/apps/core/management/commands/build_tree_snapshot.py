@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.snapshot import get_snapshot
+
+
+class Command(BaseCommand):
+    help = "Build the curriculum tree snapshot for the current catalog version"
+
+    def handle(self, *args, **options):
+        etag, body = get_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {etag} ({len(body)} bytes gzipped)"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.importer import import_topics
+
+
+class Command(BaseCommand):
+    help = "Import topics and their subject links from a CSV or XLSX file (columns: name, grade, subjects, description)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--upsert", action="store_true", help="Update topics that already exist for the same grade and name")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and report without saving")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], "rb") as file:
+                summary = import_topics(
+                    file, options["path"], dry_run=options["dry_run"], upsert=options["upsert"]
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for number, message in summary["errors"]:
+            self.stderr.write(f"row {number}: {message}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'Dry run: ' if options['dry_run'] else ''}"
+                f"created {summary['created']}, updated {summary['updated']}, "
+                f"skipped {summary['skipped']}, links {summary['links']}, errors {len(summary['errors'])}"
+            )
+        )
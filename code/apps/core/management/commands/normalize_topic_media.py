@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.core.cache import bump_catalog_version
+from apps.core.media import normalize_image, normalize_video
+from apps.core.models import Topic
+
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Precompute URLs, dimensions, hashes and WebP renditions for existing topic images and videos"
+
+    def handle(self, *args, **options):
+        topics = Topic.objects.filter(Q(image__isnull=False) | Q(video__isnull=False)).only("id", "image", "video")
+        batch, count = [], 0
+
+        for topic in topics.iterator(chunk_size=BATCH_SIZE):
+            topic.image = normalize_image(topic.image)
+            topic.video = normalize_video(topic.video)
+            batch.append(topic)
+
+            if len(batch) >= BATCH_SIZE:
+                Topic.objects.bulk_update(batch, ["image", "video"])
+                count += len(batch)
+                batch = []
+
+        if batch:
+            Topic.objects.bulk_update(batch, ["image", "video"])
+            count += len(batch)
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Normalized media of {count} topics"))
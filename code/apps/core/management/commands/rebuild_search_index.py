@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.search import SEARCH_BACKEND, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the subject and topic search index from the database"
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents with {SEARCH_BACKEND}"))
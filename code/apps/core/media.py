@@ -0,0 +1,220 @@
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+
+from main import settings
+from .protected import PROTECTED_MEDIA_DIR, PROTECTED_MEDIA_URL, is_protected, protected_url
+
+logger = logging.getLogger(__name__)
+
+MEDIA_URL = settings.MEDIA_URL
+MEDIA_ROOT = Path(settings.MEDIA_ROOT)
+# underscore folders are hidden from the media manager listing and search index, like _thumb and _r
+RENDITIONS_DIR = getattr(settings, "MEDIA_RENDITIONS_DIR", "_renditions")
+THUMB_WIDTH = getattr(settings, "MEDIA_THUMB_WIDTH", 320)
+WEBP_QUALITY = 80
+
+# Topic.image / Topic.video are stored as
+#   image: {url, point, path, src, width, height, bytes, mtime, sha256, webp: {...}, thumb: {...}}
+#   video: {url, path, src, mime, bytes, mtime, version, poster: {...}}
+# where every rendition is {src, width, height, bytes}, so readers never touch the filesystem
+
+
+def media_path(url: str) -> str:
+    if url.startswith(MEDIA_URL):
+        url = url[len(MEDIA_URL):]
+    elif url.startswith("/media/"):
+        url = url[len("/media/"):]
+    return url.lstrip("/")
+
+
+def media_src(path: str) -> str:
+    if is_protected(path):
+        return protected_url(path)
+    return MEDIA_URL + path
+
+
+def _sha256(file: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# an unchanged file keeps its computed fields, so re-saving a topic is cheap
+def _is_current(value: dict, path: str, stat: os.stat_result, key: str = "sha256") -> bool:
+    return (
+        value.get("path") == path
+        and bool(value.get(key))
+        and value.get("bytes") == stat.st_size
+        and value.get("mtime") == stat.st_mtime_ns
+        and all(
+            (r.get("src") or "").startswith(PROTECTED_MEDIA_URL) == is_protected(path)
+            for r in _renditions(value)
+        )
+    )
+
+
+def _rendition_path(sha256: str, suffix: str, protected: bool) -> str:
+    # renditions of paid files are paid files too, so they live under the protected prefix
+    folder = f"{PROTECTED_MEDIA_DIR}/{RENDITIONS_DIR}" if protected else RENDITIONS_DIR
+    return f"{folder}/{sha256[:2]}/{sha256}{suffix}.webp"
+
+
+def _renditions(value: dict) -> list:
+    return [value[key] for key in ("webp", "thumb", "poster") if isinstance(value.get(key), dict)]
+
+
+def _save_webp(img: Image.Image, sha256: str, suffix: str, protected: bool = False) -> dict:
+    path = _rendition_path(sha256, suffix, protected)
+    target = MEDIA_ROOT / path
+
+    if not target.is_file():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        img.save(target, "WEBP", quality=WEBP_QUALITY, method=4)
+        width, height = img.size
+    else:
+        with Image.open(target) as saved:
+            width, height = saved.size
+
+    return {"path": path, "src": media_src(path), "width": width, "height": height, "bytes": target.stat().st_size}
+
+
+def _thumbnail(img: Image.Image, sha256: str, protected: bool = False) -> dict:
+    if img.width <= THUMB_WIDTH:
+        return _save_webp(img, sha256, f"_w{img.width}", protected)
+
+    height = max(round(img.height * THUMB_WIDTH / img.width), 1)
+    return _save_webp(img.resize((THUMB_WIDTH, height), Image.LANCZOS), sha256, f"_w{THUMB_WIDTH}", protected)
+
+
+def normalize_image(value):
+    if not value or not value.get("url"):
+        return value
+
+    url = value["url"]
+    data = {"url": url, "point": value.get("point") or [50, 50]}
+
+    if url.startswith(("http://", "https://", "//")):
+        return {**data, "src": url}
+
+    path = media_path(url)
+    file = MEDIA_ROOT / path
+    data.update(path=path, src=media_src(path))
+
+    try:
+        stat = file.stat()
+        if _is_current(value, path, stat):
+            return {**value, **data}
+
+        protected = is_protected(path)
+        sha256 = _sha256(file)
+        with Image.open(file) as img:
+            img.load()
+            data.update(
+                width=img.width,
+                height=img.height,
+                bytes=stat.st_size,
+                mtime=stat.st_mtime_ns,
+                sha256=sha256,
+                webp=_save_webp(img, sha256, "", protected),
+                thumb=_thumbnail(img, sha256, protected),
+            )
+    except (OSError, UnidentifiedImageError) as e:
+        logger.warning("Could not process topic image %s: %s", path, e)
+
+    return data
+
+
+def _rendition(path: str, protected: bool) -> dict:
+    target = MEDIA_ROOT / path
+
+    if protected and not is_protected(path):
+        # a public poster of a paid video is copied under the protected prefix,
+        # the original may be a library image other content links to
+        with open(target, "rb") as f:
+            raw = f.read()
+        with Image.open(io.BytesIO(raw)) as img:
+            img.load()
+            return _save_webp(img, hashlib.sha256(raw).hexdigest(), "_poster", True)
+
+    with Image.open(target) as img:
+        width, height = img.size
+    return {"path": path, "src": media_src(path), "width": width, "height": height, "bytes": target.stat().st_size}
+
+
+def _save_poster(poster, protected: bool = False):
+    if isinstance(poster, dict) and poster.get("src"):
+        poster = poster["src"]
+
+    if not isinstance(poster, str):
+        return poster or None
+
+    # the admin widget sends an existing poster back as its URL
+    if poster.startswith((MEDIA_URL, PROTECTED_MEDIA_URL)):
+        if poster.startswith(PROTECTED_MEDIA_URL):
+            path = f"{PROTECTED_MEDIA_DIR}/{poster[len(PROTECTED_MEDIA_URL):]}"
+        else:
+            path = media_path(poster)
+        try:
+            return _rendition(path, protected)
+        except (OSError, UnidentifiedImageError):
+            return poster
+
+    # a new poster arrives from the video widget as a base64 data URL
+    if not poster.startswith("data:image"):
+        return poster or None
+
+    try:
+        raw = base64.b64decode(poster.split(",", 1)[1])
+        with Image.open(io.BytesIO(raw)) as img:
+            img.load()
+            return _save_webp(img, hashlib.sha256(raw).hexdigest(), "_poster", protected)
+    except (IndexError, binascii.Error, OSError, UnidentifiedImageError) as e:
+        logger.warning("Could not decode video poster: %s", e)
+        return None
+
+
+def normalize_video(value):
+    if not value or not value.get("url"):
+        return value
+
+    url = value["url"]
+    data = {"url": url}
+
+    if url.startswith(("http://", "https://", "//")):
+        return {**data, "src": url, "poster": value.get("poster")}
+
+    path = media_path(url)
+    file = MEDIA_ROOT / path
+    data.update(path=path, src=media_src(path), mime=mimetypes.guess_type(path)[0])
+
+    protected = is_protected(path)
+
+    try:
+        stat = file.stat()
+        if _is_current(value, path, stat, "version"):
+            return {**value, **data, "poster": _save_poster(value.get("poster"), protected)}
+
+        # reading a multi-GB lesson video would hold a request thread, size and mtime identify it well enough
+        data.update(
+            bytes=stat.st_size,
+            mtime=stat.st_mtime_ns,
+            version=f"{stat.st_size:x}-{stat.st_mtime_ns:x}",
+            poster=_save_poster(value.get("poster"), protected),
+        )
+    except OSError as e:
+        logger.warning("Could not process topic video %s: %s", path, e)
+        data["poster"] = _save_poster(value.get("poster"), protected)
+
+    return data
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.3 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+# Postgres keeps a weighted tsvector next to each document and indexes it with GIN;
+# other backends search the plain columns (see apps.core.search.DatabaseBackend)
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute(
+        "ALTER TABLE core_search_document ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(body, '')), 'B')"
+        ") STORED"
+    )
+    schema_editor.execute(
+        "CREATE INDEX core_search_vector_gin ON core_search_document USING gin (search_vector)"
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_alter_grade_level_alter_subject_is_active_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("subject", "საგანი"), ("topic", "თემა")],
+                        max_length=20,
+                        verbose_name="ტიპი",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField(verbose_name="ობიექტის ID")),
+                ("title", models.CharField(max_length=255, verbose_name="სათაური")),
+                (
+                    "body",
+                    models.TextField(blank=True, default="", verbose_name="ტექსტი"),
+                ),
+                (
+                    "grade_id",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="კლასი"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="განახლების თარიღი"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "საძიებო დოკუმენტი",
+                "verbose_name_plural": "საძიებო დოკუმენტები",
+                "db_table": "core_search_document",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="searchdocument",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "object_id"), name="core_search_document_uniq"
+            ),
+        ),
+        migrations.RunPython(add_search_vector, migrations.RunPython.noop),
+    ]
@@ -46,4 +46,28 @@ class Topic(models.Model):
     
     class Meta:
         verbose_name = "თემა"
-        verbose_name_plural = "თემები"
\ No newline at end of file
+        verbose_name_plural = "თემები"
+
+class SearchDocument(models.Model):
+    KIND_CHOICES = [
+        ("subject", "საგანი"),
+        ("topic", "თემა"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="ტიპი")
+    object_id = models.PositiveIntegerField(verbose_name="ობიექტის ID")
+    title = models.CharField(max_length=255, verbose_name="სათაური")
+    body = models.TextField(blank=True, default="", verbose_name="ტექსტი")
+    grade_id = models.PositiveIntegerField(null=True, blank=True, verbose_name="კლასი")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="განახლების თარიღი")
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id}"
+
+    class Meta:
+        db_table = "core_search_document"
+        verbose_name = "საძიებო დოკუმენტი"
+        verbose_name_plural = "საძიებო დოკუმენტები"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="core_search_document_uniq"),
+        ]
@@ -0,0 +1,100 @@
+import re
+
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from apps.payments.models import Subscription
+from apps.user.models import Child
+from main import settings
+from .cache import CATALOG_TTL, get_catalog_version
+from .models import Subject, Topic
+
+PROTECTED_MEDIA_DIR = getattr(settings, "PROTECTED_MEDIA_DIR", "paid")
+PROTECTED_MEDIA_URL = getattr(settings, "PROTECTED_MEDIA_URL", "/protected/")
+ENTITLEMENT_TTL = 60
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def is_protected(path: str) -> bool:
+    return path.startswith(PROTECTED_MEDIA_DIR + "/")
+
+
+def protected_url(path: str) -> str:
+    return PROTECTED_MEDIA_URL + path[len(PROTECTED_MEDIA_DIR) + 1:]
+
+
+def _media_paths(media: dict):
+    # the file itself and every rendition made from it (webp, thumb, video poster)
+    yield media.get("path")
+    for key in ("webp", "thumb", "poster"):
+        rendition = media.get(key)
+        if isinstance(rendition, dict):
+            yield rendition.get("path")
+
+
+# {media path: [subject ids]} for every protected file a topic points at, built once per catalog version
+def media_subjects() -> dict:
+    key = f"content:catalog:{get_catalog_version()}:protected-media"
+    index = cache.get(key)
+
+    if index is None:
+        index = {}
+        topics = Topic.objects.filter(Q(video__isnull=False) | Q(image__isnull=False)).only(
+            "id", "image", "video"
+        ).prefetch_related(Prefetch("subjects", queryset=Subject.objects.only("id")))
+
+        for topic in topics:
+            subject_ids = [subject.id for subject in topic.subjects.all()]
+            for media in (topic.video, topic.image):
+                for path in _media_paths(media or {}):
+                    if path and is_protected(path):
+                        index.setdefault(path, set()).update(subject_ids)
+
+        index = {path: sorted(ids) for path, ids in index.items()}
+        cache.set(key, index, timeout=CATALOG_TTL)
+
+    return index
+
+
+def entitled_subjects(payload: dict) -> set:
+    account_type, account_id = payload.get("account_type"), payload.get("account_id")
+    key = f"media:entitlements:{account_type}:{account_id}"
+    subject_ids = cache.get(key)
+
+    if subject_ids is None:
+        if account_type == "Child":
+            parent_id = Child.objects.filter(id=account_id).values_list("parent_id", flat=True).first()
+        else:
+            parent_id = account_id
+
+        subject_ids = []
+        # user_id=None would match subscriptions without a user
+        if parent_id is not None:
+            subject_ids = list(
+                Subscription.objects.filter(user_id=parent_id, active=True, end_date__gt=timezone.now())
+                .values_list("subject_id", flat=True)
+                .distinct()
+            )
+        cache.set(key, subject_ids, timeout=ENTITLEMENT_TTL)
+
+    return set(subject_ids)
+
+
+def parse_range(header: str, size: int):
+    match = RANGE_RE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if start == "":
+        # suffix range: the last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start > end or start >= size:
+        return False
+
+    return start, end
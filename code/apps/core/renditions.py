@@ -0,0 +1,107 @@
+import os
+import uuid
+from pathlib import Path
+
+from django.utils.crypto import constant_time_compare, salted_hmac
+from PIL import Image
+
+from main import settings
+from tools.pycrop import Rendition, render
+from .protected import is_protected
+
+MEDIA_ROOT = Path(settings.MEDIA_ROOT)
+# served by nginx straight from disk once rendered, see docker/nginx/default.conf
+RENDITION_DIR = "_r"
+RENDITION_URL = settings.MEDIA_URL + RENDITION_DIR + "/"
+RENDITION_MODES = ("cover", "contain")
+RENDITION_QUALITY = getattr(settings, "MEDIA_RENDITION_QUALITY", 85)
+# named sizes the API offers for topic images, see `image_renditions`
+RENDITION_SIZES = getattr(
+    settings, "MEDIA_RENDITION_SIZES", {"small": (160, 90), "medium": (480, 270), "large": (960, 540)}
+)
+WEBP_SUFFIX = ".webp"
+
+
+def _signature(width: int, height: int, mode: str, version: str, path: str) -> str:
+    value = f"{width}x{height}/{mode}/{version}/{path}"
+    return salted_hmac("media.rendition", value, algorithm="sha256").hexdigest()[:16]
+
+
+def rendition_url(url: str, width: int = 0, height: int = 0, mode: str = "cover", mtime: int = None) -> str:
+    """
+    Signed URL for `url` resized to width x height, 0 keeps the aspect ratio
+    on that side. Remote and paid files are returned unchanged.
+
+    The source mtime (ns, read from disk when not given) is part of the URL,
+    nginx serves rendered files without asking Django, so a replaced source
+    has to get new URLs.
+    """
+    if not url or url.startswith(("http://", "https://", "//")):
+        return url or ""
+
+    path = url[len(settings.MEDIA_URL):] if url.startswith(settings.MEDIA_URL) else url
+    path = path.lstrip("/")
+
+    if is_protected(path) or not (width or height):
+        return url
+
+    if mtime is None:
+        try:
+            mtime = (MEDIA_ROOT / path).stat().st_mtime_ns
+        except OSError:
+            return url
+
+    version = f"{mtime:x}"
+    return f"{RENDITION_URL}{width}x{height}/{mode}/{version}/{path}?s={_signature(width, height, mode, version, path)}"
+
+
+def image_renditions(image: dict) -> dict:
+    if not image or not image.get("url") or not image.get("mtime"):
+        return {}
+
+    urls = {
+        name: rendition_url(image["url"], width, height, "cover", image["mtime"])
+        for name, (width, height) in RENDITION_SIZES.items()
+    }
+    return {name: url for name, url in urls.items() if url.startswith(RENDITION_URL)}
+
+
+def check_signature(width: int, height: int, mode: str, version: str, path: str, signature: str) -> bool:
+    return constant_time_compare(_signature(width, height, mode, version, path), signature or "")
+
+
+def source_path(path: str):
+    source = (MEDIA_ROOT / path).resolve()
+
+    if (
+        not source.is_relative_to(MEDIA_ROOT.resolve())
+        or is_protected(path)
+        or path.startswith(RENDITION_DIR + "/")
+        or not source.is_file()
+    ):
+        return None
+    return source
+
+
+def get_rendition(source: Path, width: int, height: int, mode: str, version: str, path: str, webp: bool) -> Path:
+    # nginx looks for `<uri>.webp` first when the client accepts WebP, so the layout has to match the URL
+    target = MEDIA_ROOT / RENDITION_DIR / f"{width}x{height}" / mode / version / (path + (WEBP_SUFFIX if webp else ""))
+
+    if target.is_file():
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # render next to the target and rename, so concurrent requests never see a partial file
+    tmp = target.with_name(f".{uuid.uuid4().hex}{target.suffix}")
+    format = "WEBP" if webp else Image.registered_extensions().get(source.suffix.lower())
+
+    try:
+        render(
+            source,
+            [Rendition(str(tmp), (width or None, height or None), mode, format=format, quality=RENDITION_QUALITY)],
+        )
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return target
@@ -1,5 +1,5 @@
 from ninja import Schema
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 
 class SubjectSchema(Schema):
     id: int
@@ -9,12 +9,75 @@ class GradeSchema(Schema):
     id: int
     level: str
 
+class RenditionSchema(Schema):
+    src: str
+    width: int
+    height: int
+    bytes: int
+
+class ImageSchema(Schema):
+    url: str
+    src: Optional[str] = None
+    point: List[float] = [50, 50]
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    webp: Optional[RenditionSchema] = None
+    thumb: Optional[RenditionSchema] = None
+    # signed /media/_r/ URLs by size name, see renditions.RENDITION_SIZES
+    renditions: Dict[str, str] = {}
+
+class VideoSchema(Schema):
+    url: str
+    src: Optional[str] = None
+    mime: Optional[str] = None
+    bytes: Optional[int] = None
+    version: Optional[str] = None
+    poster: Optional[Union[RenditionSchema, str]] = None
+
 class TopicSchema(Schema):
     id: int
     name: str
-    subject: SubjectSchema
+    subjects: List[SubjectSchema] = []
     grade: Optional[GradeSchema] = None
-    image: Optional[dict] = None
-    video: Optional[dict] = None
+    image: Optional[ImageSchema] = None
+    video: Optional[VideoSchema] = None
     description: Optional[str] = None
 
+
+class TopicPageSchema(Schema):
+    results: List[TopicSchema]
+    next_cursor: Optional[str] = None
+
+class SearchHitSchema(Schema):
+    kind: str
+    id: int
+    title: str
+    grade: Optional[int] = None
+    rank: float
+
+class SearchPageSchema(Schema):
+    count: int
+    page: int
+    results: List[SearchHitSchema]
+
+class SuggestionSchema(Schema):
+    kind: str
+    id: int
+    name: str
+
+class TreeTopicSchema(Schema):
+    id: int
+    name: str
+    thumb: Optional[str] = None
+    subjects: List[SubjectSchema]
+
+class TreeGradeSchema(Schema):
+    # None groups the topics without a grade
+    id: Optional[int] = None
+    level: str
+    topics: List[TreeTopicSchema]
+
+class SuccessSchema(Schema):
+    success: bool
@@ -0,0 +1,307 @@
+import logging
+from html import unescape
+
+import meilisearch
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Prefetch, Q, Value, When
+from django.utils.module_loading import import_string
+
+from main import settings
+from tools import striptags
+from .models import SearchDocument, Subject, Topic
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BACKEND = getattr(settings, "SEARCH_BACKEND", "apps.core.search.DatabaseBackend")
+SEARCH_BACKEND_OPTIONS = getattr(settings, "SEARCH_BACKEND_OPTIONS", {})
+BATCH_SIZE = 500
+
+# documents are plain dicts shared by every backend:
+# {"key", "kind", "id", "title", "body", "grade", "subjects"}
+
+
+def _text(html: str) -> str:
+    return " ".join(unescape(striptags(html or "", " ")).split())
+
+
+def topic_document(topic: Topic) -> dict:
+    return {
+        "key": f"topic-{topic.id}",
+        "kind": "topic",
+        "id": topic.id,
+        "title": topic.name,
+        "body": _text(topic.description),
+        "grade": topic.grade_id,
+        "subjects": [subject.id for subject in topic.subjects.all()],
+    }
+
+
+def subject_document(subject: Subject) -> dict:
+    return {
+        "key": f"subject-{subject.id}",
+        "kind": "subject",
+        "id": subject.id,
+        "title": subject.name,
+        "body": "",
+        "grade": None,
+        "subjects": [subject.id],
+    }
+
+
+def _topics():
+    return Topic.objects.only("id", "name", "description", "grade_id").prefetch_related(
+        Prefetch("subjects", queryset=Subject.objects.only("id"))
+    )
+
+
+def _subjects():
+    return Subject.objects.filter(is_active=True).only("id", "name")
+
+
+class SearchBackend:
+    def setup(self):
+        pass
+
+    def add(self, documents: list):
+        raise NotImplementedError
+
+    def delete(self, keys: list):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    # returns (total, hits) where every hit is {"kind", "id", "title", "grade", "rank"}
+    def search(self, query: str, grade: int = None, subject: int = None, offset: int = 0, limit: int = 20):
+        raise NotImplementedError
+
+
+class DatabaseBackend(SearchBackend):
+    def add(self, documents: list):
+        SearchDocument.objects.bulk_create(
+            [
+                SearchDocument(
+                    kind=doc["kind"],
+                    object_id=doc["id"],
+                    title=doc["title"][:255],
+                    body=doc["body"],
+                    grade_id=doc["grade"],
+                )
+                for doc in documents
+            ],
+            update_conflicts=True,
+            unique_fields=["kind", "object_id"],
+            update_fields=["title", "body", "grade_id", "updated_at"],
+        )
+
+    def delete(self, keys: list):
+        condition = Q(pk__in=[])
+        for key in keys:
+            kind, object_id = key.split("-")
+            condition |= Q(kind=kind, object_id=object_id)
+        SearchDocument.objects.filter(condition).delete()
+
+    def clear(self):
+        SearchDocument.objects.all().delete()
+
+    def _match(self, documents, query: str):
+        if connection.vendor == "postgresql":
+            # served by the GIN index on the generated search_vector column
+            tsquery = "websearch_to_tsquery('simple', %s)"
+            return documents.extra(
+                select={"rank": f"ts_rank_cd(search_vector, {tsquery})"},
+                select_params=[query],
+                where=[f"search_vector @@ {tsquery}"],
+                params=[query],
+            )
+
+        for term in query.split():
+            documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+
+        return documents.annotate(
+            rank=Case(
+                When(title__icontains=query, then=Value(2.0)),
+                default=Value(1.0),
+                output_field=FloatField(),
+            )
+        )
+
+    def search(self, query, grade=None, subject=None, offset=0, limit=20):
+        documents = SearchDocument.objects.all()
+
+        if grade:
+            documents = documents.filter(grade_id=grade)
+        if subject:
+            documents = documents.filter(
+                kind="topic",
+                object_id__in=Subject.topic.through.objects.filter(subject_id=subject).values("topic_id"),
+            )
+
+        documents = self._match(documents, query)
+        total = documents.count()
+
+        rows = documents.order_by("-rank", "kind", "object_id").values_list(
+            "kind", "object_id", "title", "grade_id", "rank"
+        )[offset : offset + limit]
+
+        return total, [
+            {"kind": kind, "id": object_id, "title": title, "grade": grade_id, "rank": rank}
+            for kind, object_id, title, grade_id, rank in rows
+        ]
+
+
+class MeilisearchBackend(SearchBackend):
+    def __init__(self, url: str = None, api_key: str = None, index: str = "catalog"):
+        client = meilisearch.Client(
+            url or getattr(settings, "MEILISEARCH_URL", "http://127.0.0.1:7700"),
+            api_key or getattr(settings, "MEILISEARCH_API_KEY", None),
+        )
+        self.index = client.index(index)
+
+    def setup(self):
+        self.index.update_settings(
+            {
+                "searchableAttributes": ["title", "body"],
+                "filterableAttributes": ["kind", "grade", "subjects"],
+            }
+        )
+
+    def add(self, documents: list):
+        self.index.add_documents(documents, primary_key="key")
+
+    def delete(self, keys: list):
+        self.index.delete_documents(keys)
+
+    def clear(self):
+        self.index.delete_all_documents()
+
+    def search(self, query, grade=None, subject=None, offset=0, limit=20):
+        filters = []
+        if grade:
+            filters.append(f"grade = {int(grade)}")
+        if subject:
+            filters.append(f"kind = topic AND subjects = {int(subject)}")
+
+        result = self.index.search(
+            query,
+            {
+                "offset": offset,
+                "limit": limit,
+                "filter": " AND ".join(filters) or None,
+                "attributesToRetrieve": ["kind", "id", "title", "grade"],
+                "showRankingScore": True,
+            },
+        )
+
+        return result.get("estimatedTotalHits", 0), [
+            {
+                "kind": hit["kind"],
+                "id": hit["id"],
+                "title": hit["title"],
+                "grade": hit.get("grade"),
+                "rank": hit.get("_rankingScore", 0),
+            }
+            for hit in result["hits"]
+        ]
+
+
+# in-process stand-in for Meilisearch, for tests and local development
+class MemoryBackend(SearchBackend):
+    def __init__(self, **kwargs):
+        self.documents = {}
+
+    def add(self, documents: list):
+        for doc in documents:
+            self.documents[doc["key"]] = doc
+
+    def delete(self, keys: list):
+        for key in keys:
+            self.documents.pop(key, None)
+
+    def clear(self):
+        self.documents.clear()
+
+    def search(self, query, grade=None, subject=None, offset=0, limit=20):
+        terms = query.lower().split()
+        hits = []
+
+        for doc in self.documents.values():
+            if grade and doc["grade"] != grade:
+                continue
+            if subject and (doc["kind"] != "topic" or subject not in doc["subjects"]):
+                continue
+
+            title, body = doc["title"].lower(), doc["body"].lower()
+            if not all(term in title or term in body for term in terms):
+                continue
+
+            rank = sum(title.count(term) * 2 + body.count(term) for term in terms)
+            hits.append({"kind": doc["kind"], "id": doc["id"], "title": doc["title"], "grade": doc["grade"], "rank": float(rank)})
+
+        hits.sort(key=lambda hit: (-hit["rank"], hit["kind"], hit["id"]))
+        return len(hits), hits[offset : offset + limit]
+
+
+_backend = None
+
+
+def get_backend() -> SearchBackend:
+    global _backend
+    if _backend is None:
+        _backend = import_string(SEARCH_BACKEND)(**SEARCH_BACKEND_OPTIONS)
+    return _backend
+
+
+def reindex(kind: str, ids: list):
+    if kind == "topic":
+        objects = _topics().filter(id__in=ids)
+        build = topic_document
+    else:
+        objects = _subjects().filter(id__in=ids)
+        build = subject_document
+
+    documents = [build(obj) for obj in objects]
+    found = {doc["id"] for doc in documents}
+    missing = [f"{kind}-{object_id}" for object_id in ids if object_id not in found]
+
+    backend = get_backend()
+    if documents:
+        backend.add(documents)
+    if missing:
+        backend.delete(missing)
+
+
+def schedule_reindex(kind: str, ids: list):
+    def run():
+        try:
+            reindex(kind, ids)
+        except Exception:
+            # search lags behind until the next save or rebuild, the edit itself succeeded
+            logger.exception("Failed to reindex %s %s", kind, ids)
+
+    transaction.on_commit(run)
+
+
+def rebuild() -> int:
+    backend = get_backend()
+    backend.setup()
+    backend.clear()
+
+    count = 0
+    for queryset, build in ((_subjects(), subject_document), (_topics(), topic_document)):
+        batch = []
+        for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+            batch.append(build(obj))
+            if len(batch) >= BATCH_SIZE:
+                backend.add(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            backend.add(batch)
+            count += len(batch)
+
+    return count
+
+
+def search(query: str, grade: int = None, subject: int = None, offset: int = 0, limit: int = 20):
+    return get_backend().search(query, grade=grade, subject=subject, offset=offset, limit=limit)
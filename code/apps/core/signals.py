@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .media import normalize_image, normalize_video
+from .models import Grade, Subject, Topic
+from .search import schedule_reindex
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Grade)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Grade)
+@receiver(post_delete, sender=Topic)
+def catalog_changed(sender, **kwargs):
+    # after commit, or a concurrent reader could cache pre-commit rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Subject.topic.through)
+def catalog_links_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def subject_search_changed(sender, instance, **kwargs):
+    schedule_reindex("subject", [instance.pk])
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def topic_search_changed(sender, instance, **kwargs):
+    schedule_reindex("topic", [instance.pk])
+
+
+@receiver(m2m_changed, sender=Subject.topic.through)
+def topic_subjects_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # topic documents carry their subject ids for the subject filter
+    if reverse:
+        topic_ids = [instance.pk]
+    elif action == "pre_clear":
+        instance._cleared_topic_ids = list(instance.topic.values_list("id", flat=True))
+        return
+    elif action == "post_clear":
+        topic_ids = getattr(instance, "_cleared_topic_ids", [])
+    else:
+        topic_ids = list(pk_set or [])
+
+    if action in ("post_add", "post_remove", "post_clear") and topic_ids:
+        schedule_reindex("topic", topic_ids)
+
+
+@receiver(pre_save, sender=Topic)
+def normalize_topic_media(sender, instance, **kwargs):
+    instance.image = normalize_image(instance.image)
+    instance.video = normalize_video(instance.video)
@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import logging
+import os
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from main import settings
+from tools.renderers import JSON
+from .cache import CATALOG_TTL, get_catalog_version
+from .models import Grade, Subject, Topic
+from .renditions import image_renditions
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = getattr(settings, "SNAPSHOT_DIR", settings.STORAGE_DIR / "snapshots")
+# bumped when the tree layout changes, so snapshots of the same catalog version are rebuilt
+TREE_FORMAT = 2
+UNGRADED_LEVEL = "კლასის გარეშე"
+
+
+def _thumb(image) -> str:
+    if not image:
+        return None
+    thumb = image.get("thumb") or {}
+    return image_renditions(image).get("small") or thumb.get("src") or image.get("src")
+
+
+def _topic(topic) -> dict:
+    return {
+        "id": topic.id,
+        "name": topic.name,
+        "thumb": _thumb(topic.image),
+        "subjects": [{"id": s.id, "name": s.name} for s in topic.subjects.all()],
+    }
+
+
+# grades -> topics -> subjects in three queries, independent of catalog size;
+# topics without a grade are listed last under a grade with no id
+def build_tree() -> list:
+    topics = (
+        Topic.objects.only("id", "name", "image", "grade_id")
+        .prefetch_related(Prefetch("subjects", queryset=Subject.objects.only("id", "name").order_by("id")))
+        .order_by("id")
+    )
+
+    by_grade = defaultdict(list)
+    for topic in topics:
+        by_grade[topic.grade_id].append(_topic(topic))
+
+    tree = [
+        {"id": grade.id, "level": grade.level, "topics": by_grade[grade.id]}
+        for grade in Grade.objects.only("id", "level").order_by("id")
+    ]
+
+    if by_grade[None]:
+        tree.append({"id": None, "level": UNGRADED_LEVEL, "topics": by_grade[None]})
+
+    return tree
+
+
+def _path(version: int):
+    return SNAPSHOT_DIR / f"tree-{version}-{TREE_FORMAT}.json.gz"
+
+
+def _save(version: int, body: bytes):
+    path = _path(version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(body)
+    tmp.replace(path)
+
+    for stale in path.parent.glob("tree-*.json.gz"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+# returns (etag, gzipped JSON) for the current catalog version:
+# redis first, then the file left by another worker, and only then the database.
+# The etag is the one of the gzip body, see `identity_etag` for the decoded one
+def get_snapshot():
+    version = get_catalog_version()
+    key = f"content:tree:{version}:{TREE_FORMAT}"
+
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+
+    path = _path(version)
+    if path.is_file():
+        body = path.read_bytes()
+    else:
+        body = gzip.compress(JSON.dumps(build_tree()), compresslevel=9, mtime=0)
+        _save(version, body)
+        logger.info("Curriculum tree snapshot %s built (%d bytes)", version, len(body))
+
+    entry = ('"tree-%s-gzip"' % hashlib.sha1(body).hexdigest(), body)
+    cache.set(key, entry, timeout=CATALOG_TTL)
+    return entry
+
+
+def identity_etag(etag: str) -> str:
+    # the decoded body is a different representation and can't share a strong etag
+    return etag.replace("-gzip", "")
@@ -1,3 +1,613 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import msgpack
+from django.core.cache import cache
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from PIL import Image
+
+from apps.payments.models import Order, Subscription
+from apps.user.models import Parent
+from apps.user.utils import JWT_SECRET_KEY, encode_jwt_token
+from pymediamanager.index import is_excluded_dir
+from tools.pagination import encode_cursor
+from . import api, media, renditions, search, snapshot, views
+from .autocomplete import Autocomplete, PrefixIndex
+from .cache import get_catalog_version
+from .importer import import_topics
+from .models import Grade, Subject, Topic
+
+LOCMEM = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "session": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "session"},
+}
+
+
+@override_settings(CACHES=LOCMEM)
+class CoreTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Parent.objects.create(name="Parent", mobile_phone="555000111", is_active=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def auth(self, account=None) -> dict:
+        return {"HTTP_AUTHORIZATION": f"Bearer {encode_jwt_token(account or self.parent)}"}
+
+
+class CatalogVersionTests(CoreTestCase):
+    def test_version_is_bumped_after_commit(self):
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Subject.objects.create(name="Math", price=20)
+            self.assertEqual(get_catalog_version(), version)
+
+        self.assertTrue(callbacks)
+        self.assertGreater(get_catalog_version(), version)
+
+
+class DeleteSubjectTests(CoreTestCase):
+    def test_disabled_account_cannot_delete(self):
+        subject = Subject.objects.create(name="Math", price=20)
+        disabled = Parent.objects.create(name="Disabled", mobile_phone="555000222", is_active=False)
+
+        response = self.client.delete(f"/api/content/subjects/{subject.id}/", **self.auth(disabled))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(Subject.objects.filter(id=subject.id).exists())
+
+    def test_deleted_account_cannot_delete(self):
+        subject = Subject.objects.create(name="Math", price=20)
+        deleted = Parent.objects.create(name="Deleted", mobile_phone="555000333", is_active=True)
+        headers = self.auth(deleted)
+        deleted.delete()
+
+        response = self.client.delete(f"/api/content/subjects/{subject.id}/", **headers)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_active_account_deletes(self):
+        subject = Subject.objects.create(name="Math", price=20)
+
+        response = self.client.delete(f"/api/content/subjects/{subject.id}/", **self.auth())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Subject.objects.filter(id=subject.id).exists())
+
+
+class VideoMediaTests(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        patcher = mock.patch.object(media, "MEDIA_ROOT", Path(folder.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.file = Path(folder.name) / "lessons" / "intro.mp4"
+        self.file.parent.mkdir()
+        self.file.write_bytes(b"\0" * 1024)
+
+    def test_video_is_not_read(self):
+        with mock.patch.object(media, "_sha256", side_effect=AssertionError("video was hashed")):
+            value = media.normalize_video({"url": media.MEDIA_URL + "lessons/intro.mp4"})
+
+        self.assertEqual(value["bytes"], 1024)
+        self.assertTrue(value["version"])
+        self.assertNotIn("sha256", value)
+
+    def test_rewritten_video_gets_a_new_version(self):
+        url = media.MEDIA_URL + "lessons/intro.mp4"
+        first = media.normalize_video({"url": url})
+
+        self.file.write_bytes(b"\1" * 2048)
+
+        self.assertNotEqual(media.normalize_video(first)["version"], first["version"])
+
+
+class RenditionTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.root = Path(folder.name)
+        for module in (media, renditions):
+            patcher = mock.patch.object(module, "MEDIA_ROOT", self.root)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        (self.root / "topics").mkdir()
+        Image.new("RGB", (1200, 800), "red").save(self.root / "topics" / "a.jpg")
+
+    def test_topics_carry_signed_renditions(self):
+        Topic.objects.create(name="Fractions", image={"url": media.MEDIA_URL + "topics/a.jpg"})
+
+        image = self.client.get("/api/content/topics/", **self.auth()).json()["results"][0]["image"]
+
+        self.assertEqual(set(image["renditions"]), set(renditions.RENDITION_SIZES))
+        self.assertTrue(image["renditions"]["small"].startswith(renditions.RENDITION_URL + "160x90/cover/"))
+
+    def test_replaced_source_gets_a_new_url(self):
+        url = media.MEDIA_URL + "topics/a.jpg"
+        first = renditions.rendition_url(url, 160, 90)
+
+        response = self.client.get(first, HTTP_ACCEPT="image/webp")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+
+        source = self.root / "topics" / "a.jpg"
+        Image.new("RGB", (1200, 800), "blue").save(source)
+        os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10**9))
+
+        self.assertNotEqual(renditions.rendition_url(url, 160, 90), first)
+
+    def test_broken_source_is_not_found(self):
+        url = renditions.rendition_url(media.MEDIA_URL + "topics/a.jpg", 160, 90)
+        request = RequestFactory().get(url)
+        match = resolve(request.path)
+
+        for error in (Image.DecompressionBombError("too large"), ValueError("unknown format")):
+            with self.subTest(error=error), mock.patch.object(views, "get_rendition", side_effect=error):
+                with self.assertRaises(Http404):
+                    match.func(request, *match.args, **match.kwargs)
+
+    def test_renditions_are_hidden_from_the_media_manager(self):
+        Topic.objects.create(name="Fractions", image={"url": media.MEDIA_URL + "topics/a.jpg"})
+
+        self.assertTrue((self.root / media.RENDITIONS_DIR).is_dir())
+        self.assertTrue(is_excluded_dir(media.RENDITIONS_DIR))
+
+    def test_unsigned_size_is_refused(self):
+        url = renditions.rendition_url(media.MEDIA_URL + "topics/a.jpg", 160, 90)
+
+        response = self.client.get(url.replace("160x90", "1600x900"))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class SnapshotTests(CoreTestCase):
+    url = "/api/content/tree/"
+
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        patcher = mock.patch.object(snapshot, "SNAPSHOT_DIR", Path(folder.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ungraded_topics_are_kept(self):
+        grade = Grade.objects.create(level="5")
+        Topic.objects.create(name="Fractions", grade=grade)
+        Topic.objects.create(name="Drafts")
+
+        tree = self.client.get(self.url, **self.auth()).json()
+
+        self.assertEqual([g["id"] for g in tree], [grade.id, None])
+        self.assertEqual([t["name"] for t in tree[1]["topics"]], ["Drafts"])
+
+    def test_each_encoding_has_its_own_etag(self):
+        Topic.objects.create(name="Fractions")
+
+        gzipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", **self.auth())
+        plain = self.client.get(self.url, **self.auth())
+
+        self.assertEqual(gzipped["Content-Encoding"], "gzip")
+        self.assertNotEqual(gzipped["ETag"], plain["ETag"])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=gzipped["ETag"], **self.auth())
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=plain["ETag"], **self.auth())
+        self.assertEqual(response.status_code, 304)
+
+
+class ImportTopicsTests(CoreTestCase):
+    def run_import(self, text: str) -> dict:
+        return import_topics(io.BytesIO(text.encode()), "topics.csv")
+
+    def test_rows_import_against_unique_names(self):
+        grade = Grade.objects.create(level="5")
+        subject = Subject.objects.create(name="Math", price=20)
+
+        summary = self.run_import("name,grade,subjects\nFractions,5,Math\n")
+
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual(list(Topic.objects.get(name="Fractions").subjects.all()), [subject])
+        self.assertEqual(Topic.objects.get(name="Fractions").grade, grade)
+
+    def test_existing_links_are_not_counted(self):
+        Grade.objects.create(level="5")
+        Subject.objects.create(name="Math", price=20)
+        Subject.objects.create(name="Physics", price=20)
+        self.run_import("name,grade,subjects\nFractions,5,Math\n")
+
+        summary = import_topics(io.BytesIO(b"name,grade,subjects\nFractions,5,Math;Physics;Math\n"), "topics.csv", upsert=True)
+
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual(summary["links"], 1)
+        self.assertEqual(Topic.objects.get(name="Fractions").subjects.count(), 2)
+
+    def test_duplicate_grade_names_are_reported(self):
+        Grade.objects.create(level="5")
+        Grade.objects.create(level="5")
+
+        summary = self.run_import("name,grade\nFractions,5\n")
+
+        self.assertEqual(summary["created"], 0)
+        self.assertIn("ambiguous grade", summary["errors"][0][1])
+        self.assertFalse(Topic.objects.exists())
+
+    def test_duplicate_subject_names_are_reported(self):
+        Grade.objects.create(level="5")
+        Subject.objects.create(name="Math", price=20)
+        Subject.objects.create(name="Math", price=30)
+
+        summary = self.run_import("name,grade,subjects\nFractions,5,Math\n")
+
+        self.assertEqual(summary["errors"], [(2, "ambiguous subjects, several have the name: Math")])
+        self.assertFalse(Topic.objects.exists())
+
+
+class TopicListTests(CoreTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.grade = Grade.objects.create(level="5")
+        cls.math = Subject.objects.create(name="Math")
+        cls.physics = Subject.objects.create(name="Physics")
+        cls.topics = [Topic.objects.create(name=f"Topic {i}", grade=cls.grade) for i in range(5)]
+        for topic in cls.topics:
+            topic.subjects.add(cls.math, cls.physics)
+
+    def get(self, **params):
+        return self.client.get("/api/content/topics/", params, **self.auth())
+
+    def test_pages_follow_the_cursor(self):
+        seen, cursor = [], None
+        while True:
+            body = self.get(limit=2, **({"cursor": cursor} if cursor else {})).json()
+            seen += [topic["id"] for topic in body["results"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, [topic.id for topic in self.topics])
+
+    def test_page_size_does_not_add_queries(self):
+        for limit in (1, 5):
+            with self.subTest(limit=limit), self.assertNumQueries(2):
+                body = self.get(limit=limit).json()
+            self.assertEqual(len(body["results"]), limit)
+            self.assertEqual(len(body["results"][0]["subjects"]), 2)
+            self.assertEqual(body["results"][0]["grade"]["level"], "5")
+
+    def test_filters(self):
+        other = Topic.objects.create(name="Other")
+
+        self.assertEqual([t["id"] for t in self.get(grade=self.grade.id).json()["results"]], [t.id for t in self.topics])
+        self.assertEqual([t["id"] for t in self.get(subject=self.math.id).json()["results"]], [t.id for t in self.topics])
+        self.assertIn(other.id, [t["id"] for t in self.get(limit=10).json()["results"]])
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ("not-a-cursor", encode_cursor("5"), encode_cursor(1, 2)):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get(cursor=cursor).status_code, 400)
+
+
+class SparseFieldsTests(CoreTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.grade = Grade.objects.create(level="5")
+        cls.math = Subject.objects.create(name="Math")
+        cls.topic = Topic.objects.create(name="Fractions", grade=cls.grade, description="Parts of a whole")
+        cls.topic.subjects.add(cls.math)
+
+    def get(self, url: str, fields: str):
+        return self.client.get(url, {"fields": fields}, **self.auth())
+
+    def test_topics_are_pruned_to_the_fields(self):
+        with self.assertNumQueries(1):
+            body = self.get("/api/content/topics/", "name").json()
+
+        self.assertEqual(body["results"], [{"id": self.topic.id, "name": "Fractions"}])
+
+    def test_relations_are_read_only_when_asked_for(self):
+        with self.assertNumQueries(1):
+            body = self.get("/api/content/topics/", "grade").json()
+        self.assertEqual(body["results"], [{"id": self.topic.id, "grade": {"id": self.grade.id, "level": "5"}}])
+
+        with self.assertNumQueries(2):
+            body = self.get("/api/content/topics/", "subjects").json()
+        self.assertEqual(body["results"], [{"id": self.topic.id, "subjects": [{"id": self.math.id, "name": "Math"}]}])
+
+    def test_id_is_always_returned(self):
+        self.assertEqual(self.get("/api/content/subjects/", "name").json(), [{"id": self.math.id, "name": "Math"}])
+        self.assertEqual(self.get("/api/content/grades/", " level ,").json(), [{"id": self.grade.id, "level": "5"}])
+
+    def test_fieldsets_are_cached_apart(self):
+        self.assertIn("description", self.get("/api/content/topics/", "").json()["results"][0])
+        self.assertNotIn("description", self.get("/api/content/topics/", "name").json()["results"][0])
+
+    def test_unknown_fields_are_rejected(self):
+        for url in ("/api/content/topics/", "/api/content/subjects/", f"/api/content/subjects/{self.math.id}/"):
+            with self.subTest(url=url):
+                response = self.get(url, "name,price")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("price", response.json()["detail"])
+
+
+class SearchTests(CoreTestCase):
+    url = "/api/content/search/"
+
+    def setUp(self):
+        super().setUp()
+        self.backend = search.MemoryBackend()
+        patcher = mock.patch.object(search, "_backend", self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def find(self, q: str, **params) -> dict:
+        return self.client.get(self.url, {"q": q, **params}, **self.auth()).json()
+
+    def test_saved_topics_are_indexed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = Topic.objects.create(name="Fractions", description="<p>Adding <b>halves</b></p>")
+            self.assertEqual(self.backend.documents, {})
+
+        self.assertEqual(self.backend.documents[f"topic-{topic.id}"]["body"], "Adding halves")
+        self.assertEqual([hit["id"] for hit in self.find("halves")["results"]], [topic.id])
+
+    def test_subject_filter_follows_links(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            math = Subject.objects.create(name="Math", price=20)
+            linked = Topic.objects.create(name="Fractions")
+            Topic.objects.create(name="Fractions of time")
+            math.topic.add(linked)
+
+        page = self.find("fractions", subject=math.id)
+
+        self.assertEqual(page["count"], 1)
+        self.assertEqual(page["results"][0]["id"], linked.id)
+
+    def test_deleted_topic_leaves_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = Topic.objects.create(name="Fractions")
+        with self.captureOnCommitCallbacks(execute=True):
+            topic.delete()
+
+        self.assertEqual(self.find("fractions")["count"], 0)
+
+    def test_rebuild_indexes_the_whole_catalog(self):
+        Subject.objects.create(name="Math", price=20)
+        Topic.objects.create(name="Fractions")
+        self.backend.add([{"key": "topic-999", "kind": "topic", "id": 999, "title": "Stale", "body": "", "grade": None, "subjects": []}])
+
+        self.assertEqual(search.rebuild(), 2)
+        self.assertEqual(set(self.backend.documents), {f"subject-{Subject.objects.get().id}", f"topic-{Topic.objects.get().id}"})
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex(
+            [
+                ("subject", 1, "მათემატიკა"),
+                ("topic", 2, "Simple Fractions"),
+                ("topic", 3, "Fractions, decimals"),
+            ]
+        )
+
+    def test_any_word_start_matches(self):
+        self.assertEqual([ref for _, ref, _ in self.index.lookup("fract")], [2, 3])
+        self.assertEqual([ref for _, ref, _ in self.index.lookup("decimals")], [3])
+
+    def test_georgian_names_match_in_latin(self):
+        self.assertEqual(self.index.lookup("მათ"), [("subject", 1, "მათემატიკა")])
+        self.assertEqual(self.index.lookup("matem"), [("subject", 1, "მათემატიკა")])
+
+    def test_names_are_returned_once(self):
+        index = PrefixIndex([("topic", 1, "Fractions fractions")])
+        self.assertEqual(len(index.lookup("fr")), 1)
+
+    def test_limit_and_blank_prefix(self):
+        self.assertEqual(len(self.index.lookup("f", limit=1)), 1)
+        self.assertEqual(self.index.lookup("  ,. "), [])
+
+
+class AutocompleteTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.autocomplete = Autocomplete()
+        patchers = [
+            mock.patch.object(api, "autocomplete", self.autocomplete),
+            mock.patch("apps.core.autocomplete.VERSION_CHECK_INTERVAL", 0),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, q: str):
+        return self.client.get("/api/content/autocomplete/", {"q": q}, **self.auth()).json()
+
+    def test_suggests_subjects_and_topics(self):
+        subject = Subject.objects.create(name="Fractions")
+        topic = Topic.objects.create(name="Adding fractions")
+
+        self.assertEqual(
+            self.get("fra"),
+            [
+                {"kind": "subject", "id": subject.id, "name": "Fractions"},
+                {"kind": "topic", "id": topic.id, "name": "Adding fractions"},
+            ],
+        )
+
+    def test_inactive_subjects_are_left_out(self):
+        Subject.objects.create(name="Fractions", is_active=False)
+        self.assertEqual(self.get("fra"), [])
+
+    def test_index_is_rebuilt_when_the_catalog_changes(self):
+        self.assertEqual(self.get("geo"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(name="Geometry")
+
+        self.assertEqual([hit["name"] for hit in self.get("geo")], ["Geometry"])
+
+    def test_unchanged_catalog_reuses_the_index(self):
+        self.get("geo")
+        with self.assertNumQueries(0):
+            self.get("geo")
+
+
+class ProtectedMediaTests(CoreTestCase):
+    url = "/protected/lessons/a.mp4"
+
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.root = Path(folder.name)
+        for patcher in (
+            mock.patch.object(media, "MEDIA_ROOT", self.root),
+            mock.patch.object(views, "PROTECTED_MEDIA_ROOT", self.root / "paid"),
+            mock.patch.object(views, "USE_ACCEL", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        (self.root / "paid" / "lessons").mkdir(parents=True)
+        (self.root / "paid" / "lessons" / "a.mp4").write_bytes(bytes(range(256)) * 4)
+        (self.root / "uploads").mkdir()
+        Image.new("RGB", (640, 360), "red").save(self.root / "uploads" / "cover.jpg")
+
+        self.subject = Subject.objects.create(name="Math", price=20)
+        self.topic = Topic.objects.create(
+            name="Fractions",
+            video={"url": media.MEDIA_URL + "paid/lessons/a.mp4", "poster": media.MEDIA_URL + "uploads/cover.jpg"},
+        )
+        self.subject.topic.add(self.topic)
+
+    def subscribe(self, user=None, subject=None):
+        order = Order.objects.create(user=user, total_amount=20, status="SUCCESS")
+        Subscription.objects.create(user=user, subject=subject or self.subject, order=order)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_subscription_is_required(self):
+        self.assertEqual(self.client.get(self.url, **self.auth()).status_code, 403)
+
+    def test_unknown_file(self):
+        self.subscribe(self.parent)
+
+        # called directly, the 404 page needs the site templates
+        request = RequestFactory().get("/protected/lessons/b.mp4", **self.auth())
+        with self.assertRaises(Http404):
+            views.protected_media(request, "lessons/b.mp4")
+
+    def test_subscriber_gets_ranges(self):
+        self.subscribe(self.parent)
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", **self.auth())
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10)))
+        self.assertEqual(response["Content-Range"], "bytes 0-9/1024")
+
+    def test_nginx_sends_the_file(self):
+        self.subscribe(self.parent)
+
+        with mock.patch.object(views, "USE_ACCEL", True):
+            response = self.client.get(self.url, **self.auth())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], views.PROTECTED_MEDIA_ACCEL + "lessons/a.mp4")
+
+    def test_file_without_subjects_is_denied(self):
+        self.subject.topic.clear()
+        self.subscribe(self.parent)
+
+        self.assertEqual(self.client.get(self.url, **self.auth()).status_code, 403)
+
+    def test_missing_child_matches_no_subscription(self):
+        # a subscription without a user must not be picked up by user_id=None
+        self.subscribe()
+        token = jwt.encode({"account_id": 999999, "account_type": "Child"}, JWT_SECRET_KEY, algorithm="HS256")
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_public_poster_is_copied(self):
+        poster = self.topic.video["poster"]
+
+        self.assertTrue(poster["path"].startswith("paid/_renditions/"))
+        self.assertTrue((self.root / "uploads" / "cover.jpg").is_file())
+
+    def test_paid_copy_keeps_public_renditions(self):
+        (self.root / "paid" / "topics").mkdir()
+        Image.new("RGB", (1200, 800), "blue").save(self.root / "uploads" / "a.jpg")
+        (self.root / "paid" / "topics" / "a.jpg").write_bytes((self.root / "uploads" / "a.jpg").read_bytes())
+
+        public = Topic.objects.create(name="Public", image={"url": media.MEDIA_URL + "uploads/a.jpg"})
+        paid = Topic.objects.create(name="Paid", image={"url": media.MEDIA_URL + "uploads/a.jpg"})
+        paid.image = {**paid.image, "url": media.MEDIA_URL + "paid/topics/a.jpg"}
+        paid.save()
+
+        self.assertTrue(paid.image["webp"]["path"].startswith("paid/_renditions/"))
+        for key in ("webp", "thumb"):
+            self.assertTrue((self.root / public.image[key]["path"]).is_file())
+
+
+class RendererTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(search, "_backend", search.MemoryBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic = Topic.objects.create(name="Fractions")
+
+    def test_msgpack_is_negotiated(self):
+        for url in ("/api/content/topics/", "/api/content/search/?q=fractions"):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT="application/msgpack", **self.auth())
+
+                self.assertEqual(response["Content-Type"], "application/msgpack")
+                self.assertIn("Accept", response["Vary"])
+                self.assertEqual(msgpack.unpackb(response.content)["results"][0]["id"], self.topic.id)
+
+    def test_json_by_default(self):
+        for url in ("/api/content/topics/", "/api/content/search/?q=fractions"):
+            with self.subTest(url=url):
+                response = self.client.get(url, **self.auth())
+
+                self.assertEqual(response["Content-Type"], "application/json; charset=utf-8")
+                self.assertEqual(response.json()["results"][0]["id"], self.topic.id)
+
+    def test_msgpack_aliases(self):
+        for media_type in ("application/x-msgpack", "application/vnd.msgpack"):
+            with self.subTest(media_type=media_type):
+                response = self.client.get("/api/content/topics/", HTTP_ACCEPT=media_type, **self.auth())
+                self.assertEqual(response["Content-Type"], "application/msgpack")
+
+    def test_each_encoding_is_cached_apart(self):
+        packed = self.client.get("/api/content/topics/", HTTP_ACCEPT="application/msgpack", **self.auth())
+        plain = self.client.get("/api/content/topics/", **self.auth())
+
+        self.assertEqual(plain["Content-Type"], "application/json; charset=utf-8")
+        self.assertNotEqual(packed["ETag"], plain["ETag"])
+        self.assertEqual(msgpack.unpackb(packed.content), plain.json())
+
+        response = self.client.get(
+            "/api/content/topics/", HTTP_IF_NONE_MATCH=plain["ETag"], HTTP_ACCEPT="application/msgpack", **self.auth()
+        )
+        self.assertEqual(response.status_code, 200)
@@ -1,3 +1,117 @@
-from django.shortcuts import render
+import mimetypes
+import os
+from urllib.parse import quote
 
-# Create your views here.
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
+from PIL import Image
+
+from apps.user.utils import decode_jwt_payload
+from main import settings
+from .protected import PROTECTED_MEDIA_DIR, entitled_subjects, media_subjects, parse_range
+from .renditions import RENDITION_MODES, check_signature, get_rendition, source_path
+
+PROTECTED_MEDIA_ROOT = settings.MEDIA_ROOT / PROTECTED_MEDIA_DIR
+# nginx location marked `internal` that aliases PROTECTED_MEDIA_ROOT
+PROTECTED_MEDIA_ACCEL = getattr(settings, "PROTECTED_MEDIA_ACCEL", "/_protected/")
+USE_ACCEL = getattr(settings, "PROTECTED_MEDIA_USE_ACCEL", not settings.DEBUG)
+CHUNK_SIZE = 256 * 1024
+
+
+def _token(request):
+    # players can't always send headers, so ?token= works as well
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[7:]
+    return request.GET.get("token")
+
+
+def _read(file, start: int, length: int):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _ranged_file_response(request, file_path, content_type):
+    size = os.path.getsize(file_path)
+    byte_range = parse_range(request.headers.get("Range"), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(file_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read(open(file_path, "rb"), start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+@require_GET
+def protected_media(request, path):
+    payload, state = decode_jwt_payload(_token(request) or "")
+    if not state:
+        return HttpResponse(status=401)
+
+    media_path = f"{PROTECTED_MEDIA_DIR}/{path}"
+    subjects = media_subjects().get(media_path)
+    if subjects is None:
+        raise Http404
+
+    # a paid file no subject sells can't be bought, so nobody is entitled to it
+    if not entitled_subjects(payload) & set(subjects):
+        return HttpResponse(status=403)
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if USE_ACCEL:
+        # nginx streams the file itself and handles Range
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = PROTECTED_MEDIA_ACCEL + quote(path)
+    else:
+        file_path = (PROTECTED_MEDIA_ROOT / path).resolve()
+        if not file_path.is_relative_to(PROTECTED_MEDIA_ROOT.resolve()) or not file_path.is_file():
+            raise Http404
+        response = _ranged_file_response(request, file_path, content_type)
+
+    response["Cache-Control"] = "private, max-age=3600"
+    return response
+
+
+@require_GET
+def media_rendition(request, width, height, mode, version, path):
+    if mode not in RENDITION_MODES or not (width or height):
+        raise Http404
+    if not check_signature(width, height, mode, version, path, request.GET.get("s")):
+        return HttpResponse(status=403)
+
+    source = source_path(path)
+    if source is None:
+        raise Http404
+
+    webp = "image/webp" in request.headers.get("Accept", "")
+    try:
+        target = get_rendition(source, width, height, mode, version, path, webp)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # unreadable, unsupported or oversized sources have no rendition
+        raise Http404
+
+    content_type = "image/webp" if webp else mimetypes.guess_type(path)[0] or "application/octet-stream"
+    response = FileResponse(open(target, "rb"), content_type=content_type)
+    response["Cache-Control"] = "public, max-age=2592000"
+    patch_vary_headers(response, ["Accept"])
+    return response
@@ -1,5 +1,30 @@
-from django.contrib import admin
-from .models import Order, Subscription
+import numpy as np
+from django.contrib import admin, messages
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from apps.core.models import Subject
+from .analytics import get_cohort_report
+from .models import Order, OrderItem, OutboxEvent, Refund, Subscription
+from .refunds import enqueue_refunds
+
+COHORT_PERIODS = 12
+MAX_COHORT_PERIODS = 36
+
+
+def _periods(value) -> int:
+    try:
+        periods = int(value)
+    except (TypeError, ValueError):
+        return COHORT_PERIODS
+    return min(max(periods, 1), MAX_COHORT_PERIODS)
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    autocomplete_fields = ["subject"]
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -8,6 +33,19 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     ordering = ("-created_at",)
     autocomplete_fields = ["user", "subject"]
+    inlines = [OrderItemInline]
+    actions = ["refund_selected"]
+
+    @admin.action(description="არჩეული გადახდების დაბრუნება")
+    def refund_selected(self, request, queryset):
+        # BOG is called by process_outbox, the result shows up under დაბრუნებები
+        summary = enqueue_refunds(queryset)
+        level = messages.WARNING if summary["skipped"] else messages.SUCCESS
+        self.message_user(
+            request,
+            f"დაბრუნება რიგშია: {summary['queued']}, გამოტოვებული: {summary['skipped']}",
+            level,
+        )
     
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -15,4 +53,64 @@ class SubscriptionAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "subject__name")
     list_filter = ("active", "start_date", "end_date")
     ordering = ("-start_date",)
-    autocomplete_fields = ["user", "subject", "order"]
\ No newline at end of file
+    autocomplete_fields = ["user", "subject", "order"]
+
+    def get_urls(self):
+        urls = [
+            path(
+                "cohorts/",
+                self.admin_site.admin_view(self.cohorts_view),
+                name="payments_subscription_cohorts",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def cohorts_view(self, request):
+        periods = _periods(request.GET.get("periods", COHORT_PERIODS))
+        report = get_cohort_report(refresh="refresh" in request.GET)
+        names = Subject.objects.in_bulk(report.subjects.tolist())
+
+        subjects = []
+        for s, subject_id in enumerate(report.subjects.tolist()):
+            rows = []
+            for c in np.flatnonzero(report.sizes[s]):
+                ltv = report.ltv[s, c, :periods]
+                observed = ltv[~np.isnan(ltv)]
+                rows.append({
+                    "cohort": report.month_label(c),
+                    "size": int(report.sizes[s, c]),
+                    "retention": [
+                        None if np.isnan(v) else round(float(v) * 100)
+                        for v in report.retention[s, c, :periods]
+                    ],
+                    "ltv": round(float(observed[-1]), 2) if len(observed) else None,
+                })
+            subjects.append({"subject": names.get(subject_id, subject_id), "rows": rows})
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "კოჰორტების ანალიზი",
+            "periods": range(periods),
+            "subjects": subjects,
+        }
+        return TemplateResponse(request, "admin/payments/subscription/cohorts.html", context)
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("order", "event", "status", "attempts", "next_attempt_at", "sent_at")
+    search_fields = ("order__external_id", "order__bog_id")
+    list_filter = ("status", "event")
+    ordering = ("-created_at",)
+    readonly_fields = ("idempotency_key", "created_at", "sent_at")
+    raw_id_fields = ("order",)
+
+
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = ("order", "amount", "status", "created_at")
+    search_fields = ("order__bog_id", "order__external_id")
+    list_filter = ("status", "created_at")
+    ordering = ("-created_at",)
+    raw_id_fields = ("order",)
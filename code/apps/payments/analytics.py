@@ -0,0 +1,189 @@
+import hashlib
+import logging
+from datetime import timedelta
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from .models import OrderItem, Refund, Subscription
+
+logger = logging.getLogger(__name__)
+
+# bumped when the report's meaning changes, so saved reports are recomputed
+REPORT_VERSION = 3
+# a subscription is charged again every period, renewals extend its end_date by one
+BILLING_PERIOD = timedelta(days=30)
+
+
+class CohortReport(NamedTuple):
+    # subjects[s] is the Subject id of row s in every matrix below
+    subjects: np.ndarray
+    # absolute month index (year * 12 + month - 1) of cohort 0
+    first_month: int
+    # sizes[s, c] - subscriptions started in cohort month c
+    sizes: np.ndarray
+    # retention[s, c, k] - share of cohort c still active k months later (nan = not observed yet)
+    retention: np.ndarray
+    # ltv[s, c, k] - cumulative revenue per cohort member after k months
+    ltv: np.ndarray
+
+    def month_label(self, cohort: int) -> str:
+        year, month = divmod(self.first_month + cohort, 12)
+        return f"{year}-{month + 1:02d}"
+
+
+def _month_index(value) -> int:
+    value = timezone.localtime(value)
+    return value.year * 12 + value.month - 1
+
+
+def _current_month() -> int:
+    return _month_index(timezone.now())
+
+
+def _fingerprint(current_month: int) -> str:
+    # refunds flip Subscription.active and admins can correct item prices, both change the report
+    subscriptions = Subscription.objects.aggregate(
+        count=Count("id"), active=Count("id", filter=Q(active=True)), last_id=Max("id"), last_end=Max("end_date")
+    )
+    items = OrderItem.objects.aggregate(count=Count("id"), last_id=Max("id"), total=Sum("unit_price"))
+    refunds = Refund.objects.aggregate(count=Count("id"), last_id=Max("id"))
+    raw = ":".join(
+        str(value)
+        for value in (REPORT_VERSION, current_month, *subscriptions.values(), *items.values(), *refunds.values())
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def load_columns():
+    """
+    Per subscription: subject id, start and end month, price of one period
+    and whether it is still active. `paid_by` and `paid_month` hold one
+    entry per paid period: the subscription row it belongs to and the month
+    it was charged in.
+    """
+    rows = list(
+        Subscription.objects.annotate(
+            # a basket order is paid once for all its subjects, each subscription earns its own item
+            price=Subquery(
+                OrderItem.objects.filter(order=OuterRef("order"), subject=OuterRef("subject")).values("unit_price")[:1]
+            ),
+        )
+        .order_by()
+        .values_list("subject_id", "start_date", "end_date", "price", "active")
+    )
+    count = len(rows)
+
+    subject_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=count)
+    start = np.fromiter((_month_index(r[1]) for r in rows), dtype=np.int64, count=count)
+    end = np.fromiter((_month_index(r[2]) for r in rows), dtype=np.int64, count=count)
+    amount = np.fromiter((r[3] or 0.0 for r in rows), dtype=np.float64, count=count)
+    active = np.fromiter((r[4] for r in rows), dtype=bool, count=count)
+
+    paid_by, paid_month = [], []
+    for row, (_, started, ended, _, _) in enumerate(rows):
+        for period in range(max(round((ended - started) / BILLING_PERIOD), 1)):
+            paid_by.append(row)
+            paid_month.append(_month_index(started + period * BILLING_PERIOD))
+
+    return subject_ids, start, end, amount, active, np.array(paid_by, dtype=np.int64), np.array(paid_month, dtype=np.int64)
+
+
+def compute_cohorts(subject_ids, start, end, amount, active, paid_by, paid_month, current_month: int) -> CohortReport:
+    if len(subject_ids) == 0:
+        empty = np.zeros((0, 0, 0), dtype=np.float32)
+        return CohortReport(
+            subjects=np.zeros(0, dtype=np.int64),
+            first_month=current_month,
+            sizes=np.zeros((0, 0), dtype=np.int64),
+            retention=empty,
+            ltv=empty,
+        )
+
+    subjects, subject_idx = np.unique(subject_ids, return_inverse=True)
+
+    first_month = int(start.min())
+    n_subjects = len(subjects)
+    n_cohorts = max(current_month - first_month + 1, 1)
+    n_periods = n_cohorts
+
+    cohort = start - first_month
+    # number of whole months each subscription stayed active after its start month,
+    # capped to what can already be observed; a refunded one isn't retained at all
+    duration = np.minimum(end, current_month) - start
+    duration = np.where(active, np.clip(duration, 0, n_periods - 1), 0)
+
+    flat = (subject_idx * n_cohorts + cohort) * n_periods + duration
+    size = n_subjects * n_cohorts * n_periods
+    shape = (n_subjects, n_cohorts, n_periods)
+
+    ended = np.bincount(flat, minlength=size).reshape(shape)
+
+    # survivors[s, c, k] = subscriptions of cohort c active for at least k months
+    survivors = np.flip(np.cumsum(np.flip(ended, -1), -1), -1)
+
+    # every paid period books one price in the month it was charged, refunded subscriptions earn nothing
+    booked = active[paid_by] & (paid_month <= current_month)
+    paid_by, paid_month = paid_by[booked], paid_month[booked]
+    offset = np.clip(paid_month - start[paid_by], 0, n_periods - 1)
+    revenue = np.bincount(
+        (subject_idx[paid_by] * n_cohorts + cohort[paid_by]) * n_periods + offset,
+        weights=amount[paid_by],
+        minlength=size,
+    ).reshape(shape)
+
+    sizes = survivors[:, :, 0]
+    denominator = np.where(sizes > 0, sizes, 1)[:, :, None]
+
+    retention = survivors / denominator
+    ltv = np.cumsum(revenue, -1) / denominator
+
+    unobserved = (np.arange(n_cohorts)[:, None] + np.arange(n_periods)[None, :]) >= n_cohorts
+    unobserved = unobserved[None, :, :] | (sizes == 0)[:, :, None]
+
+    retention[unobserved] = np.nan
+    ltv[unobserved] = np.nan
+
+    return CohortReport(
+        subjects=subjects,
+        first_month=first_month,
+        sizes=sizes.astype(np.int64),
+        retention=retention.astype(np.float32),
+        ltv=ltv.astype(np.float32),
+    )
+
+
+def get_cohort_report(refresh: bool = False) -> CohortReport:
+    current_month = _current_month()
+    path = settings.ANALYTICS_DIR / f"cohorts-{_fingerprint(current_month)}.npz"
+
+    if not refresh and path.is_file():
+        with np.load(path) as data:
+            return CohortReport(
+                subjects=data["subjects"],
+                first_month=int(data["first_month"]),
+                sizes=data["sizes"],
+                retention=data["retention"],
+                ltv=data["ltv"],
+            )
+
+    report = compute_cohorts(*load_columns(), current_month=current_month)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for stale in path.parent.glob("cohorts-*.npz"):
+        stale.unlink(missing_ok=True)
+
+    np.savez_compressed(
+        path,
+        subjects=report.subjects,
+        first_month=np.int64(report.first_month),
+        sizes=report.sizes,
+        retention=report.retention,
+        ltv=report.ltv,
+    )
+    logger.info("Cohort report saved to %s", path)
+
+    return report
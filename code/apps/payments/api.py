@@ -2,25 +2,28 @@ import uuid
 import logging
 from datetime import timedelta
 from ninja import Router
+from ninja.errors import HttpError
 from ninja.security import HttpBearer
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from asgiref.sync import sync_to_async
 from django.utils import timezone
-import httpx
 from main import settings
 from apps.user.utils import decode_jwt_token
 from apps.user.models import Parent
 from apps.core.models import Subject
-from .models import Order, Subscription
-from .schema import CreateOrderRequest, BOGCallbackPayload
-from .bog_client import BOGClient
+from .models import Order, OrderItem, Subscription
+from tools.pagination import clamp_limit, decode_cursor, encode_cursor
+from .schema import CreateOrderRequest, CreateOrderResponse, BOGCallbackPayload, OrderHistoryPage, OrderStatusResponse
+from .outbox import enqueue_order, status_key, publish_status, status_payload
 
 router = Router()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-USE_BOG_MOCK = getattr(settings, "USE_BOG_MOCK", True)
 SITE_URL = settings.SITE_URL
 
 
@@ -40,104 +43,179 @@ class AuthBearer(HttpBearer):
             return None
 
 
-@router.post("/create-order/", auth=AuthBearer())
+@router.post("/create-order/", response=CreateOrderResponse, auth=AuthBearer())
 async def create_order(request, payload: CreateOrderRequest):
     parent = request.auth
-    logger.info("Creating order for user_id: %s, subject_id: %s", parent.id, payload.subject_id)
+    subject_ids = payload.get_subject_ids()
+    logger.info("Creating order for user_id: %s, subject_ids: %s", parent.id, subject_ids)
 
-    try:
-        subject = await sync_to_async(Subject.objects.get)(id=payload.subject_id)
+    if not subject_ids:
+        raise HttpError(400, "No subjects selected")
+
+    subjects = [
+        s async for s in Subject.objects.filter(id__in=subject_ids, is_active=True).only("id", "price")
+    ]
+
+    missing = set(subject_ids) - {s.id for s in subjects}
+    if missing:
+        logger.error("Subjects not found with ids: %s", sorted(missing))
+        raise HttpError(404, f"Subjects not found: {sorted(missing)}")
+
+    basket = []
+    for subject in subjects:
         price = float(subject.price)
         if price <= 0:
             logger.error("Invalid subject price: %s for subject_id: %s", price, subject.id)
-            raise ValueError("Subject price must be > 0")
-        logger.info("Subject price: %s", price)
-    except Subject.DoesNotExist:
-        logger.error("Subject not found with id: %s", payload.subject_id)
-        raise
+            raise HttpError(400, "Subject price must be > 0")
+        basket.append({"product_id": str(subject.id), "quantity": 1, "unit_price": price})
 
-    try:
-        if USE_BOG_MOCK:
-            bog_id = f"TEST_ORDER_{subject.id}_{uuid.uuid4().hex}"
-            redirect_url = f"{SITE_URL}/success"
-            await sync_to_async(Order.objects.create)(
-                user=parent,
-                external_id=payload.external_order_id,
-                bog_id=bog_id,
-                parent_order_id=bog_id,
-                total_amount=price,
-                status="PENDING",
-                redirect_url=redirect_url,
-                subject=subject
-            )
-            logger.info("Created mock order with bog_id: %s", bog_id)
-        else:
-            bog = BOGClient()
-            token = await bog.get_access_token()
-            logger.info("Obtained BOG access token")
-
-            external_order_id = f"{payload.external_order_id}_{uuid.uuid4().hex}"
-            ttl_minutes = payload.ttl if payload.ttl and payload.ttl >= 2 else 15
-
-            body = {
-                "callback_url": f"{SITE_URL}/api/payments/callback/",
-                "external_order_id": external_order_id,
-                "ttl": ttl_minutes,
-                "application_type": payload.application_type.lower(),
-                "payment_method": [payload.payment_method.lower()],
-                "save_card": "recurrent",
-                "purchase_units": {
-                    "currency": "GEL",
-                    "total_amount": price,
-                    "basket": [
-                        {"product_id": str(subject.id), "quantity": 1, "unit_price": price}
-                    ]
-                },
-                "redirect_urls": {
-                    "success": f"{SITE_URL}/success",
-                    "fail": f"{SITE_URL}/fail"
-                }
-            }
+    total_amount = round(sum(item["unit_price"] for item in basket), 2)
+    logger.info("Basket total: %s", total_amount)
 
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-                "Idempotency-Key": str(uuid.uuid4())
-            }
+    external_order_id = f"{payload.external_order_id}_{uuid.uuid4().hex}"
+    ttl_minutes = payload.ttl if payload.ttl and payload.ttl >= 2 else 15
 
-            logger.info("Sending BOG create_order request: %s", body)
-
-            async with httpx.AsyncClient() as client:
-                try:
-                    resp = await client.post(f"{settings.BOG_API_BASE}/ecommerce/orders", json=body, headers=headers)
-                    resp.raise_for_status()
-                    data = resp.json()
-                    logger.info("Received BOG response: %s", data)
-                except httpx.HTTPError as e:
-                    logger.error("BOG API request failed: %s", str(e), exc_info=True)
-                    raise
-
-            bog_id = data["id"]
-            redirect_url = data["_links"]["redirect"]["href"]
-
-            await sync_to_async(Order.objects.create)(
-                user=parent,
-                external_id=external_order_id,
-                bog_id=bog_id,
-                parent_order_id=bog_id,
-                total_amount=price,
-                status="PENDING",
-                redirect_url=redirect_url,
-                subject=subject
-            )
-            logger.info("Order created with bog_id: %s", bog_id)
-
-        return {"order_id": bog_id, "redirect_url": redirect_url, "status": "PENDING"}
+    body = {
+        "callback_url": f"{SITE_URL}/api/payments/callback/",
+        "external_order_id": external_order_id,
+        "ttl": ttl_minutes,
+        "application_type": payload.application_type.lower(),
+        "payment_method": [payload.payment_method.lower()],
+        "save_card": "recurrent",
+        "purchase_units": {
+            "currency": "GEL",
+            "total_amount": total_amount,
+            "basket": basket
+        },
+        "redirect_urls": {
+            "success": f"{SITE_URL}/success",
+            "fail": f"{SITE_URL}/fail"
+        }
+    }
 
+    try:
+        # the order and its outbox event commit together, process_outbox submits it to BOG
+        order = await sync_to_async(enqueue_order)(
+            {
+                "user": parent,
+                "external_id": external_order_id,
+                "total_amount": total_amount,
+                "subject": subjects[0] if len(subjects) == 1 else None,
+            },
+            [(subject, float(subject.price)) for subject in subjects],
+            body,
+        )
+        logger.info("Order %s queued for BOG submission", order.external_id)
     except Exception as e:
         logger.error("Error creating order: %s", str(e), exc_info=True)
         raise
 
+    return {
+        "order_id": external_order_id,
+        "redirect_url": None,
+        "status": "PENDING",
+        "status_url": f"/api/payments/orders/{external_order_id}/status/",
+    }
+
+
+@router.get("/orders/", response=OrderHistoryPage, auth=AuthBearer())
+async def list_orders(request, cursor: str = None, limit: int = 20):
+    parent = request.auth
+    limit = clamp_limit(limit)
+
+    orders = Order.objects.filter(user=parent).order_by("-created_at", "-id")
+
+    if cursor:
+        created_at, last_id = _order_position(cursor)
+        orders = orders.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(id__lt=last_id)
+        )
+
+    rows = [
+        row async for row in
+        orders.values_list("id", "external_id", "status", "total_amount", "created_at")[: limit + 1]
+    ]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][4].isoformat(), rows[-1][0])
+
+    # a basket order is named after all of its subjects
+    names = {}
+    async for order_id, name in OrderItem.objects.filter(
+        order_id__in=[row[0] for row in rows], subject__isnull=False
+    ).order_by("id").values_list("order_id", "subject__name"):
+        names.setdefault(order_id, []).append(name)
+
+    return {
+        "results": [
+            {
+                "order_id": external_id,
+                "status": status,
+                "total_amount": total_amount,
+                "subject_name": ", ".join(names[pk]) if pk in names else None,
+                "created_at": created_at,
+            }
+            for pk, external_id, status, total_amount, created_at in rows
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+def _order_position(cursor: str) -> tuple:
+    position = decode_cursor(cursor, 2)
+    if position is None:
+        raise HttpError(400, "Invalid cursor")
+
+    created_at, last_id = position
+    try:
+        created_at = parse_datetime(created_at) if isinstance(created_at, str) else None
+    except ValueError:
+        created_at = None
+
+    if created_at is None or not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise HttpError(400, "Invalid cursor")
+
+    return created_at, last_id
+
+
+@router.get("/orders/{order_id}/status/", response=OrderStatusResponse, auth=AuthBearer())
+async def order_status(request, order_id: str):
+    # answers at once, clients poll again after `retry_after` (with backoff) while the order is queued
+    parent = request.auth
+
+    data = await cache.aget(status_key(order_id))
+    if data and data.pop("user_id", None) == parent.id:
+        return data
+
+    try:
+        order = await Order.objects.aget(external_id=order_id, user=parent)
+    except Order.DoesNotExist:
+        raise HttpError(404, "Order not found")
+
+    return status_payload(order)
+
+
+def _grant_subscriptions(order: Order) -> tuple:
+    # a repeated success (e.g. a recurrent charge) extends what the order already granted
+    subject_ids = [s for s in order.items.values_list("subject_id", flat=True) if s is not None]
+    existing = {sub.subject_id: sub for sub in Subscription.objects.filter(order=order, subject_id__in=subject_ids)}
+    now = timezone.now()
+
+    extended = list(existing.values())
+    for sub in extended:
+        sub.end_date += timedelta(days=30)
+    Subscription.objects.bulk_update(extended, ["end_date"])
+
+    created = Subscription.objects.bulk_create(
+        Subscription(user_id=order.user_id, subject_id=subject_id, order=order, end_date=now + timedelta(days=30))
+        for subject_id in subject_ids
+        if subject_id not in existing
+    )
+
+    return created, extended
+
 
 @router.post("/callback/")
 @csrf_exempt
@@ -153,8 +231,12 @@ def bog_callback(request, payload: BOGCallbackPayload):
             order = Order.objects.select_for_update().get(bog_id=order_id)
             logger.info("Locked order for update: %s", order.bog_id)
 
-            if status_key in ("COMPLETED", "REFUNDED", "REFUNDED_PARTIALLY"):
+            if status_key == "COMPLETED":
                 order.status = "SUCCESS"
+            elif status_key in ("REFUNDED", "REFUNDED_PARTIALLY"):
+                # a partial refund keeps the subscriptions, refund_orders ends the refunded ones;
+                # a full one may come from the merchant portal and ends them all here
+                order.status = status_key
             elif status_key in ("REJECTED", "ERROR"):
                 order.status = "FAILED"
             else:
@@ -162,20 +244,17 @@ def bog_callback(request, payload: BOGCallbackPayload):
 
             order.save(update_fields=["status"])
             logger.info("Order status updated to: %s", order.status)
+            transaction.on_commit(lambda: publish_status(order))
 
             if order.status == "SUCCESS":
-                sub, created = Subscription.objects.get_or_create(
-                    user=order.user,
-                    subject=order.subject,
-                    order=order,
-                    defaults={"end_date": timezone.now() + timedelta(days=30)}
+                created, extended = _grant_subscriptions(order)
+                logger.info(
+                    "Created %s and extended %s subscriptions for user_id: %s, order: %s",
+                    len(created), len(extended), order.user_id, order.bog_id,
                 )
-                if created:
-                    logger.info("Created new subscription for user_id: %s, subject_id: %s", order.user.id, order.subject.id)
-                else:
-                    sub.end_date += timedelta(days=30)
-                    sub.save()
-                    logger.info("Extended existing subscription for user_id: %s, new end_date: %s", order.user.id, sub.end_date)
+            elif order.status == "REFUNDED":
+                ended = Subscription.objects.filter(order=order, active=True).update(active=False)
+                logger.info("Ended %s subscriptions of refunded order: %s", ended, order.bog_id)
 
     except Order.DoesNotExist:
         logger.warning("Callback received for unknown order_id: %s", payload.body.order_id)
@@ -1,8 +1,13 @@
+import asyncio
 import base64
 import httpx
 import time
 import uuid
 from main import settings
+from .breaker import get_breaker
+
+BOG_TIMEOUT = httpx.Timeout(getattr(settings, "BOG_HTTP_TIMEOUT", 10), connect=3)
+
 
 class BOGClient:
     def __init__(self):
@@ -11,12 +16,40 @@ class BOGClient:
         self.token_url = settings.BOG_OAUTH_TOKEN_URL
         self._access_token = None
         self._expires_at = 0
+        self._token_lock = None
+        self._token_loop = None
+
+    async def _post(self, breaker: str, url: str, **kwargs):
+        async def send():
+            async with httpx.AsyncClient(timeout=BOG_TIMEOUT) as client:
+                resp = await client.post(url, **kwargs)
+                resp.raise_for_status()
+                return resp.json()
+
+        return await get_breaker(breaker).call(send)
+
+    def _lock(self) -> asyncio.Lock:
+        # every asyncio.run() has its own loop and a lock can't be shared between loops
+        loop = asyncio.get_running_loop()
+        if self._token_loop is not loop:
+            self._token_lock, self._token_loop = asyncio.Lock(), loop
+        return self._token_lock
+
+    def _token_valid(self) -> bool:
+        return bool(self._access_token) and time.time() < self._expires_at - 60
 
     async def get_access_token(self):
-        now = time.time()
-        if self._access_token and now < self._expires_at - 60:
+        if self._token_valid():
             return self._access_token
 
+        # concurrent requests wait for a single token fetch instead of each starting one
+        async with self._lock():
+            if self._token_valid():
+                return self._access_token
+            return await self._fetch_token()
+
+    async def _fetch_token(self):
+        now = time.time()
         auth = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
         headers = {
             "Authorization": f"Basic {auth}",
@@ -24,17 +57,31 @@ class BOGClient:
         }
         data = {"grant_type": "client_credentials"}
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(self.token_url, data=data, headers=headers)
-            resp.raise_for_status()
-            j = resp.json()
-            self._access_token = j["access_token"]
-            self._expires_at = now + j.get("expires_in", 0)
-            return self._access_token
+        j = await self._post("oauth", self.token_url, data=data, headers=headers)
+        self._access_token = j["access_token"]
+        self._expires_at = now + j.get("expires_in", 0)
+        return self._access_token
 
-    async def recurrent_charge(self, parent_order_id: str, amount: float, callback_url: str):
+    async def _headers(self, idempotency_key: str = None):
         token = await self.get_access_token()
 
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Idempotency-Key": idempotency_key or str(uuid.uuid4())
+        }
+
+    async def create_order(self, body: dict, idempotency_key: str = None):
+        headers = await self._headers(idempotency_key)
+
+        return await self._post(
+            "create_order",
+            f"{settings.BOG_API_BASE}/ecommerce/orders",
+            json=body,
+            headers=headers
+        )
+
+    async def recurrent_charge(self, parent_order_id: str, amount: float, callback_url: str):
         body = {
             "callback_url": callback_url,
             "purchase_units": {
@@ -43,18 +90,33 @@ class BOGClient:
             }
         }
 
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-            "Idempotency-Key": str(uuid.uuid4())
-        }
+        headers = await self._headers()
+
+        return await self._post(
+            "recurrent_charge",
+            f"{settings.BOG_API_BASE}/ecommerce/orders/{parent_order_id}/recurrent",
+            json=body,
+            headers=headers
+        )
+
+    async def refund(self, order_id: str, amount: float = None, idempotency_key: str = None):
+        body = {"amount": amount} if amount is not None else {}
+        headers = await self._headers(idempotency_key)
+
+        return await self._post(
+            "refund",
+            f"{settings.BOG_API_BASE}/payment/refund/{order_id}",
+            json=body,
+            headers=headers
+        )
+
+
+_client = None
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{settings.BOG_API_BASE}/ecommerce/orders/{parent_order_id}/recurrent",
-                json=body,
-                headers=headers
-            )
-            resp.raise_for_status()
-            return resp.json()
 
+def get_client() -> BOGClient:
+    # shared so the access token outlives a single outbox batch
+    global _client
+    if _client is None:
+        _client = BOGClient()
+    return _client
@@ -0,0 +1,126 @@
+import logging
+import time
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# failure_threshold, window, reset_timeout and slow_call, see BOG_BREAKER in settings
+BREAKER_CONFIG = settings.BOG_BREAKER
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open, retry after {retry_after}s")
+
+
+class CircuitBreaker:
+    """
+    Shared (Redis backed) breaker for one upstream endpoint.
+
+    closed    - calls pass, failures and slow calls are counted within `window`
+    open      - calls fail immediately with CircuitOpenError for `reset_timeout`
+    half-open - one worker gets a probe call through, its result closes or re-opens
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        window: int,
+        reset_timeout: int,
+        slow_call: float,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+
+    def _key(self, suffix: str) -> str:
+        return f"bog:breaker:{self.name}:{suffix}"
+
+    async def _before(self) -> bool:
+        opened_at = await cache.aget(self._key("opened_at"))
+        if opened_at is None:
+            return False
+
+        elapsed = time.time() - opened_at
+        if elapsed < self.reset_timeout:
+            raise CircuitOpenError(self.name, int(self.reset_timeout - elapsed) + 1)
+
+        # half-open: only the worker that wins the probe lock may call upstream
+        if await cache.aadd(self._key("probe"), 1, timeout=self.reset_timeout):
+            logger.info("Circuit %s half-open, probing upstream", self.name)
+            return True
+
+        raise CircuitOpenError(self.name, self.reset_timeout)
+
+    async def _incr(self, suffix: str, timeout: int) -> int:
+        key = self._key(suffix)
+        await cache.aadd(key, 0, timeout=timeout)
+        try:
+            return await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, timeout=timeout)
+            return 1
+
+    async def _open(self):
+        await cache.aset(self._key("opened_at"), time.time(), timeout=self.reset_timeout * 10)
+        await cache.adelete_many([self._key("failures"), self._key("probe")])
+        logger.error("Circuit %s opened", self.name)
+
+    async def _on_success(self, probing: bool):
+        if probing:
+            await cache.adelete_many(
+                [self._key("opened_at"), self._key("failures"), self._key("probe")]
+            )
+            logger.info("Circuit %s closed after successful probe", self.name)
+
+    async def _on_failure(self, probing: bool):
+        if probing:
+            await self._open()
+            return
+
+        failures = await self._incr("failures", timeout=self.window)
+        if failures >= self.failure_threshold:
+            await self._open()
+
+    async def call(self, func, *args, **kwargs):
+        probing = await self._before()
+        started = time.monotonic()
+
+        try:
+            result = await func(*args, **kwargs)
+        except httpx.HTTPStatusError as e:
+            # 4xx means upstream is healthy and rejected our request
+            if e.response.status_code < 500:
+                await self._on_success(probing)
+            else:
+                await self._on_failure(probing)
+            raise
+        except Exception:
+            await self._on_failure(probing)
+            raise
+
+        elapsed = time.monotonic() - started
+        if elapsed > self.slow_call:
+            logger.warning("Slow call on circuit %s: %.2fs", self.name, elapsed)
+            await self._on_failure(probing)
+        else:
+            await self._on_success(probing)
+
+        return result
+
+
+BREAKERS = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    if name not in BREAKERS:
+        BREAKERS[name] = CircuitBreaker(name, **BREAKER_CONFIG)
+    return BREAKERS[name]
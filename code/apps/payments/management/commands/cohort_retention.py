@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+import numpy as np
+
+from apps.core.models import Subject
+from apps.payments.analytics import get_cohort_report
+
+
+class Command(BaseCommand):
+    help = "Monthly subscription cohort retention and LTV per subject"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subject", type=int, help="Only print this subject id")
+        parser.add_argument("--periods", type=int, default=12, help="Months to print per cohort")
+        parser.add_argument("--refresh", action="store_true", help="Ignore the cached artifact")
+
+    def handle(self, *args, **options):
+        report = get_cohort_report(refresh=options["refresh"])
+        periods = options["periods"]
+        names = Subject.objects.in_bulk(report.subjects.tolist())
+
+        for s, subject_id in enumerate(report.subjects.tolist()):
+            if options["subject"] and options["subject"] != subject_id:
+                continue
+
+            subject = names.get(subject_id)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{subject or subject_id}"))
+            self.stdout.write("cohort    size  " + " ".join(f"{f'm{k}':>6}" for k in range(periods)))
+
+            for c in np.flatnonzero(report.sizes[s]):
+                retention = report.retention[s, c, :periods]
+                cells = " ".join("     -" if np.isnan(v) else f"{v:6.0%}" for v in retention)
+                ltv = report.ltv[s, c, :periods]
+                observed = ltv[~np.isnan(ltv)]
+                last_ltv = f"{observed[-1]:.2f}" if len(observed) else "-"
+                self.stdout.write(
+                    f"{report.month_label(c)}  {report.sizes[s, c]:5d}  {cells}  ltv {last_ltv}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(report.subjects)} subjects"))
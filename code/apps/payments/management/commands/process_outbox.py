@@ -0,0 +1,36 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.outbox import process_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Submit pending outbox events (new orders and refunds) to BOG"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=20)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new events")
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds between polls when idle")
+
+    def handle(self, *args, **options):
+        batch = options["batch"]
+
+        while True:
+            try:
+                processed = process_batch(batch)
+            except Exception as e:
+                logger.error("Outbox batch failed: %s", str(e), exc_info=True)
+                processed = 0
+
+            if processed:
+                self.stdout.write(f"Processed {processed} outbox events")
+
+            if not options["loop"]:
+                break
+
+            if processed < batch:
+                time.sleep(options["interval"])
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from apps.payments.models import Order
+from apps.payments.refunds import REFUNDABLE, refund_orders
+
+
+class Command(BaseCommand):
+    help = "Refund successful orders through BOG with bounded concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", help="Order bog_id or external_id values")
+        parser.add_argument("--subject", type=int, help="Refund this subject's item of every order that has it")
+        parser.add_argument("--since", help="Only orders created at or after this datetime")
+        parser.add_argument("--until", help="Only orders created before this datetime")
+        parser.add_argument("--amount", type=float, help="Partial refund amount per order (or per subject item)")
+        parser.add_argument("--concurrency", type=int)
+        parser.add_argument("--rate", type=float, help="Max BOG requests per second")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(status__in=REFUNDABLE)
+
+        if options["ids"]:
+            ids = options["ids"]
+            orders = orders.filter(bog_id__in=ids) | orders.filter(external_id__in=ids)
+        if options["subject"]:
+            orders = orders.filter(items__subject_id=options["subject"])
+        if options["since"]:
+            orders = orders.filter(created_at__gte=parse_datetime(options["since"]))
+        if options["until"]:
+            orders = orders.filter(created_at__lt=parse_datetime(options["until"]))
+
+        if not any(options[k] for k in ("ids", "subject", "since", "until")):
+            raise CommandError("Refusing to refund every order, pass ids or a filter")
+
+        orders = list(orders.distinct())
+        self.stdout.write(f"{len(orders)} orders selected")
+
+        if options["dry_run"]:
+            for order in orders:
+                self.stdout.write(f"{order.bog_id}  {order.external_id}  {order.total_amount}")
+            return
+
+        summary = refund_orders(
+            orders,
+            amount=options["amount"],
+            subject_id=options["subject"],
+            concurrency=options["concurrency"],
+            rate=options["rate"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Refund finished: {summary}"))
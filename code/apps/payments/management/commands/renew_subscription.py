@@ -1,7 +1,7 @@
 # management/commands/renew_subscriptions.py
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from apps.payments.models import Subscription
+from apps.payments.models import OrderItem, Subscription
 from apps.payments.bog_client import BOGClient
 import asyncio
 import logging
@@ -13,23 +13,38 @@ class Command(BaseCommand):
     help = "Renew subscriptions using BOG recurrent payments"
 
     def handle(self, *args, **kwargs):
-        subs = Subscription.objects.filter(end_date__lte=timezone.now(), active=True)
+        subs = Subscription.objects.filter(end_date__lte=timezone.now(), active=True).select_related("order")
         bog = BOGClient()
         results = []
 
+        # a basket order covers several subscriptions but is charged once, for the subjects due
+        orders = {}
         for sub in subs:
+            orders.setdefault(sub.order_id, (sub.order, [], []))
+            orders[sub.order_id][1].append(sub.id)
+            orders[sub.order_id][2].append(sub.subject_id)
+
+        prices = {
+            (order_id, subject_id): unit_price
+            for order_id, subject_id, unit_price in OrderItem.objects.filter(order_id__in=orders).values_list(
+                "order_id", "subject_id", "unit_price"
+            )
+        }
+
+        for order, sub_ids, subject_ids in orders.values():
+            amount = round(sum(prices.get((order.id, subject_id), 0) for subject_id in subject_ids), 2)
             try:
                 asyncio.run(
                     bog.recurrent_charge(
-                        parent_order_id=sub.order.parent_order_id,
-                        amount=sub.order.total_amount,
+                        parent_order_id=order.parent_order_id,
+                        amount=amount or order.total_amount,
                         callback_url=f"{settings.SITE_URL}/api/payments/callback/"
                     )
                 )
-                results.append({"subscription_id": sub.id, "status": "CHARGED"})
-                logger.info(f"Subscription {sub.id} recurrent charge triggered.")
+                results.append({"subscription_ids": sub_ids, "status": "CHARGED"})
+                logger.info(f"Subscriptions {sub_ids} recurrent charge triggered.")
             except Exception as e:
-                results.append({"subscription_id": sub.id, "status": "FAILED", "error": str(e)})
-                logger.error(f"Subscription {sub.id} recurrent charge failed: {str(e)}")
+                results.append({"subscription_ids": sub_ids, "status": "FAILED", "error": str(e)})
+                logger.error(f"Subscriptions {sub_ids} recurrent charge failed: {str(e)}")
         
-        self.stdout.write(self.style.SUCCESS(f"Processed {len(results)} subscriptions"))
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(results)} orders"))
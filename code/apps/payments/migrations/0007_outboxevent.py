@@ -0,0 +1,105 @@
+# Generated by Django 4.2.3 on 2026-10-18 23:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0006_alter_subscription_options_order_parent_order_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event",
+                    models.CharField(
+                        default="create_order", max_length=50, verbose_name="მოვლენა"
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="მონაცემები")),
+                (
+                    "idempotency_key",
+                    models.UUIDField(
+                        default=uuid.uuid4, unique=True, verbose_name="Idempotency Key"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SENT", "Sent"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="სტატუსი",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="მცდელობები"),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="შემდეგი მცდელობა",
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(
+                        blank=True, default="", verbose_name="ბოლო შეცდომა"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="შექმნის თარიღი"
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="გაგზავნის თარიღი"
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outbox_events",
+                        to="payments.order",
+                        verbose_name="გადახდა",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Outbox მოვლენა",
+                "verbose_name_plural": "Outbox მოვლენები",
+                "db_table": "payments_outbox",
+                "ordering": ["next_attempt_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="payments_outbox_due_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.3 on 2026-10-18 23:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_alter_grade_level_alter_subject_is_active_and_more"),
+        ("payments", "0007_outboxevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("unit_price", models.FloatField(verbose_name="ფასი")),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="payments.order",
+                        verbose_name="გადახდა",
+                    ),
+                ),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="core.subject",
+                        verbose_name="საგანი",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "შეკვეთის საგანი",
+                "verbose_name_plural": "შეკვეთის საგნები",
+                "db_table": "payments_order_item",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="orderitem",
+            constraint=models.UniqueConstraint(
+                fields=("order", "subject"), name="payments_order_item_unique_subject"
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.3 on 2026-10-18 23:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0008_orderitem"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("SUCCESS", "Success"),
+                    ("FAILED", "Failed"),
+                    ("REFUNDED_PARTIALLY", "Partially refunded"),
+                    ("REFUNDED", "Refunded"),
+                ],
+                default="PENDING",
+                max_length=50,
+                verbose_name="სტატუსი",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Refund",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.FloatField(blank=True, null=True, verbose_name="თანხა"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("SUCCESS", "Success"), ("FAILED", "Failed")],
+                        max_length=20,
+                        verbose_name="სტატუსი",
+                    ),
+                ),
+                (
+                    "response",
+                    models.JSONField(blank=True, null=True, verbose_name="BOG პასუხი"),
+                ),
+                (
+                    "error",
+                    models.TextField(blank=True, default="", verbose_name="შეცდომა"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="შექმნის თარიღი"
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="refunds",
+                        to="payments.order",
+                        verbose_name="გადახდა",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "დაბრუნება",
+                "verbose_name_plural": "დაბრუნებები",
+                "db_table": "payments_refund",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
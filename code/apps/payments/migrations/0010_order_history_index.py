@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-18 23:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0009_refund"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                include=("external_id", "status", "total_amount"),
+                name="payments_order_history_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def backfill_order_items(apps, schema_editor):
+    # orders from before baskets only carry Order.subject, give them their single item
+    Order = apps.get_model("payments", "Order")
+    OrderItem = apps.get_model("payments", "OrderItem")
+
+    orders = Order.objects.filter(subject__isnull=False, items__isnull=True).values_list("id", "subject_id", "total_amount")
+    OrderItem.objects.bulk_create(
+        (OrderItem(order_id=order_id, subject_id=subject_id, unit_price=total_amount) for order_id, subject_id, total_amount in orders.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0010_order_history_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
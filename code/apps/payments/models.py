@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from main import settings
 from datetime import timedelta
@@ -11,7 +12,13 @@ class Order(models.Model):
     total_amount = models.FloatField(verbose_name="თანხა")
     status = models.CharField(
         max_length=50,
-        choices=[("PENDING", "Pending"), ("SUCCESS", "Success"), ("FAILED", "Failed")],
+        choices=[
+            ("PENDING", "Pending"),
+            ("SUCCESS", "Success"),
+            ("FAILED", "Failed"),
+            ("REFUNDED_PARTIALLY", "Partially refunded"),
+            ("REFUNDED", "Refunded"),
+        ],
         default="PENDING", verbose_name="სტატუსი"
     )
     redirect_url = models.URLField(default="", verbose_name="გადამისამართების URL")
@@ -23,10 +30,33 @@ class Order(models.Model):
     class Meta:
         db_table = "payments_order"
         ordering = ["-created_at"] 
+        indexes = [
+            # the parent order-history page, see api.list_orders; the page query is answered
+            # from the index alone, item names come from OrderItem
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                include=("external_id", "status", "total_amount"),
+                name="payments_order_history_idx",
+            ),
+        ]
         verbose_name = "გადახდა"
         verbose_name_plural = "გადახდები"
 
 
+class OrderItem(models.Model):
+    order = models.ForeignKey("Order", on_delete=models.CASCADE, related_name="items", verbose_name="გადახდა")
+    subject = models.ForeignKey("core.Subject", on_delete=models.SET_NULL, null=True, blank=True, verbose_name="საგანი")
+    unit_price = models.FloatField(verbose_name="ფასი")
+
+    class Meta:
+        db_table = "payments_order_item"
+        constraints = [
+            models.UniqueConstraint(fields=["order", "subject"], name="payments_order_item_unique_subject"),
+        ]
+        verbose_name = "შეკვეთის საგანი"
+        verbose_name_plural = "შეკვეთის საგნები"
+
+
 class Subscription(models.Model):
     user = models.ForeignKey("user.Parent", on_delete=models.CASCADE, null=True, blank=True, verbose_name="მომხმარებელი")
     subject = models.ForeignKey("core.Subject", on_delete=models.CASCADE, verbose_name="საგანი")
@@ -44,4 +74,47 @@ class Subscription(models.Model):
         db_table = "payments_subscription"
         ordering = ["-start_date"]
         verbose_name = "აბონიმენტი"
-        verbose_name_plural = "აბონიმენტები"
\ No newline at end of file
+        verbose_name_plural = "აბონიმენტები"
+
+class OutboxEvent(models.Model):
+    order = models.ForeignKey("Order", on_delete=models.CASCADE, related_name="outbox_events", verbose_name="გადახდა")
+    event = models.CharField(max_length=50, default="create_order", verbose_name="მოვლენა")
+    payload = models.JSONField(verbose_name="მონაცემები")
+    idempotency_key = models.UUIDField(default=uuid.uuid4, unique=True, verbose_name="Idempotency Key")
+    status = models.CharField(
+        max_length=20,
+        choices=[("PENDING", "Pending"), ("SENT", "Sent"), ("FAILED", "Failed")],
+        default="PENDING", verbose_name="სტატუსი"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="მცდელობები")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="შემდეგი მცდელობა")
+    last_error = models.TextField(blank=True, default="", verbose_name="ბოლო შეცდომა")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="შექმნის თარიღი")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="გაგზავნის თარიღი")
+
+    class Meta:
+        db_table = "payments_outbox"
+        ordering = ["next_attempt_at"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="payments_outbox_due_idx")]
+        verbose_name = "Outbox მოვლენა"
+        verbose_name_plural = "Outbox მოვლენები"
+
+
+class Refund(models.Model):
+    order = models.ForeignKey("Order", on_delete=models.CASCADE, related_name="refunds", verbose_name="გადახდა")
+    amount = models.FloatField(null=True, blank=True, verbose_name="თანხა")
+    status = models.CharField(
+        max_length=20,
+        choices=[("SUCCESS", "Success"), ("FAILED", "Failed")],
+        verbose_name="სტატუსი"
+    )
+    response = models.JSONField(null=True, blank=True, verbose_name="BOG პასუხი")
+    error = models.TextField(blank=True, default="", verbose_name="შეცდომა")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="შექმნის თარიღი")
+
+    class Meta:
+        db_table = "payments_refund"
+        ordering = ["-created_at"]
+        verbose_name = "დაბრუნება"
+        verbose_name_plural = "დაბრუნებები"
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+import httpx
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from main import settings
+from .bog_client import BOGClient, get_client
+from .breaker import CircuitOpenError
+from .models import Order, OrderItem, OutboxEvent
+from .refunds import process_refund_events
+
+logger = logging.getLogger(__name__)
+
+USE_BOG_MOCK = getattr(settings, "USE_BOG_MOCK", True)
+SITE_URL = settings.SITE_URL
+
+MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+# a claimed event is retried after this long if its worker dies mid-flight
+LEASE_SECONDS = 60
+STATUS_TTL = 60 * 30
+# seconds a client should wait before polling a queued order again
+POLL_INTERVAL = 1
+
+
+def status_key(external_id: str) -> str:
+    return f"payments:order:{external_id}:status"
+
+
+def status_payload(order: Order) -> dict:
+    submitted = bool(order.parent_order_id)
+    return {
+        "order_id": order.external_id,
+        "status": order.status,
+        "submitted": submitted,
+        # bog_id keeps its DUMMY_BOG_ID default until the worker submits the order
+        "bog_id": order.parent_order_id,
+        "redirect_url": order.redirect_url or None,
+        "retry_after": POLL_INTERVAL if order.status == "PENDING" and not submitted else None,
+    }
+
+
+def publish_status(order: Order):
+    cache.set(
+        status_key(order.external_id),
+        {**status_payload(order), "user_id": order.user_id},
+        timeout=STATUS_TTL,
+    )
+
+
+@transaction.atomic
+def enqueue_order(order_fields: dict, items: list, body: dict) -> Order:
+    order = Order.objects.create(status="PENDING", **order_fields)
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, subject=subject, unit_price=price) for subject, price in items
+    )
+    OutboxEvent.objects.create(order=order, event="create_order", payload=body)
+    return order
+
+
+def claim_events(batch: int = 20) -> list:
+    now = timezone.now()
+
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .select_related("order")
+            .filter(status="PENDING", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch]
+        )
+
+        for event in events:
+            event.attempts += 1
+            event.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+
+        OutboxEvent.objects.bulk_update(events, ["attempts", "next_attempt_at"])
+
+    return events
+
+
+async def _submit(bog: BOGClient, event: OutboxEvent):
+    if USE_BOG_MOCK:
+        bog_id = f"TEST_ORDER_{event.order_id}_{uuid.uuid4().hex}"
+        return {"id": bog_id, "_links": {"redirect": {"href": f"{SITE_URL}/success"}}}
+
+    return await bog.create_order(event.payload, idempotency_key=str(event.idempotency_key))
+
+
+async def submit_events(events: list) -> list:
+    bog = get_client()
+    return await asyncio.gather(
+        *(_submit(bog, event) for event in events), return_exceptions=True
+    )
+
+
+def _apply_result(event: OutboxEvent, result):
+    order = event.order
+    now = timezone.now()
+
+    if isinstance(result, CircuitOpenError):
+        # breaker rejections never reached BOG, so they don't use up an attempt
+        event.attempts -= 1
+        event.next_attempt_at = now + timedelta(seconds=result.retry_after)
+        event.last_error = str(result)
+        event.save(update_fields=["attempts", "next_attempt_at", "last_error"])
+        return
+
+    if isinstance(result, Exception):
+        event.last_error = str(result) or result.__class__.__name__
+
+        # 4xx responses will not succeed on retry
+        rejected = isinstance(result, httpx.HTTPStatusError) and result.response.status_code < 500
+
+        if rejected or event.attempts >= MAX_ATTEMPTS:
+            event.status = "FAILED"
+            order.status = "FAILED"
+            order.save(update_fields=["status", "updated_at"])
+            publish_status(order)
+            logger.error("Outbox event %s for order %s failed permanently: %s", event.id, order.external_id, event.last_error)
+        else:
+            event.next_attempt_at = now + timedelta(seconds=min(2 ** event.attempts, 300))
+            logger.warning("Outbox event %s attempt %s failed: %s", event.id, event.attempts, event.last_error)
+
+        event.save(update_fields=["status", "next_attempt_at", "last_error"])
+        return
+
+    order.bog_id = result["id"]
+    order.parent_order_id = result["id"]
+    order.redirect_url = result["_links"]["redirect"]["href"]
+    order.save(update_fields=["bog_id", "parent_order_id", "redirect_url", "updated_at"])
+
+    event.status = "SENT"
+    event.sent_at = now
+    event.last_error = ""
+    event.save(update_fields=["status", "sent_at", "last_error"])
+
+    publish_status(order)
+    logger.info("Order %s submitted to BOG with bog_id: %s", order.external_id, order.bog_id)
+
+
+def process_batch(batch: int = 20) -> int:
+    events = claim_events(batch)
+    if not events:
+        return 0
+
+    orders = [event for event in events if event.event == "create_order"]
+    refunds = [event for event in events if event.event == "refund"]
+
+    if orders:
+        results = asyncio.run(submit_events(orders))
+
+        for event, result in zip(orders, results):
+            with transaction.atomic():
+                _apply_result(event, result)
+
+    if refunds:
+        process_refund_events(refunds)
+
+    return len(events)
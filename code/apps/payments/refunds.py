@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from main import settings
+from tools import split
+from .bog_client import get_client
+from .models import Order, OrderItem, OutboxEvent, Refund, Subscription
+
+logger = logging.getLogger(__name__)
+
+USE_BOG_MOCK = getattr(settings, "USE_BOG_MOCK", True)
+REFUND_CONCURRENCY = getattr(settings, "BOG_REFUND_CONCURRENCY", 5)
+REFUND_RATE = getattr(settings, "BOG_REFUND_RATE", 5)
+BATCH_SIZE = 100
+
+REFUNDABLE = ("SUCCESS", "REFUNDED_PARTIALLY")
+
+
+class RefundPlan(NamedTuple):
+    order: Order
+    # None refunds the whole order
+    amount: Optional[float]
+    full: bool
+    # subscriptions ended by a partial refund, a full one ends them all
+    subject_ids: list
+    idempotency_key: str
+
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+
+        async with self._lock:
+            now = loop.time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def is_refundable(order: Order) -> bool:
+    # orders still waiting in the outbox keep the default bog_id and can't be refunded
+    return order.status in REFUNDABLE and order.bog_id != "DUMMY_BOG_ID"
+
+
+def plan_refunds(orders: list, amount: float = None, subject_id: int = None) -> list:
+    ids = [order.id for order in orders]
+
+    refunded = defaultdict(float)
+    sequence = defaultdict(int)
+    for order_id, refund_amount in Refund.objects.filter(order_id__in=ids, status="SUCCESS").values_list(
+        "order_id", "amount"
+    ):
+        refunded[order_id] += refund_amount or 0
+        sequence[order_id] += 1
+
+    prices = {}
+    if subject_id is not None:
+        prices = dict(
+            OrderItem.objects.filter(order_id__in=ids, subject_id=subject_id).values_list("order_id", "unit_price")
+        )
+
+    plans = []
+    for order in orders:
+        value = amount
+        if subject_id is not None:
+            # only the subject's own item is refunded from a basket
+            if order.id not in prices:
+                continue
+            value = prices[order.id] if amount is None else amount
+
+        remaining = round(order.total_amount - refunded[order.id], 2)
+        if refunded[order.id] and (value is None or value > remaining):
+            value = remaining
+
+        full = value is None or value >= remaining
+        amount_key = "full" if value is None else f"{value:.2f}"
+
+        plans.append(
+            RefundPlan(
+                order=order,
+                amount=value,
+                full=full,
+                subject_ids=[subject_id] if subject_id is not None and not full else [],
+                # a retried refund replays at BOG, the next partial refund of the same order doesn't
+                idempotency_key=f"refund-{order.bog_id}-{sequence[order.id] + 1}-{amount_key}",
+            )
+        )
+
+    return plans
+
+
+async def _refund_all(plans: list, concurrency: int, rate: float) -> list:
+    bog = get_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+
+    async def refund(plan: RefundPlan):
+        async with semaphore:
+            await limiter.wait()
+
+            if USE_BOG_MOCK:
+                return {"key": "request_received", "message": "mock refund", "action_id": uuid.uuid4().hex}
+
+            return await bog.refund(plan.order.bog_id, plan.amount, idempotency_key=plan.idempotency_key)
+
+    return await asyncio.gather(*(refund(plan) for plan in plans), return_exceptions=True)
+
+
+def _save_results(pairs: list) -> int:
+    now = timezone.now()
+    refunded = 0
+    records = []
+
+    with transaction.atomic():
+        for plan, result in pairs:
+            order = plan.order
+
+            if isinstance(result, Exception):
+                records.append(Refund(order=order, amount=plan.amount, status="FAILED", error=str(result) or result.__class__.__name__))
+                logger.error("Refund of order %s failed: %s", order.bog_id, result)
+                continue
+
+            records.append(Refund(order=order, amount=plan.amount, status="SUCCESS", response=result))
+            refunded += 1
+
+            order.status = "REFUNDED" if plan.full else "REFUNDED_PARTIALLY"
+            Order.objects.filter(id=order.id).update(status=order.status, updated_at=now)
+
+            subscriptions = Subscription.objects.filter(order_id=order.id)
+            if not plan.full:
+                subscriptions = subscriptions.filter(subject_id__in=plan.subject_ids)
+            subscriptions.update(active=False)
+
+        Refund.objects.bulk_create(records)
+
+    return refunded
+
+
+def refund_orders(
+    orders, amount: float = None, subject_id: int = None, concurrency: int = None, rate: float = None
+) -> dict:
+    orders = list(orders)
+    plans = plan_refunds([o for o in orders if is_refundable(o)], amount, subject_id)
+
+    results = asyncio.run(_refund_all(plans, concurrency or REFUND_CONCURRENCY, rate or REFUND_RATE))
+
+    refunded = 0
+    for chunk in split(list(zip(plans, results)), BATCH_SIZE):
+        refunded += _save_results(chunk)
+
+    summary = {
+        "refunded": refunded,
+        "failed": len(plans) - refunded,
+        "skipped": len(orders) - len(plans),
+    }
+    logger.info("Bulk refund finished: %s", summary)
+
+    return summary
+
+
+def enqueue_refunds(orders, amount: float = None, subject_id: int = None) -> dict:
+    """
+    Queue refunds for process_outbox instead of calling BOG from the request
+    thread, see `process_refund_events`.
+    """
+    orders = list(orders)
+    eligible = [o for o in orders if is_refundable(o)]
+
+    OutboxEvent.objects.bulk_create(
+        OutboxEvent(order=order, event="refund", payload={"amount": amount, "subject_id": subject_id})
+        for order in eligible
+    )
+
+    return {"queued": len(eligible), "skipped": len(orders) - len(eligible)}
+
+
+def process_refund_events(events: list):
+    now = timezone.now()
+    pairs = []
+    seen = set()
+
+    for event in events:
+        order = event.order
+
+        if order.id in seen:
+            # the next refund of the same order needs the sequence this one records
+            event.attempts -= 1
+            event.next_attempt_at = now
+            event.save(update_fields=["attempts", "next_attempt_at"])
+            continue
+        seen.add(order.id)
+
+        plans = plan_refunds([order], **event.payload) if is_refundable(order) else []
+        if not plans:
+            event.status = "FAILED"
+            event.last_error = f"Order {order.external_id} can't be refunded"
+            event.save(update_fields=["status", "last_error"])
+            continue
+
+        pairs.append((event, plans[0]))
+
+    if not pairs:
+        return
+
+    results = asyncio.run(_refund_all([plan for _, plan in pairs], REFUND_CONCURRENCY, REFUND_RATE))
+    _save_results([(plan, result) for (_, plan), result in zip(pairs, results)])
+
+    # failures are recorded as Refund rows, the admin decides whether to try again
+    for (event, _), result in zip(pairs, results):
+        failed = isinstance(result, Exception)
+        event.status = "FAILED" if failed else "SENT"
+        event.sent_at = None if failed else now
+        event.last_error = (str(result) or result.__class__.__name__) if failed else ""
+        event.save(update_fields=["status", "sent_at", "last_error"])
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import List
 from typing import Literal, Optional, Any, Dict
 
@@ -17,13 +18,35 @@ class RedirectUrls(BaseModel):
     fail: str
 
 class CreateOrderRequest(BaseModel):
-    subject_id: int
+    subject_id: Optional[int] = None
+    subject_ids: List[int] = []
     external_order_id: str
     callback_url: str
     ttl: int
     application_type: str
     payment_method: str
 
+    def get_subject_ids(self) -> List[int]:
+        ids = self.subject_ids or ([self.subject_id] if self.subject_id else [])
+        return list(dict.fromkeys(ids))
+
+
+class CreateOrderResponse(BaseModel):
+    order_id: str
+    # the order is queued in the outbox, BOG's redirect URL shows up on `status_url`
+    redirect_url: Optional[str] = Field(None, description="Always null here, poll status_url for it")
+    status: str
+    status_url: str
+
+
+class OrderStatusResponse(BaseModel):
+    order_id: str
+    status: str
+    submitted: bool = Field(description="False until the outbox worker has created the order at BOG")
+    bog_id: Optional[str] = Field(None, description="Null until the order is submitted to BOG")
+    redirect_url: Optional[str] = Field(None, description="Null until the order is submitted to BOG")
+    retry_after: Optional[int] = Field(None, description="Seconds to wait before polling again, null when final")
+
 
 class OrderStatus(BaseModel):
     key: str
@@ -45,4 +68,17 @@ class CallbackBody(BaseModel):
 class BOGCallbackPayload(BaseModel):
     event: Literal["order_payment"]
     zoned_request_time: str
-    body: CallbackBody
\ No newline at end of file
+    body: CallbackBody
+
+
+class OrderHistoryItem(BaseModel):
+    order_id: str
+    status: str
+    total_amount: float
+    subject_name: Optional[str]
+    created_at: datetime
+
+
+class OrderHistoryPage(BaseModel):
+    results: List[OrderHistoryItem]
+    next_cursor: Optional[str]
@@ -1,3 +1,521 @@
-from django.test import TestCase
+import asyncio
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.core.models import Subject
+from apps.user.models import Parent
+from apps.user.utils import encode_jwt_token
+from tools.pagination import encode_cursor
+from . import analytics, bog_client, breaker, outbox, refunds
+from .admin import _periods
+from .models import Order, OrderItem, OutboxEvent, Refund, Subscription
+
+LOCMEM = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "session": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "session"},
+}
+
+
+def http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.bog.ge/ecommerce/orders")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+@override_settings(CACHES=LOCMEM)
+class PaymentsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Parent.objects.create(name="Parent", mobile_phone="555000111", is_active=True)
+        cls.math = Subject.objects.create(name="Math", price=20)
+        cls.physics = Subject.objects.create(name="Physics", price=15)
+
+    def setUp(self):
+        cache.clear()
+
+    def auth(self) -> dict:
+        return {"HTTP_AUTHORIZATION": f"Bearer {encode_jwt_token(self.parent)}"}
+
+    def enqueue(self, external_id: str = "order-1", subjects=None) -> Order:
+        subjects = subjects or [self.math]
+        return outbox.enqueue_order(
+            {
+                "user": self.parent,
+                "external_id": external_id,
+                "total_amount": sum(float(s.price) for s in subjects),
+                "subject": subjects[0] if len(subjects) == 1 else None,
+            },
+            [(s, float(s.price)) for s in subjects],
+            {"external_order_id": external_id},
+        )
+
+    def callback(self, order: Order, key: str = "completed"):
+        payload = {
+            "event": "order_payment",
+            "zoned_request_time": timezone.now().isoformat(),
+            "body": {
+                "order_id": order.bog_id,
+                "industry": "ecommerce",
+                "order_status": {"key": key, "value": None},
+                "purchase_units": None,
+                "payment_detail": None,
+            },
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/payments/callback/", payload, content_type="application/json")
+        order.refresh_from_db()
+
+
+@mock.patch.object(outbox, "USE_BOG_MOCK", True)
+class OutboxTests(PaymentsTestCase):
+    def test_enqueue_writes_order_items_and_event(self):
+        order = self.enqueue(subjects=[self.math, self.physics])
+
+        self.assertEqual(order.status, "PENDING")
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(OutboxEvent.objects.get(order=order).status, "PENDING")
+
+    def test_process_batch_submits_and_publishes(self):
+        order = self.enqueue()
+
+        self.assertEqual(outbox.process_batch(), 1)
+
+        order.refresh_from_db()
+        event = OutboxEvent.objects.get(order=order)
+        self.assertEqual(event.status, "SENT")
+        self.assertTrue(order.bog_id.startswith("TEST_ORDER_"))
+        self.assertEqual(order.parent_order_id, order.bog_id)
+        self.assertTrue(order.redirect_url)
+        self.assertEqual(outbox.process_batch(), 0)
+
+    def test_one_token_fetch_per_client(self):
+        for i in range(5):
+            self.enqueue(f"order-{i}")
+        calls = []
+
+        async def post(breaker, url, **kwargs):
+            calls.append(breaker)
+            await asyncio.sleep(0)
+            if breaker == "oauth":
+                return {"access_token": "token", "expires_in": 3600}
+            return {"id": f"bog-{len(calls)}", "_links": {"redirect": {"href": "https://bog.test/pay"}}}
+
+        client = bog_client.BOGClient()
+        with (
+            mock.patch.object(outbox, "USE_BOG_MOCK", False),
+            mock.patch.object(bog_client, "_client", client),
+            mock.patch.object(client, "_post", side_effect=post),
+        ):
+            outbox.process_batch(batch=3)
+            outbox.process_batch(batch=3)
+
+        self.assertEqual(calls.count("oauth"), 1)
+        self.assertEqual(calls.count("create_order"), 5)
+
+    def test_server_error_is_retried_later(self):
+        order = self.enqueue()
+
+        with mock.patch.object(outbox, "_submit", side_effect=http_error(502)):
+            outbox.process_batch()
+
+        event = OutboxEvent.objects.get(order=order)
+        self.assertEqual(event.status, "PENDING")
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        order.refresh_from_db()
+        self.assertEqual(order.status, "PENDING")
+
+    def test_client_error_fails_the_order(self):
+        order = self.enqueue()
+
+        with mock.patch.object(outbox, "_submit", side_effect=http_error(400)):
+            outbox.process_batch()
+
+        order.refresh_from_db()
+        self.assertEqual(OutboxEvent.objects.get(order=order).status, "FAILED")
+        self.assertEqual(order.status, "FAILED")
+
+    def test_claimed_events_are_leased(self):
+        order = self.enqueue()
+
+        self.assertEqual(len(outbox.claim_events()), 1)
+        self.assertEqual(outbox.claim_events(), [])
+
+        OutboxEvent.objects.filter(order=order).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(outbox.claim_events()), 1)
+
+    def test_status_answers_without_waiting(self):
+        order = self.enqueue()
+        url = f"/api/payments/orders/{order.external_id}/status/"
+
+        data = self.client.get(url, **self.auth()).json()
+        self.assertEqual(data["status"], "PENDING")
+        self.assertFalse(data["submitted"])
+        self.assertIsNone(data["bog_id"])
+        self.assertIsNone(data["redirect_url"])
+        self.assertEqual(data["retry_after"], outbox.POLL_INTERVAL)
+
+        outbox.process_batch()
+
+        data = self.client.get(url, **self.auth()).json()
+        self.assertTrue(data["submitted"])
+        self.assertTrue(data["redirect_url"])
+        self.assertIsNone(data["retry_after"])
+
+    def test_status_of_someone_elses_order(self):
+        order = self.enqueue()
+        outbox.process_batch()
+        other = Parent.objects.create(name="Other", mobile_phone="555000222", is_active=True)
+
+        response = self.client.get(
+            f"/api/payments/orders/{order.external_id}/status/",
+            HTTP_AUTHORIZATION=f"Bearer {encode_jwt_token(other)}",
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@mock.patch.object(outbox, "USE_BOG_MOCK", True)
+class CallbackTests(PaymentsTestCase):
+    def submitted(self, subjects=None) -> Order:
+        order = self.enqueue(subjects=subjects)
+        outbox.process_batch()
+        order.refresh_from_db()
+        return order
+
+    def test_basket_grants_one_subscription_per_subject(self):
+        order = self.submitted([self.math, self.physics])
+
+        self.callback(order)
+
+        self.assertEqual(order.status, "SUCCESS")
+        self.assertEqual(
+            sorted(Subscription.objects.filter(order=order).values_list("subject_id", flat=True)),
+            sorted([self.math.id, self.physics.id]),
+        )
+
+    def test_repeated_success_extends_subscription(self):
+        order = self.submitted()
+        self.callback(order)
+        end_date = Subscription.objects.get(order=order).end_date
+
+        self.callback(order)
+
+        sub = Subscription.objects.get(order=order)
+        self.assertEqual(sub.end_date, end_date + timedelta(days=30))
+
+    def test_full_refund_from_bog_ends_subscriptions(self):
+        order = self.submitted([self.math, self.physics])
+        self.callback(order)
+
+        self.callback(order, "refunded")
+
+        self.assertEqual(order.status, "REFUNDED")
+        self.assertFalse(Subscription.objects.filter(order=order, active=True).exists())
+
+    def test_partial_refund_from_bog_keeps_subscriptions(self):
+        order = self.submitted([self.math, self.physics])
+        self.callback(order)
+
+        self.callback(order, "refunded_partially")
+
+        self.assertEqual(order.status, "REFUNDED_PARTIALLY")
+        self.assertEqual(Subscription.objects.filter(order=order, active=True).count(), 2)
+
+
+@override_settings(CACHES=LOCMEM)
+class BreakerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = breaker.CircuitBreaker("test", failure_threshold=3, window=60, reset_timeout=30, slow_call=5.0)
+        self.upstream = mock.AsyncMock(side_effect=http_error(503))
+
+    def fail(self, times: int):
+        for _ in range(times):
+            with self.assertRaises(httpx.HTTPStatusError):
+                asyncio.run(self.breaker.call(self.upstream))
+
+    def test_limits_come_from_settings(self):
+        with mock.patch.dict(breaker.BREAKERS, clear=True):
+            created = breaker.get_breaker("orders")
+
+        for key, value in settings.BOG_BREAKER.items():
+            self.assertEqual(getattr(created, key), value)
+
+    def test_opens_after_threshold(self):
+        self.fail(3)
+
+        with self.assertRaises(breaker.CircuitOpenError) as raised:
+            asyncio.run(self.breaker.call(self.upstream))
+        self.assertEqual(self.upstream.await_count, 3)
+        self.assertLessEqual(raised.exception.retry_after, 31)
+
+    def test_client_errors_do_not_count(self):
+        self.upstream.side_effect = http_error(400)
+        for _ in range(5):
+            with self.assertRaises(httpx.HTTPStatusError):
+                asyncio.run(self.breaker.call(self.upstream))
+
+        self.assertEqual(self.upstream.await_count, 5)
+
+    def test_successful_probe_closes(self):
+        self.fail(3)
+        self.upstream.side_effect = None
+        self.upstream.return_value = "ok"
+
+        later = breaker.time.time() + 31
+        with mock.patch.object(breaker.time, "time", return_value=later):
+            self.assertEqual(asyncio.run(self.breaker.call(self.upstream)), "ok")
+        self.assertEqual(asyncio.run(self.breaker.call(self.upstream)), "ok")
+
+    def test_failed_probe_reopens(self):
+        self.fail(3)
+
+        later = breaker.time.time() + 31
+        with mock.patch.object(breaker.time, "time", return_value=later):
+            self.fail(1)
+            with self.assertRaises(breaker.CircuitOpenError):
+                asyncio.run(self.breaker.call(self.upstream))
+        self.assertEqual(self.upstream.await_count, 4)
+
+
+class CohortTests(TestCase):
+    def compute(self, rows: list, current_month: int = 13):
+        # rows of (start month, end month, price, active, paid months)
+        paid_by = [i for i, row in enumerate(rows) for _ in row[4]]
+        return analytics.compute_cohorts(
+            np.ones(len(rows), dtype=np.int64),
+            np.array([row[0] for row in rows]),
+            np.array([row[1] for row in rows]),
+            np.array([row[2] for row in rows], dtype=np.float64),
+            np.array([row[3] for row in rows]),
+            np.array(paid_by, dtype=np.int64),
+            np.array([month for row in rows for month in row[4]], dtype=np.int64),
+            current_month=current_month,
+        )
+
+    def test_every_paid_period_is_booked_when_paid(self):
+        # one subscription renewed twice, one that lapsed after its first month
+        report = self.compute([(10, 12, 20.0, True, [10, 11, 12]), (10, 10, 10.0, True, [10])])
+
+        self.assertEqual(report.sizes[0, 0], 2)
+        self.assertEqual(report.ltv[0, 0].tolist(), [15.0, 25.0, 35.0, 35.0])
+        self.assertEqual(report.retention[0, 0].tolist(), [1.0, 0.5, 0.5, 0.0])
+
+    def test_refunded_subscription_is_neither_retained_nor_booked(self):
+        report = self.compute([(10, 12, 20.0, True, [10, 11, 12]), (10, 12, 20.0, False, [10, 11, 12])])
+
+        self.assertEqual(report.retention[0, 0].tolist(), [1.0, 0.5, 0.5, 0.0])
+        self.assertEqual(report.ltv[0, 0].tolist(), [10.0, 20.0, 30.0, 30.0])
+
+    def test_renewals_become_paid_periods(self):
+        parent = Parent.objects.create(name="Parent", mobile_phone="555000111", is_active=True)
+        math = Subject.objects.create(name="Math", price=20)
+        order = Order.objects.create(user=parent, external_id="order", total_amount=20, status="SUCCESS")
+        OrderItem.objects.create(order=order, subject=math, unit_price=20)
+        subscription = Subscription.objects.create(user=parent, subject=math, order=order)
+        Subscription.objects.filter(id=subscription.id).update(end_date=subscription.start_date + 3 * analytics.BILLING_PERIOD)
+
+        *_, paid_by, paid_month = analytics.load_columns()
+
+        self.assertEqual(paid_by.tolist(), [0, 0, 0])
+        self.assertEqual(
+            paid_month.tolist(),
+            [analytics._month_index(subscription.start_date + i * analytics.BILLING_PERIOD) for i in range(3)],
+        )
+
+    def test_refund_changes_the_fingerprint(self):
+        parent = Parent.objects.create(name="Parent", mobile_phone="555000111", is_active=True)
+        math = Subject.objects.create(name="Math", price=20)
+        order = Order.objects.create(user=parent, external_id="order", total_amount=20, status="SUCCESS")
+        item = OrderItem.objects.create(order=order, subject=math, unit_price=20)
+        subscription = Subscription.objects.create(user=parent, subject=math, order=order)
+        fingerprint = analytics._fingerprint(13)
+
+        Subscription.objects.filter(id=subscription.id).update(active=False)
+        self.assertNotEqual(analytics._fingerprint(13), fingerprint)
+
+        fingerprint = analytics._fingerprint(13)
+        OrderItem.objects.filter(id=item.id).update(unit_price=15)
+        self.assertNotEqual(analytics._fingerprint(13), fingerprint)
+
+    def test_report_periods_are_clamped(self):
+        for value, periods in (("6", 6), ("abc", 12), (None, 12), ("-3", 1), ("0", 1), ("1000", 36)):
+            with self.subTest(value=value):
+                self.assertEqual(_periods(value), periods)
+
+    def test_basket_items_carry_their_own_price(self):
+        parent = Parent.objects.create(name="Parent", mobile_phone="555000111", is_active=True)
+        math = Subject.objects.create(name="Math", price=20)
+        physics = Subject.objects.create(name="Physics", price=15)
+        order = Order.objects.create(user=parent, external_id="basket", total_amount=35, status="SUCCESS")
+        for subject in (math, physics):
+            OrderItem.objects.create(order=order, subject=subject, unit_price=float(subject.price))
+            Subscription.objects.create(user=parent, subject=subject, order=order)
+
+        subject_ids, _, _, amount, *_ = analytics.load_columns()
+
+        self.assertEqual(dict(zip(subject_ids.tolist(), amount.tolist())), {math.id: 20.0, physics.id: 15.0})
+
+
+class OrderHistoryTests(PaymentsTestCase):
+    url = "/api/payments/orders/"
+
+    def test_pages_follow_the_cursor(self):
+        for i in range(5):
+            self.enqueue(f"order-{i}")
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get(self.url, params, **self.auth()).json()
+            seen += [row["order_id"] for row in page["results"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(seen, [f"order-{i}" for i in reversed(range(5))])
+
+    def test_malformed_cursor_is_rejected(self):
+        for position in (["not a date", 1], [None, 1], [timezone.now().isoformat(), "1"], ["2026-13-45T00:00:00", 1]):
+            with self.subTest(position=position):
+                response = self.client.get(self.url, {"cursor": encode_cursor(*position)}, **self.auth())
+                self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.url, {"cursor": "%%%"}, **self.auth())
+        self.assertEqual(response.status_code, 400)
+
+    def test_basket_is_named_after_its_subjects(self):
+        self.enqueue("basket", [self.math, self.physics])
+
+        row = self.client.get(self.url, **self.auth()).json()["results"][0]
+
+        self.assertEqual(row["subject_name"], "Math, Physics")
+
+    def test_page_size_does_not_add_queries(self):
+        # auth, the order page and the item names of the whole page
+        self.enqueue("basket", [self.math, self.physics])
+        with self.assertNumQueries(3):
+            self.client.get(self.url, **self.auth())
+
+        for i in range(5):
+            self.enqueue(f"order-{i}", [self.math])
+        with self.assertNumQueries(3):
+            self.client.get(self.url, **self.auth())
+
+
+@mock.patch.object(refunds, "USE_BOG_MOCK", True)
+class RefundTests(PaymentsTestCase):
+    def paid(self, external_id: str = "order-1", subjects=None) -> Order:
+        subjects = subjects or [self.math]
+        order = self.enqueue(external_id, subjects)
+        order.status = "SUCCESS"
+        order.bog_id = f"BOG_{external_id}"
+        order.save()
+        for subject in subjects:
+            Subscription.objects.create(user=self.parent, subject=subject, order=order)
+        return order
+
+    def active(self, order: Order) -> list:
+        return sorted(Subscription.objects.filter(order=order, active=True).values_list("subject_id", flat=True))
+
+    def test_full_refund_ends_subscriptions(self):
+        order = self.paid(subjects=[self.math, self.physics])
+
+        summary = refunds.refund_orders([order])
+
+        order.refresh_from_db()
+        self.assertEqual(summary, {"refunded": 1, "failed": 0, "skipped": 0})
+        self.assertEqual(order.status, "REFUNDED")
+        self.assertEqual(self.active(order), [])
+
+    def test_partial_refund_keeps_subscriptions(self):
+        order = self.paid(subjects=[self.math, self.physics])
+
+        refunds.refund_orders([order], amount=5)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, "REFUNDED_PARTIALLY")
+        self.assertEqual(self.active(order), [self.math.id, self.physics.id])
+
+    def test_repeated_partial_refunds_use_new_keys(self):
+        order = self.paid()
+
+        first = refunds.plan_refunds([order], amount=5)[0]
+        refunds.refund_orders([order], amount=5)
+        order.refresh_from_db()
+        second = refunds.plan_refunds([order], amount=5)[0]
+
+        self.assertEqual(first.idempotency_key, f"refund-{order.bog_id}-1-5.00")
+        self.assertEqual(second.idempotency_key, f"refund-{order.bog_id}-2-5.00")
+
+        # what is left is refunded in full
+        last = refunds.plan_refunds([order])[0]
+        self.assertEqual(last.amount, 15)
+        self.assertTrue(last.full)
+
+    def test_failed_refund_keeps_its_key(self):
+        order = self.paid()
+
+        with mock.patch.object(refunds, "USE_BOG_MOCK", False), \
+                mock.patch.object(bog_client.BOGClient, "refund", side_effect=http_error(502)):
+            summary = refunds.refund_orders([order], amount=5)
+
+        order.refresh_from_db()
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(order.status, "SUCCESS")
+        self.assertEqual(Refund.objects.get(order=order).status, "FAILED")
+        self.assertEqual(refunds.plan_refunds([order], amount=5)[0].idempotency_key, f"refund-{order.bog_id}-1-5.00")
+
+    def test_subject_refund_only_touches_its_item(self):
+        basket = self.paid("basket", [self.math, self.physics])
+        other = self.paid("physics-only", [self.physics])
+
+        summary = refunds.refund_orders([basket, other], subject_id=self.math.id)
+
+        basket.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(summary, {"refunded": 1, "failed": 0, "skipped": 1})
+        self.assertEqual(basket.status, "REFUNDED_PARTIALLY")
+        self.assertEqual(Refund.objects.get(order=basket).amount, 20)
+        self.assertEqual(self.active(basket), [self.physics.id])
+        self.assertEqual(other.status, "SUCCESS")
+
+    def test_subject_filter_of_the_command(self):
+        basket = self.paid("basket", [self.math, self.physics])
+        self.paid("physics-only", [self.physics])
+
+        call_command("refund_orders", subject=self.math.id, stdout=io.StringIO())
+
+        self.assertEqual(list(Refund.objects.values_list("order_id", "amount")), [(basket.id, 20)])
+
+    def test_admin_action_enqueues(self):
+        order = self.paid()
+
+        summary = refunds.enqueue_refunds(Order.objects.filter(id=order.id))
+
+        self.assertEqual(summary, {"queued": 1, "skipped": 0})
+        self.assertFalse(Refund.objects.exists())
+
+        OutboxEvent.objects.filter(order=order, event="create_order").update(status="SENT")
+        self.assertEqual(outbox.process_batch(), 1)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, "REFUNDED")
+        self.assertEqual(OutboxEvent.objects.get(order=order, event="refund").status, "SENT")
+
+    def test_partial_callback_keeps_partial_status(self):
+        order = self.paid()
+        refunds.refund_orders([order], amount=5)
+
+        self.callback(order, "refunded_partially")
+
+        self.assertEqual(order.status, "REFUNDED_PARTIALLY")
+        self.assertEqual(self.active(order), [self.math.id])
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Parent, Child
+from .models import User, Parent, Child, TopicProgress
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -23,3 +23,12 @@ class ChildAdmin(admin.ModelAdmin):
     list_filter = ('grade',)
     search_fields = ('name', 'parent__name')
     readonly_fields = ['otp_code', 'otp_expiry']
+
+
+@admin.register(TopicProgress)
+class TopicProgressAdmin(admin.ModelAdmin):
+    list_display = ('child', 'topic', 'position', 'watched_seconds', 'completed', 'updated_at')
+    list_filter = ('completed',)
+    search_fields = ('child__name', 'topic__name')
+    raw_id_fields = ('child', 'topic')
+    readonly_fields = ('updated_at',)
@@ -4,9 +4,16 @@ from apps.user.models import (
     Parent,
     Child,
 )
-from .utils import encode_jwt_token, decode_jwt_token
+from .progress import clamp_watched, encode_event, record
+from .utils import encode_jwt_token, decode_jwt_token, decode_jwt_payload
 from ninja.security import HttpBearer
-from .schema import TokenSchema, ChildRegisterSchema, OTPResponseSchema
+from .schema import (
+    TokenSchema,
+    ChildRegisterSchema,
+    OTPResponseSchema,
+    ProgressBatchSchema,
+    ProgressAcceptedSchema,
+)
 from django.core.exceptions import ValidationError
 import random
 from datetime import datetime, timedelta
@@ -25,6 +32,17 @@ class AuthBearer(HttpBearer):
         return account
 
 
+class ChildAuthBearer(HttpBearer):
+    # heartbeats are too frequent for a Child lookup per request, the signed token is enough
+    def authenticate(self, request, token):
+        payload, state = decode_jwt_payload(token)
+
+        if not state or payload.get("account_type") != "Child":
+            return None
+
+        return payload
+
+
 @router.post("/parent/register/")
 def register(
     request,
@@ -102,3 +120,17 @@ def child_login(request, otp_code: str = Form(...)):
         "refresh_token": tokens["refresh_token"],
         "message": f"Child {child.name} logged in successfully."
     }
+
+
+@router.post("/child/progress/", response={202: ProgressAcceptedSchema}, auth=ChildAuthBearer())
+def child_progress(request, data: ProgressBatchSchema):
+    if len(data.events) > 100:
+        raise HttpError(400, "Too many events in one batch")
+
+    child_id = request.auth["account_id"]
+    record(clamp_watched(child_id, [
+        encode_event(child_id, e.topic_id, e.position, e.duration, e.watched, e.completed)
+        for e in data.events
+    ]))
+
+    return 202, {"accepted": len(data.events)}
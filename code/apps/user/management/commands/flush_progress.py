@@ -0,0 +1,39 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.user.progress import flush
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Aggregate buffered learning-progress heartbeats into TopicProgress rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=10000, help="Max events per flush")
+        parser.add_argument("--loop", action="store_true", help="Keep flushing at a fixed interval")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between flushes")
+
+    def handle(self, *args, **options):
+        batch = options["batch"]
+
+        while True:
+            started = time.monotonic()
+
+            try:
+                events, rows = flush(batch)
+            except Exception as e:
+                logger.error("Progress flush failed: %s", str(e), exc_info=True)
+                events = rows = 0
+
+            if events:
+                self.stdout.write(f"Flushed {events} events into {rows} progress rows")
+
+            if not options["loop"]:
+                break
+
+            # a full batch means there is a backlog, keep draining without waiting
+            if events < batch:
+                time.sleep(max(options["interval"] - (time.monotonic() - started), 0))
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.3 on 2026-10-19 00:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_search_document"),
+        ("user", "0002_alter_child_name_alter_child_parent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TopicProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.FloatField(default=0, verbose_name="პოზიცია (წმ)")),
+                (
+                    "duration",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="ხანგრძლივობა (წმ)"
+                    ),
+                ),
+                (
+                    "watched_seconds",
+                    models.FloatField(default=0, verbose_name="ნანახი (წმ)"),
+                ),
+                (
+                    "completed",
+                    models.BooleanField(default=False, verbose_name="დასრულებული"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="განახლების თარიღი",
+                    ),
+                ),
+                (
+                    "child",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress",
+                        to="user.child",
+                        verbose_name="ბავშვი",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress",
+                        to="core.topic",
+                        verbose_name="თემა",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "პროგრესი",
+                "verbose_name_plural": "პროგრესი",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="topicprogress",
+            constraint=models.UniqueConstraint(
+                fields=("child", "topic"), name="user_topic_progress_uniq"
+            ),
+        ),
+    ]
@@ -123,6 +123,25 @@ class Child(models.Model):
         verbose_name = "ბავშვი"
         verbose_name_plural = "ბავშვები"
 
+class TopicProgress(models.Model):
+    child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name="progress", verbose_name="ბავშვი")
+    topic = models.ForeignKey("core.Topic", on_delete=models.CASCADE, related_name="progress", verbose_name="თემა")
+    position = models.FloatField(default=0, verbose_name="პოზიცია (წმ)")
+    duration = models.FloatField(null=True, blank=True, verbose_name="ხანგრძლივობა (წმ)")
+    watched_seconds = models.FloatField(default=0, verbose_name="ნანახი (წმ)")
+    completed = models.BooleanField(default=False, verbose_name="დასრულებული")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="განახლების თარიღი")
+
+    def __str__(self):
+        return f"{self.child_id}:{self.topic_id}"
+
+    class Meta:
+        verbose_name = "პროგრესი"
+        verbose_name_plural = "პროგრესი"
+        constraints = [
+            models.UniqueConstraint(fields=["child", "topic"], name="user_topic_progress_uniq"),
+        ]
+
 class ParentRefreshToken(models.Model):
     parent = models.ForeignKey("user.Parent", on_delete=models.CASCADE, related_name="refresh_tokens")
     token = models.CharField(max_length=255, unique=True)
@@ -0,0 +1,222 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from itertools import count
+
+import redis
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.models import Topic
+from main import settings
+from .models import Child, TopicProgress
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_STREAM = getattr(settings, "PROGRESS_STREAM", "redis")
+STREAM_KEY = "progress:events"
+GROUP = "progress-flushers"
+STREAM_MAXLEN = getattr(settings, "PROGRESS_STREAM_MAXLEN", 1_000_000)
+# events claimed by a flusher that died are taken over after this long
+CLAIM_IDLE_MS = 60_000
+# a single heartbeat can't add more watch time than this
+MAX_WATCHED = 300
+
+# every event is a flat dict of strings so it fits a Redis stream entry:
+# c - child id, t - topic id, p - position, d - duration, w - watched seconds, x - completed
+
+
+def encode_event(child_id: int, topic_id: int, position: float, duration, watched: float, completed: bool) -> dict:
+    return {
+        "c": child_id,
+        "t": topic_id,
+        "p": max(position, 0),
+        "d": "" if duration is None else duration,
+        "w": min(max(watched, 0), MAX_WATCHED),
+        "x": int(completed),
+    }
+
+
+def clamp_watched(child_id: int, events: list) -> list:
+    """
+    A child watches one video at a time, so the events of a request can't add
+    more watch time than has passed since the child's previous request.
+    """
+    key = f"progress:last-seen:{child_id}"
+    now = time.time()
+    last = cache.get(key)
+    cache.set(key, now, timeout=MAX_WATCHED)
+
+    budget = MAX_WATCHED if last is None else min(max(now - last, 0), MAX_WATCHED)
+    for event in events:
+        event["w"] = min(event["w"], budget)
+        budget -= event["w"]
+
+    return events
+
+
+class RedisStream:
+    def __init__(self, url: str = None):
+        self.client = redis.Redis.from_url(url or settings.REDIS_URI, decode_responses=True)
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._group_ready = False
+
+    def add(self, events: list):
+        pipe = self.client.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(STREAM_KEY, event, maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def read(self, batch: int) -> list:
+        self._ensure_group()
+
+        _, claimed, _ = self.client.xautoclaim(
+            STREAM_KEY, GROUP, self.consumer, min_idle_time=CLAIM_IDLE_MS, start_id="0-0", count=batch
+        )
+        entries = list(claimed)
+
+        if len(entries) < batch:
+            response = self.client.xreadgroup(GROUP, self.consumer, {STREAM_KEY: ">"}, count=batch - len(entries))
+            for _, messages in response:
+                entries += messages
+
+        return entries
+
+    def ack(self, ids: list):
+        if ids:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(STREAM_KEY, GROUP, *ids)
+            pipe.xdel(STREAM_KEY, *ids)
+            pipe.execute()
+
+
+# per-process buffer for development and tests, where no Redis runs; nothing
+# outside the process can read it, so `record` flushes it right away
+class MemoryStream:
+    def __init__(self, maxlen: int = STREAM_MAXLEN):
+        self.buffer = deque(maxlen=maxlen)
+        self.ids = count(1)
+        self.lock = threading.Lock()
+
+    def add(self, events: list):
+        with self.lock:
+            self.buffer.extend((str(next(self.ids)), {k: str(v) for k, v in event.items()}) for event in events)
+
+    def read(self, batch: int) -> list:
+        with self.lock:
+            return [self.buffer.popleft() for _ in range(min(batch, len(self.buffer)))]
+
+    def ack(self, ids: list):
+        pass
+
+
+_stream = None
+
+
+def get_stream():
+    global _stream
+    if _stream is None:
+        _stream = MemoryStream() if PROGRESS_STREAM == "memory" else RedisStream()
+    return _stream
+
+
+def record(events: list):
+    stream = get_stream()
+    stream.add(events)
+
+    if isinstance(stream, MemoryStream):
+        flush()
+
+
+def coalesce(entries: list) -> dict:
+    progress = {}
+
+    for _, event in entries:
+        try:
+            key = (int(event["c"]), int(event["t"]))
+            position, watched = float(event["p"]), float(event["w"])
+            duration = float(event["d"]) if event.get("d") else None
+        except (KeyError, ValueError):
+            continue
+
+        item = progress.setdefault(key, {"position": 0.0, "duration": None, "watched": 0.0, "completed": False})
+        # stream order is arrival order, so the last heartbeat holds the current position
+        item["position"] = position
+        item["duration"] = duration or item["duration"]
+        item["watched"] += watched
+        item["completed"] = item["completed"] or event.get("x") == "1"
+
+    return progress
+
+
+def _save(progress: dict) -> int:
+    child_ids = {child_id for child_id, _ in progress}
+    topic_ids = {topic_id for _, topic_id in progress}
+    valid_children = set(Child.objects.filter(id__in=child_ids).values_list("id", flat=True))
+    valid_topics = set(Topic.objects.filter(id__in=topic_ids).values_list("id", flat=True))
+
+    progress = {
+        key: item for key, item in progress.items() if key[0] in valid_children and key[1] in valid_topics
+    }
+    if not progress:
+        return 0
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            (row.child_id, row.topic_id): row
+            for row in TopicProgress.objects.select_for_update()
+            .filter(child_id__in=valid_children, topic_id__in=valid_topics)
+            .only("child_id", "topic_id", "watched_seconds", "completed", "duration")
+        }
+
+        rows = []
+        for (child_id, topic_id), item in progress.items():
+            current = existing.get((child_id, topic_id))
+            rows.append(
+                TopicProgress(
+                    child_id=child_id,
+                    topic_id=topic_id,
+                    position=item["position"],
+                    duration=item["duration"] or (current.duration if current else None),
+                    watched_seconds=item["watched"] + (current.watched_seconds if current else 0),
+                    completed=item["completed"] or (current.completed if current else False),
+                    updated_at=now,
+                )
+            )
+
+        TopicProgress.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["child", "topic"],
+            update_fields=["position", "duration", "watched_seconds", "completed", "updated_at"],
+        )
+
+    return len(rows)
+
+
+def flush(batch: int = 10_000) -> tuple:
+    stream = get_stream()
+    entries = stream.read(batch)
+    if not entries:
+        return 0, 0
+
+    saved = _save(coalesce(entries))
+    stream.ack([entry_id for entry_id, _ in entries])
+
+    return len(entries), saved
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from ninja import Schema, Form
 
 class RegisterSchema(Schema):
@@ -21,4 +23,17 @@ class ChildLoginSchema(Schema):
 
 class OTPResponseSchema(Schema):
     message: str
-    otp_code: str = None 
\ No newline at end of file
+    otp_code: str = None 
+
+class ProgressEventSchema(Schema):
+    topic_id: int
+    position: float
+    duration: Optional[float] = None
+    watched: float = 0
+    completed: bool = False
+
+class ProgressBatchSchema(Schema):
+    events: List[ProgressEventSchema]
+
+class ProgressAcceptedSchema(Schema):
+    accepted: int
@@ -1,3 +1,53 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.core.models import Topic
+from . import progress
+from .models import Child, Parent, TopicProgress
+
+LOCMEM = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "session": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "session"},
+}
+
+
+@override_settings(CACHES=LOCMEM)
+class ProgressTests(TestCase):
+    url = "/api/user/child/progress/"
+
+    @classmethod
+    def setUpTestData(cls):
+        parent = Parent.objects.create(name="Parent", mobile_phone="555000111", is_active=True)
+        cls.child = Child.objects.create(parent=parent, name="Child", grade=5)
+        cls.topic = Topic.objects.create(name="Fractions")
+        cls.token = cls.child.generate_tokens()["access_token"]
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(progress, "_stream", progress.MemoryStream())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, events: list):
+        return self.client.post(
+            self.url, {"events": events}, content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+
+    def test_memory_stream_is_flushed_in_process(self):
+        response = self.send([{"topic_id": self.topic.id, "position": 42, "duration": 600, "watched": 10}])
+
+        self.assertEqual(response.status_code, 202)
+        row = TopicProgress.objects.get(child=self.child, topic=self.topic)
+        self.assertEqual(row.position, 42)
+        self.assertEqual(row.watched_seconds, 10)
+
+    def test_watch_time_is_bounded_by_wall_clock(self):
+        events = [{"topic_id": self.topic.id, "position": i, "watched": progress.MAX_WATCHED} for i in range(100)]
+
+        self.send(events)
+        self.send(events)
+
+        row = TopicProgress.objects.get(child=self.child, topic=self.topic)
+        self.assertLess(row.watched_seconds, progress.MAX_WATCHED + 1)
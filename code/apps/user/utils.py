@@ -25,5 +25,10 @@ def decode_jwt_token(token):
         return None, False
     except (jwt.InvalidTokenError, Parent.DoesNotExist):
         return None, False
-    
-    
+
+
+def decode_jwt_payload(token):
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"]), True
+    except jwt.InvalidTokenError:
+        return None, False
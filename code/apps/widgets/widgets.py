@@ -1,3 +1,5 @@
+import json
+
 from django.forms import TextInput
 
 
@@ -31,6 +33,18 @@ class ImageWidget(Widget):
 class VideoWidget(Widget):
     widget_type = "video"
 
+    def get_context(self, name, value, attrs):
+        # the widget shows and posts the poster as an image URL, not its rendition dict
+        try:
+            data = json.loads(value) if isinstance(value, str) else value
+        except ValueError:
+            data = None
+
+        if isinstance(data, dict) and isinstance(data.get("poster"), dict):
+            value = json.dumps({**data, "poster": data["poster"].get("src", "")})
+
+        return super().get_context(name, value, attrs)
+
 
 class AudioWidget(Widget):
     widget_type = "audio"
@@ -6,6 +6,8 @@ from django.utils import translation
 from django.utils.module_loading import import_string
 from jinja2 import Environment
 
+from apps.core.renditions import rendition_url
+
 
 def reverse_url(name, **kwargs):
     try:
@@ -47,6 +49,7 @@ def environment(**options):
         {
             "static": static,
             "url": reverse,
+            "rendition_url": rendition_url,
         }
     )
 
@@ -2,10 +2,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
 from api import api
+from apps.core.views import media_rendition, protected_media
 
 urlpatterns = [
     path("", TemplateView.as_view(template_name="index.html"), name="home"),
     path("admin/mmanager/", include("pymediamanager.urls")),
     path("admin/", admin.site.urls),
     path("api/", api.urls),
+    path("protected/<path:path>", protected_media, name="protected_media"),
+    path(
+        "media/_r/<int:width>x<int:height>/<str:mode>/<str:version>/<path:path>",
+        media_rendition,
+        name="media_rendition",
+    ),
 ]
@@ -2,7 +2,8 @@ from os.path import join
 
 from .methods import _create_directory, _get_location_data, _upload_files
 from .utils import norm_location, slugify, to_uint
-from .search import search_generator
+from .search import SEARCH_LIMIT, search_generator
+from .uploads import abort_upload, create_upload, finish_upload, upload_status, write_chunk
 
 
 class MediaManager:
@@ -16,6 +17,12 @@ class MediaManager:
     def _norm_location(self, location: str):
         return join(self.media_dir, norm_location(location).lstrip("/"))
 
+    def _index(self, paths: list):
+        # the package is imported while Django loads apps, so models are imported on use
+        from .index import index_paths
+
+        index_paths(self.media_dir, paths)
+
     def get_location_data(self, location: str, skip: int = 0):
         location = self._norm_location(location)
         skip = to_uint(skip)
@@ -25,7 +32,9 @@ class MediaManager:
     def create_directory(self, location: str, name: str):
         location = self._norm_location(location)
         name = slugify(name)
-        return _create_directory(self.media_dir, location, name)
+        data = _create_directory(self.media_dir, location, name)
+        self._index([data["location"]])
+        return data
 
     def upload_files(
         self,
@@ -37,11 +46,31 @@ class MediaManager:
         thumb_dir = join(media_dir, "_thumb")
         rellocation = norm_location(location).lstrip("/")
 
-        return _upload_files(
+        data = _upload_files(
             media_dir, thumb_dir, rellocation, files, upload_in_current_dir
         )
+        self._index([f["path"] for f in data["files"]])
+        return data
+
+    def create_upload(self, location: str, name: str, size: int, upload_in_current_dir: bool):
+        rellocation = norm_location(location).lstrip("/")
+        return create_upload(self.media_dir, rellocation, name, size, upload_in_current_dir)
+
+    def upload_status(self, upload_id: str):
+        return upload_status(self.media_dir, upload_id)
+
+    def write_chunk(self, upload_id: str, offset: int, length: int, stream, checksum: str):
+        return write_chunk(self.media_dir, upload_id, offset, length, stream, checksum)
+
+    def finish_upload(self, upload_id: str):
+        data = finish_upload(self.media_dir, join(self.media_dir, "_thumb"), upload_id)
+        self._index([f["path"] for f in data["files"]])
+        return data
+
+    def abort_upload(self, upload_id: str):
+        abort_upload(self.media_dir, upload_id)
 
-    def get_search_data(self, location: str, q: str):
+    def get_search_data(self, location: str, q: str, cursor: int = 0, limit: int = SEARCH_LIMIT):
         abslocation = self._norm_location(location)
 
-        return search_generator(abslocation, q, self.media_dir)
+        return search_generator(abslocation, q, self.media_dir, cursor, limit)
@@ -0,0 +1,152 @@
+import mimetypes
+from os import scandir, stat
+from os.path import basename
+from stat import S_ISDIR
+
+from PIL import Image
+
+from .models import MediaFile
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+BATCH_SIZE = 1000
+
+
+def is_excluded_dir(name: str) -> bool:
+    return name.startswith("_") or name.startswith(".")
+
+
+def _parent(path: str) -> str:
+    return path.rsplit("/", 1)[0]
+
+
+def _record(media_dir: str, abspath: str, st=None) -> MediaFile:
+    st = st or stat(abspath)
+    name = basename(abspath)
+    is_dir = S_ISDIR(st.st_mode)
+    path = abspath[len(media_dir) :]
+
+    record = MediaFile(
+        path=path,
+        parent=_parent(path),
+        name=name,
+        isdir=is_dir,
+        size=st.st_size,
+        ctime=st.st_ctime,
+        mtime=st.st_mtime,
+    )
+
+    if not is_dir:
+        record.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+        if record.content_type in IMAGE_TYPES:
+            try:
+                # only the header is read
+                with Image.open(abspath) as img:
+                    record.width, record.height = img.size
+            except Exception:
+                pass
+
+    return record
+
+
+def _upsert(records: list):
+    for start in range(0, len(records), BATCH_SIZE):
+        MediaFile.objects.bulk_create(
+            records[start : start + BATCH_SIZE],
+            update_conflicts=True,
+            unique_fields=["path"],
+            update_fields=["parent", "name", "isdir", "size", "ctime", "mtime", "content_type", "width", "height"],
+        )
+
+
+def index_paths(media_dir: str, paths: list):
+    # paths are relative ("/uploads/2025/a.jpg"); their parent directories are indexed too
+    media_dir = media_dir.rstrip("/")
+    wanted = set()
+
+    for path in paths:
+        parts = path.strip("/").split("/")
+        if any(is_excluded_dir(part) for part in parts[:-1]):
+            continue
+        for i in range(1, len(parts) + 1):
+            wanted.add("/" + "/".join(parts[:i]))
+
+    records = []
+    for path in sorted(wanted):
+        try:
+            records.append(_record(media_dir, media_dir + path))
+        except OSError:
+            continue
+
+    _upsert(records)
+
+
+def _sync_directory(media_dir: str, location: str, summary: dict) -> list:
+    parent = location[len(media_dir) :]
+    existing = {
+        row.path: row
+        for row in MediaFile.objects.filter(parent=parent).only("id", "path", "isdir", "size", "mtime")
+    }
+
+    subdirs, changed, seen = [], [], set()
+
+    with scandir(location) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if is_dir and is_excluded_dir(entry.name):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+            if is_dir:
+                subdirs.append(entry.path)
+
+            path = f"{parent}/{entry.name}"
+            seen.add(path)
+            row = existing.get(path)
+
+            if row is None:
+                summary["added"] += 1
+            elif row.isdir == is_dir and row.size == st.st_size and row.mtime == st.st_mtime:
+                continue
+            else:
+                summary["updated"] += 1
+
+            changed.append(_record(media_dir, entry.path, st))
+
+    _upsert(changed)
+
+    gone = [path for path in existing if path not in seen]
+    if gone:
+        summary["removed"] += len(gone)
+        MediaFile.objects.filter(path__in=gone).delete()
+        for path in gone:
+            if existing[path].isdir:
+                summary["removed"] += MediaFile.objects.filter(path__startswith=path + "/").delete()[0]
+
+    return subdirs
+
+
+def reconcile(media_dir: str) -> dict:
+    media_dir = media_dir.rstrip("/")
+    summary = {"added": 0, "updated": 0, "removed": 0, "directories": 0}
+    stack = [media_dir]
+
+    while stack:
+        location = stack.pop()
+        stack += _sync_directory(media_dir, location, summary)
+        summary["directories"] += 1
+
+    return summary
+
+
+def search_index(media_dir: str, location: str, q: str):
+    location = location.rstrip("/")[len(media_dir.rstrip("/")) :]
+    files = MediaFile.objects.filter(name__icontains=q)
+
+    if location:
+        files = files.filter(path__startswith=location + "/")
+
+    return files.order_by("id")
@@ -0,0 +1,164 @@
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os.path import splitext
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tools.pycrop import Rendition, render
+
+logger = logging.getLogger(__name__)
+
+THUMB_EXTENSIONS = (".png", ".jpg", ".jpeg")
+THUMB_SIZE = (900, 900)
+THUMB_WORKERS = getattr(settings, "MMANAGER_THUMB_WORKERS", min(4, os.cpu_count() or 1))
+JOB_TTL = 60 * 60
+# a running job owned by another host counts as orphaned after this long without progress
+JOB_STALL_SECONDS = getattr(settings, "MMANAGER_JOB_STALL_SECONDS", 300)
+# thumbs land under the public /media/_thumb/, so nothing is rendered from paid files
+PROTECTED_DIR = getattr(settings, "PROTECTED_MEDIA_DIR", None)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def job_key(job_id: str) -> str:
+    return f"mmanager:job:{job_id}"
+
+
+def make_thumbnail(filepath: str, thumbpath: str):
+    # runs in a spawned pool process: importing this module loads django and the settings,
+    # but apps are never set up there, so nothing here may touch the ORM or the cache
+    thumb, ext = splitext(thumbpath)
+
+    render(
+        filepath,
+        [
+            Rendition(thumb + ext, THUMB_SIZE, "thumb", quality=90),
+            Rendition(thumb + ".webp", THUMB_SIZE, "thumb", quality=80),
+        ],
+    )
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        # a pool inherited through fork (e.g. gunicorn --preload) can't be used, and the
+        # pool itself spawns, forking a threaded gunicorn worker can copy a held lock
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=THUMB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class ThumbnailJob:
+    def __init__(self, paths: list):
+        self.id = uuid.uuid4().hex
+        self.total = len(paths)
+        self.done = 0
+        self.failed = []
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+    def state(self) -> dict:
+        finished = self.done + len(self.failed)
+        return {
+            "id": self.id,
+            "status": "done" if finished == self.total else "running",
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            # the futures live in this process, see `get_job`
+            "owner": self.owner,
+            "updated_at": time.time(),
+        }
+
+    def publish(self):
+        cache.set(job_key(self.id), self.state(), timeout=JOB_TTL)
+
+    def finish(self, path: str, error: BaseException = None):
+        with self._lock:
+            if error is None:
+                self.done += 1
+            else:
+                self.failed.append({"path": path, "error": str(error) or error.__class__.__name__})
+                logger.warning("Thumbnail for %s failed: %s", path, error)
+            self.publish()
+
+
+def _on_done(job: ThumbnailJob, path: str, future):
+    if future.cancelled():
+        job.finish(path, CancelledError("cancelled"))
+    else:
+        job.finish(path, future.exception())
+
+
+def submit_thumbnails(items: list):
+    """
+    Queue thumbnail renditions for (filepath, thumbpath, path) tuples and
+    return the job id, progress is readable through `get_job`.
+    """
+    if PROTECTED_DIR:
+        items = [item for item in items if not item[2].lstrip("/").startswith(PROTECTED_DIR + "/")]
+
+    if not items:
+        return None
+
+    job = ThumbnailJob(items)
+    job.publish()
+
+    for filepath, thumbpath, path in items:
+        try:
+            future = _get_pool().submit(make_thumbnail, filepath, thumbpath)
+        except (BrokenProcessPool, RuntimeError) as e:
+            _reset_pool()
+            job.finish(path, e)
+            continue
+
+        future.add_done_callback(lambda f, path=path: _on_done(job, path, f))
+
+    return job.id
+
+
+def _is_orphaned(job: dict) -> bool:
+    host, _, pid = job.get("owner", "").rpartition(":")
+
+    if host == socket.gethostname() and pid.isdigit():
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    return time.time() - job.get("updated_at", 0) > JOB_STALL_SECONDS
+
+
+def get_job(job_id: str):
+    job = cache.get(job_key(job_id))
+
+    # a recycled worker takes its futures along, nothing would ever finish the job
+    if job and job["status"] == "running" and _is_orphaned(job):
+        job = {**job, "status": "failed", "error": "ესკიზების შექმნა შეწყდა"}
+        cache.set(job_key(job_id), job, timeout=JOB_TTL)
+
+    return job
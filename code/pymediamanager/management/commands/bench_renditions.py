@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from math import sqrt
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from tools.pycrop import Rendition, render
+
+
+SCENARIOS = {
+    "full": [
+        ("cover.jpg", (1200, 630), "cover", 90),
+        ("contain.jpg", (1600, 1600), "contain", 90),
+        ("thumb.jpg", (900, 900), "thumb", 90),
+        ("thumb.webp", (900, 900), "thumb", 80),
+        ("small.webp", (320, 320), "thumb", 80),
+    ],
+    "thumbs": [
+        ("thumb.jpg", (900, 900), "thumb", 90),
+        ("thumb.webp", (900, 900), "thumb", 80),
+        ("small.webp", (320, 320), "thumb", 80),
+    ],
+}
+
+
+def renditions(scenario: str, folder: str) -> list:
+    return [
+        Rendition(os.path.join(folder, name), size, mode, quality=quality)
+        for name, size, mode, quality in SCENARIOS[scenario]
+    ]
+
+
+def legacy(scenario: str, path: str, folder: str):
+    # what pycrop.cover/contain and the media manager thumbnail did before:
+    # a full decode for every output
+    for r in renditions(scenario, folder):
+        with Image.open(path) as img:
+            if r.mode == "thumb":
+                img.thumbnail(r.size)
+                out = img
+            else:
+                size = r.size
+                p = (max if r.mode == "cover" else min)(t / s for t, s in zip(size, img.size))
+                out = img.resize((int(img.width * p), int(img.height * p)), Image.LANCZOS)
+                if r.mode == "cover":
+                    left, top = (out.width - size[0]) // 2, (out.height - size[1]) // 2
+                    out = out.crop((left, top, left + size[0], top + size[1]))
+            out.save(r.savepath, quality=r.quality)
+
+
+def engine(scenario: str, path: str, folder: str):
+    render(path, renditions(scenario, folder))
+
+
+def make_photo(path: str, megapixels: int):
+    height = int(sqrt(megapixels * 1_000_000 / 1.5))
+    size = (int(height * 1.5), height)
+    # smooth low frequency shapes with a little grain compress roughly like a photo
+    small = (size[0] // 16, size[1] // 16)
+    channels = [
+        Image.effect_noise(small, 80).resize(size, Image.BICUBIC) for _ in range(3)
+    ]
+    grain = Image.effect_noise(size, 8)
+    channels = [Image.blend(c, grain, 0.15) for c in channels]
+    Image.merge("RGB", channels).save(path, quality=92)
+
+
+def _run(func, args, conn):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    conn.send((elapsed, peak))
+    conn.close()
+
+
+def run(func, *args):
+    # everything runs in a fresh process so peak RSS isn't shared between runs
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run, args=(func, args, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def repeat(func, scenario: str, path: str, rounds: int):
+    with tempfile.TemporaryDirectory() as folder:
+        for _ in range(rounds):
+            func(scenario, path, folder)
+
+
+class Command(BaseCommand):
+    help = "Compare the single-decode rendition engine with per-output decoding"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--megapixels", type=int, default=24)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--source", help="Use this image instead of a generated photo")
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = options["source"]
+            if not path:
+                path = os.path.join(folder, "source.jpg")
+                run(make_photo, path, options["megapixels"])
+
+            with Image.open(path) as img:
+                self.stdout.write(f"{path}: {img.width}x{img.height} {img.format}, {rounds} rounds")
+
+            for scenario in SCENARIOS:
+                results = {}
+                for name, func in (("legacy", legacy), ("engine", engine)):
+                    elapsed, peak = run(repeat, func, scenario, path, rounds)
+                    results[name] = elapsed
+                    self.stdout.write(
+                        f"{scenario:>6} {name:>6}: {rounds / elapsed:6.2f} images/s  peak +{peak / 1024:7.1f} MB"
+                    )
+
+                self.stdout.write(
+                    self.style.SUCCESS(f"{scenario:>6} speedup {results['legacy'] / results['engine']:.1f}x")
+                )
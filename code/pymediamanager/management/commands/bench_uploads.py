@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from pymediamanager.methods import _write_to_disk
+
+
+def legacy(filepath: str, file):
+    # _write_to_disk before temp-file uploads were moved instead of rewritten
+    with open(filepath, "wb+") as destination:
+        for chunk in file.chunks():
+            destination.write(chunk)
+    os.utime(filepath)
+
+
+def io_counters() -> dict:
+    # bytes moved through read/write syscalls, Linux only
+    try:
+        with open("/proc/self/io") as f:
+            return {k: int(v) for k, v in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+def temporary_upload(folder: str, data: bytes, name: str):
+    with override_settings(FILE_UPLOAD_TEMP_DIR=folder):
+        file = TemporaryUploadedFile(name, "application/octet-stream", len(data), None)
+    file.write(data)
+    file.seek(0)
+    return file
+
+
+def memory_upload(data: bytes, name: str):
+    # built the way MemoryFileUploadHandler does, BytesIO(data) would share `data` instead
+    file = BytesIO()
+    file.write(data)
+    file.seek(0)
+    return InMemoryUploadedFile(file, "upload_files", name, "application/octet-stream", len(data), None)
+
+
+class Command(BaseCommand):
+    help = "Compare the old chunk-copy upload write with moving spooled uploads and single-call writes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=512, help="Large upload size in MB")
+        parser.add_argument("--files", type=int, default=200, help="Number of small in-memory uploads")
+        parser.add_argument("--small-size", type=int, default=512, help="Small upload size in KB")
+
+    def measure(self, label: str, func, files: list, folder: str):
+        before = io_counters()
+        started = time.perf_counter()
+
+        for i, file in enumerate(files):
+            func(os.path.join(folder, f"{label}-{i}"), file)
+
+        elapsed = time.perf_counter() - started
+        after = io_counters()
+
+        for file in files:
+            file.close()
+
+        moved = ""
+        if before:
+            read = (after["rchar"] - before["rchar"]) / 2**20
+            written = (after["wchar"] - before["wchar"]) / 2**20
+            moved = f"  read {read:8.1f} MB  written {written:8.1f} MB"
+
+        self.stdout.write(f"{label:>18}: {elapsed * 1000:8.1f} ms{moved}")
+        return elapsed
+
+    def handle(self, *args, **options):
+        large = os.urandom(options["size"] * 2**20)
+        small = [os.urandom(options["small_size"] * 2**10) for _ in range(options["files"])]
+
+        settings.MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=settings.MEDIA_ROOT, prefix="_bench") as folder:
+            # FILE_UPLOAD_TEMP_DIR is what uploads really use, the system temp dir is the old default
+            spool = str(settings.FILE_UPLOAD_TEMP_DIR)
+            os.makedirs(spool, exist_ok=True)
+            system = tempfile.gettempdir()
+            if os.stat(system).st_dev == os.stat(folder).st_dev:
+                self.stdout.write(self.style.WARNING(f"{system} is on the media filesystem, both cases rename"))
+
+            self.stdout.write(f"{options['size']} MB temp-file upload")
+            old = self.measure("legacy", legacy, [temporary_upload(spool, large, "a.bin")], folder)
+            new = self.measure("upload temp dir", _write_to_disk, [temporary_upload(spool, large, "b.bin")], folder)
+            self.measure("system temp dir", _write_to_disk, [temporary_upload(system, large, "c.bin")], folder)
+            self.stdout.write(self.style.SUCCESS(f"upload temp dir speedup {old / new:.0f}x"))
+
+            self.stdout.write(f"{options['files']} x {options['small_size']} KB in-memory uploads")
+            old = self.measure("legacy", legacy, [memory_upload(d, "s.bin") for d in small], folder)
+            new = self.measure("single write", _write_to_disk, [memory_upload(d, "s.bin") for d in small], folder)
+            self.stdout.write(self.style.SUCCESS(f"single write speedup {old / new:.1f}x"))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pymediamanager.index import reconcile
+
+
+class Command(BaseCommand):
+    help = "Bring the media file index in line with the files under MEDIA_ROOT"
+
+    def handle(self, *args, **options):
+        summary = reconcile(str(settings.MEDIA_ROOT))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {summary['directories']} directories: "
+                f"{summary['added']} added, {summary['updated']} updated, {summary['removed']} removed"
+            )
+        )
@@ -1,49 +1,109 @@
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from os import listdir, makedirs, mkdir, utime
+from os import makedirs, mkdir, scandir, stat, utime
 from os.path import basename, isdir, join, splitext
 
+from django.conf import settings
+from django.core.files.move import file_move_safe
 
-from PIL import Image
-
+from .jobs import THUMB_EXTENSIONS, submit_thumbnails
 from .types import Dict
 from .utils import parse_item, slugify
 
+LISTING_CACHE_SIZE = 64
 
-def _get_location_data(media_dir: str, location: str, skip: int = 0, limit: int = 20):
-    def is_exclude(name: str):
-        if name.startswith("_"):
-            return True
-        return False
+# location -> (st_mtime_ns, st_ino, records); records are pre-sorted
+# (isdir, ctime, name, size, mtime) tuples with "uploads" first
+_listings = OrderedDict()
+_listings_lock = threading.Lock()
+
+
+def _scan(location: str) -> list:
+    records = []
+    uploads = None
+
+    with scandir(location) as entries:
+        for entry in entries:
+            if entry.name.startswith("_"):
+                continue
+            try:
+                st = entry.stat()
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+
+            record = (is_dir, st.st_ctime, entry.name, st.st_size, st.st_mtime)
+            if entry.name == "uploads":
+                uploads = record
+            else:
+                records.append(record)
+
+    records.sort(key=lambda r: (r[0], r[1]), reverse=True)
+
+    if uploads is not None:
+        records.insert(0, uploads)
+
+    return records
+
+
+def _listing(location: str) -> list:
+    st = stat(location)
+    key = (st.st_mtime_ns, st.st_ino)
+    location = location.rstrip("/")
+
+    with _listings_lock:
+        cached = _listings.get(location)
+        if cached is not None and cached[:2] == key:
+            _listings.move_to_end(location)
+            return cached[2]
+
+    # a directory's mtime changes whenever an entry is added, removed or renamed
+    records = _scan(location)
+
+    with _listings_lock:
+        _listings[location] = (*key, records)
+        _listings.move_to_end(location)
+        while len(_listings) > LISTING_CACHE_SIZE:
+            _listings.popitem(last=False)
+
+    return records
 
-    items = listdir(location)
 
-    has_uploads = False
+def _forget_listing(location: str):
+    with _listings_lock:
+        _listings.pop(location.rstrip("/"), None)
 
-    if "uploads" in items:
-        items.remove("uploads")
-        has_uploads = True
 
-    items = sorted(
-        (
-            parse_item(join(location, name), media_dir)
-            for name in items
-            if not is_exclude(name)
-        ),
-        key=lambda it: (it["isdir"], it["ctime"]),
-        reverse=True,
+def _record_item(location: str, media_dir: str, record: tuple) -> Dict:
+    is_dir, ctime, name, size, mtime = record
+    content_type = None
+
+    if not is_dir:
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    return Dict(
+        path=join(location, name)[len(media_dir) :],
+        name=name,
+        size=size,
+        ctime=ctime,
+        mtime=mtime,
+        isdir=is_dir,
+        content_type=content_type,
     )
 
-    if has_uploads:
-        items.insert(0, parse_item(join(location, "uploads"), media_dir))
 
-    count = len(items)
+def _get_location_data(media_dir: str, location: str, skip: int = 0, limit: int = 20):
+    records = _listing(location)
 
     return Dict(
         skip=skip,
-        count=count,
+        count=len(records),
         limit=limit,
         location=location[len(media_dir) :],
-        result=items[skip : skip + limit],
+        result=[_record_item(location, media_dir, r) for r in records[skip : skip + limit]],
     )
 
 
@@ -61,17 +121,33 @@ def _create_directory(media_dir: str, location: str, name: str):
 
     if d is not None and not isdir(d):
         mkdir(d)
+        _forget_listing(location)
 
     return Dict(location=d[len(media_dir) :], name=basename(d))
 
 
+def _move_temporary(filepath: str, file):
+    file.file.flush()
+    # a rename when FILE_UPLOAD_TEMP_DIR is on the media filesystem, a copy otherwise
+    file_move_safe(file.temporary_file_path(), filepath, allow_overwrite=True)
+    # temp files are created 0600
+    os.chmod(filepath, getattr(settings, "FILE_UPLOAD_PERMISSIONS", None) or 0o644)
+
+
 def _write_to_disk(filepath: str, file) -> bool:
     if hasattr(file, "save"):
         file.save(filepath)
+    elif hasattr(file, "temporary_file_path"):
+        _move_temporary(filepath, file)
     elif hasattr(file, "chunks"):
-        with open(filepath, "wb+") as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
+        buffer = getattr(file.file, "getbuffer", None)
+        with open(filepath, "wb") as destination:
+            if buffer is not None:
+                # in-memory uploads are written with a single call, without copying the buffer
+                destination.write(buffer())
+            else:
+                for chunk in file.chunks():
+                    destination.write(chunk)
     else:
         return False
 
@@ -86,6 +162,16 @@ def _get_name(file):
     return file.name
 
 
+def _upload_target(rellocation: str, name: str, upload_in_current_dir: bool):
+    name, ext = splitext(name)
+    filename = slugify(name, use_stamp=not upload_in_current_dir) + ext.lower()
+
+    if not upload_in_current_dir:
+        rellocation = datetime.now().strftime("uploads/%Y/%m-%d")
+
+    return rellocation, filename
+
+
 def _upload_files(
     media_dir: str,
     thumb_dir: str,
@@ -94,15 +180,11 @@ def _upload_files(
     upload_in_current_dir: bool,
 ):
     ufs = []
+    thumbs = []
 
     for file in files:
-        name, ext = splitext(_get_name(file))
-        ext = ext.lower()
-
-        filename = slugify(name, use_stamp=not upload_in_current_dir) + ext
-
-        if not upload_in_current_dir:
-            rellocation = datetime.now().strftime("uploads/%Y/%m-%d")
+        rellocation, filename = _upload_target(rellocation, _get_name(file), upload_in_current_dir)
+        ext = splitext(filename)[1]
 
         location_media = join(media_dir, rellocation)
         location_thumb = join(thumb_dir, rellocation)
@@ -118,25 +200,16 @@ def _upload_files(
         if not status:
             continue
 
-        ufs.append(parse_item(filepath, media_dir))
-
-        try:
-            if ext.lower() in [".png", ".jpg", ".jpeg"]:
-                ext = ext.lower()
-                if not isdir(location_thumb):
-                    makedirs(location_thumb)
+        _forget_listing(location_media)
 
-                thumb, _ = splitext(thumbpath)
+        ufs.append(parse_item(filepath, media_dir))
 
-                with Image.open(filepath) as img:
-                    img.thumbnail((900, 900))
-                    img.save(thumb + ext, quality=90)
-                    img.save(thumb + ".webp")
-        except Exception:
-            pass
+        if ext in THUMB_EXTENSIONS:
+            thumbs.append((filepath, thumbpath, ufs[-1]["path"]))
 
     return {
         "msg": "ფაილები ატვირთულია",
         "location": "/" + rellocation,
         "files": ufs,
+        "job": submit_thumbnails(thumbs),
     }
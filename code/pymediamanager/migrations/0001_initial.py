@@ -0,0 +1,87 @@
+# Generated by Django 4.2.3 on 2026-10-19 00:10
+
+from django.db import migrations, models
+
+
+# icontains on Postgres compiles to UPPER(name) LIKE UPPER(%s), which the trigram index serves;
+# path__startswith compiles to LIKE 'prefix%', which the unique btree on path can't serve under
+# a non-C collation, the pattern_ops index compares bytes and can
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX mmanager_media_name_trgm ON mmanager_media_file USING gin (UPPER(name) gin_trgm_ops)"
+    )
+    schema_editor.execute("CREATE INDEX mmanager_media_path_like ON mmanager_media_file (path varchar_pattern_ops)")
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "path",
+                    models.CharField(
+                        max_length=1024, unique=True, verbose_name="მისამართი"
+                    ),
+                ),
+                (
+                    "parent",
+                    models.CharField(
+                        db_index=True, max_length=1024, verbose_name="დირექტორია"
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="სახელი")),
+                (
+                    "isdir",
+                    models.BooleanField(default=False, verbose_name="დირექტორია"),
+                ),
+                ("size", models.BigIntegerField(default=0, verbose_name="ზომა")),
+                ("ctime", models.FloatField(default=0)),
+                ("mtime", models.FloatField(default=0)),
+                (
+                    "content_type",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="ტიპი"
+                    ),
+                ),
+                (
+                    "width",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="სიგანე"
+                    ),
+                ),
+                (
+                    "height",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="სიმაღლე"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "მედია ფაილი",
+                "verbose_name_plural": "მედია ფაილები",
+                "db_table": "mmanager_media_file",
+                "indexes": [
+                    models.Index(fields=["name"], name="mmanager_media_name_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(add_search_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class MediaFile(models.Model):
+    # paths are relative to the media root and start with "/", like the listing API
+    path = models.CharField(max_length=1024, unique=True, verbose_name="მისამართი")
+    parent = models.CharField(max_length=1024, db_index=True, verbose_name="დირექტორია")
+    name = models.CharField(max_length=255, verbose_name="სახელი")
+    isdir = models.BooleanField(default=False, verbose_name="დირექტორია")
+    size = models.BigIntegerField(default=0, verbose_name="ზომა")
+    ctime = models.FloatField(default=0)
+    mtime = models.FloatField(default=0)
+    content_type = models.CharField(max_length=100, null=True, blank=True, verbose_name="ტიპი")
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="სიგანე")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="სიმაღლე")
+
+    def __str__(self):
+        return self.path
+
+    class Meta:
+        db_table = "mmanager_media_file"
+        verbose_name = "მედია ფაილი"
+        verbose_name_plural = "მედია ფაილები"
+        indexes = [
+            models.Index(fields=["name"], name="mmanager_media_name_idx"),
+        ]
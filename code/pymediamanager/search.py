@@ -1,31 +1,72 @@
 import json
-from os import walk
-from os.path import join
+import logging
+import time
 
-from .utils import parse_item
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
 
+logger = logging.getLogger(__name__)
 
-def search_generator(location: str, q: str, media_dir: str = ""):
-    def exclude_dir(d: str):
-        if d.startswith("_") or d.startswith("."):
-            return True
-        return False
+FIELDS = ("path", "name", "size", "ctime", "mtime", "isdir", "content_type", "width", "height")
 
-    def check(name):
-        return q.lower() in name.lower()
+SEARCH_LIMIT = getattr(settings, "MMANAGER_SEARCH_LIMIT", 200)
+SEARCH_MAX_LIMIT = getattr(settings, "MMANAGER_SEARCH_MAX_LIMIT", 1000)
+# seconds a single response may spend on the index before it hands back a cursor,
+# on Postgres every statement of the search is also cancelled past it
+SEARCH_TIME_BUDGET = getattr(settings, "MMANAGER_SEARCH_TIME_BUDGET", 2.0)
+
+
+def _statement_timeout(seconds: float):
+    # SET LOCAL ends with the transaction, the timeout doesn't stick to a reused connection
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL statement_timeout = {int(seconds * 1000)}")
+
+
+def search_generator(location: str, q: str, media_dir: str = "", cursor: int = 0, limit: int = SEARCH_LIMIT):
+    """
+    Yields NDJSON: one line per matching file, then a closing
+    {"next": <cursor or null>, "count": <n>} line. Pass `next` back as
+    `cursor` to resume after the last emitted file. A search cancelled by
+    the statement timeout closes with "timeout": true.
+    """
+    # answered from the MediaFile index, see `reindex_media` for keeping it in sync
+    from .index import search_index
+
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
 
     def walking():
-        for root, dirs, files in walk(location, topdown=True):
-            dirs[:] = [d for d in dirs if not exclude_dir(d)]
-
-            for name in files:
-                if check(name):
-                    itm = parse_item(join(root, name), media_dir)
-                    yield json.dumps(itm).encode() + b", "
-
-            for name in dirs:
-                if check(name):
-                    itm = parse_item(join(root, name), media_dir)
-                    yield json.dumps(itm).encode() + b", "
+        files = search_index(media_dir, location, q)
+        if cursor:
+            files = files.filter(id__gt=cursor)
+
+        deadline = time.monotonic() + SEARCH_TIME_BUDGET
+        count = 0
+        last_id = None
+        more = False
+        timeout = False
+
+        try:
+            with transaction.atomic():
+                _statement_timeout(SEARCH_TIME_BUDGET)
+
+                for itm in files.values("id", *FIELDS)[: limit + 1].iterator(chunk_size=100):
+                    if count == limit or (count and time.monotonic() > deadline):
+                        more = True
+                        break
+
+                    last_id = itm.pop("id")
+                    count += 1
+                    yield json.dumps(itm).encode() + b"\n"
+        except OperationalError:
+            logger.warning("Media search for %r in %s timed out after %s rows", q, location, count)
+            # resume after what was sent, nothing found yet means the query itself is too slow
+            more = count > 0
+            timeout = True
+
+        closing = {"next": last_id if more else None, "count": count}
+        if timeout:
+            closing["timeout"] = True
+        yield json.dumps(closing).encode() + b"\n"
 
     return walking
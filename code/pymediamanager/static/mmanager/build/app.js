@@ -25738,7 +25738,7 @@
                     t.files = [];
                 }),
                 l(r, s.CLEAR_SEARCHED_FILES, function (t) {
-                    t.searched = [];
+                    (t.searched = []), (t.searchNext = null);
                 }),
                 l(r, s.UPDATE_FILES, function (t, e) {
                     var n;
@@ -25851,7 +25851,9 @@
                 );
             }),
             f(p, m.SEARCH_FILES, function (t, e) {
-                var n = t.commit;
+                var n = t.commit,
+                    o = t.state,
+                    a = t.getters;
                 return y(
                     this,
                     void 0,
@@ -25869,21 +25871,42 @@
                                                 params: {
                                                     path: e.location,
                                                     q: e.q,
+                                                    cursor: e.cursor,
                                                 },
+                                                transformResponse: [
+                                                    function (t) {
+                                                        return t;
+                                                    },
+                                                ],
                                             })
                                                 .then(function (t) {
                                                     var e = t.data;
                                                     if ("string" == typeof e) {
-                                                        var r = JSON.parse(
-                                                            "[" +
-                                                                e
-                                                                    .trim()
-                                                                    .slice(
-                                                                        0,
-                                                                        -1
-                                                                    ) +
-                                                                "]"
-                                                        );
+                                                        var i = e
+                                                                .trim()
+                                                                .split("\n")
+                                                                .map(function (t) {
+                                                                    return JSON.parse(
+                                                                        t
+                                                                    );
+                                                                }),
+                                                            r = i.filter(function (
+                                                                t
+                                                            ) {
+                                                                return (
+                                                                    "path" in t
+                                                                );
+                                                            }),
+                                                            c = i[i.length - 1];
+                                                        // the closing line carries the cursor of the next page
+                                                        (o.searchQuery = {
+                                                            location: t.config.params.path,
+                                                            q: t.config.params.q,
+                                                        }),
+                                                            (o.searchNext =
+                                                                c && "next" in c
+                                                                    ? c.next
+                                                                    : null);
                                                         (e = null),
                                                             r
                                                                 .sort(function (
@@ -25910,7 +25933,9 @@
                                                                 }),
                                                             n(
                                                                 s.SET_SEARCHED_FILES,
-                                                                r
+                                                                t.config.params.cursor
+                                                                    ? a.getsearched.concat(r)
+                                                                    : r
                                                             );
                                                     }
                                                 })
@@ -25931,6 +25956,8 @@
             state: {
                 files: [],
                 searched: [],
+                searchNext: null,
+                searchQuery: null,
                 searcheValue: "",
                 loading: !1,
                 atend: !1,
@@ -27287,21 +27314,9 @@
                                             n.next = 10;
                                             break;
                                         }
-                                        return (
-                                            (t.state.loading = !0),
-                                            (r = t.getters.getfiles.length),
-                                            30,
-                                            t.commit(
-                                                s.UPDATE_FILES,
-                                                t.getters.getsearched.slice(
-                                                    r,
-                                                    r + 30
-                                                )
-                                            ),
-                                            (t.state.loading = !1),
-                                            t.getters.getsearched.length ===
-                                                r && (t.state.atend = !0),
-                                            n.abrupt("return", !0)
+                                        return n.abrupt(
+                                            "return",
+                                            searchPage(t)
                                         );
                                     case 10:
                                         if (
@@ -27339,6 +27354,36 @@
                     })
                 );
             };
+        function searchPage(t) {
+            if (t.state.loading) return Promise.resolve(!1);
+            var r = t.getters.getfiles.length,
+                e =
+                    t.getters.getsearched.length <= r + 30 &&
+                    null != t.state.searchNext;
+            t.state.loading = !0;
+            // past the fetched rows, load the next page from the server cursor
+            return (
+                e
+                    ? t.dispatch(
+                          m.SEARCH_FILES,
+                          Object.assign({}, t.state.searchQuery, {
+                              cursor: t.state.searchNext,
+                          })
+                      )
+                    : Promise.resolve()
+            ).then(function () {
+                return (
+                    t.commit(
+                        s.UPDATE_FILES,
+                        t.getters.getsearched.slice(r, r + 30)
+                    ),
+                    (t.state.loading = !1),
+                    t.getters.getsearched.length === r &&
+                        (t.state.atend = !0),
+                    !0
+                );
+            });
+        }
         function ne(t) {
             window.dispatchEvent(
                 new CustomEvent("export-files", { detail: t })
@@ -28387,6 +28432,85 @@
             });
             (e = this.state.files).push.apply(e, sn(r));
         }
+        // files from this size up go through the resumable chunked endpoints (pymediamanager/uploads.py)
+        var CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024,
+            CHUNK_RETRIES = 3,
+            // chunks are written with pwrite at their own offset, so several can be in flight
+            CHUNK_CONCURRENCY = 4;
+        function chunkHex(t) {
+            return Array.from(new Uint8Array(t))
+                .map(function (t) {
+                    return t.toString(16).padStart(2, "0");
+                })
+                .join("");
+        }
+        function chunkedUpload(t, e, n) {
+            // the session id is kept so a reload or a dropped connection resumes instead of starting over
+            var r = "mmanager-upload:" + [e, t.name, t.size, t.lastModified].join(":"),
+                s = "/admin/mmanager/uploads/",
+                o = window.localStorage.getItem(r),
+                a = function () {
+                    var o = new FormData();
+                    return (
+                        o.append("location", e),
+                        o.append("name", t.name),
+                        o.append("size", t.size),
+                        n && o.append("upload_in_current_dir", "on"),
+                        c()({ url: s, method: "POST", data: o }).then(function (t) {
+                            return window.localStorage.setItem(r, t.data.id), t.data;
+                        })
+                    );
+                },
+                l = o
+                    ? c()({ url: s + o, method: "GET" })
+                          .then(function (t) {
+                              return t.data;
+                          })
+                          .catch(a)
+                    : a();
+            return l.then(function (e) {
+                var n = new Set(e.received),
+                    o = 0,
+                    a = function (n, r) {
+                        var o = n * e.chunk_size;
+                        return t
+                            .slice(o, o + e.chunk_size)
+                            .arrayBuffer()
+                            .then(function (t) {
+                                return crypto.subtle.digest("SHA-256", t).then(function (n) {
+                                    return c()({
+                                        url: s + e.id + "?offset=" + o,
+                                        method: "PUT",
+                                        data: t,
+                                        headers: {
+                                            "Content-Type": "application/octet-stream",
+                                            "X-Checksum-Sha256": chunkHex(n),
+                                        },
+                                    });
+                                });
+                            })
+                            .catch(function (t) {
+                                if (r >= CHUNK_RETRIES) throw t;
+                                return new Promise(function (t) {
+                                    setTimeout(t, 1e3 * Math.pow(2, r));
+                                }).then(function () {
+                                    return a(n, r + 1);
+                                });
+                            });
+                    },
+                    l = function () {
+                        for (; o < e.chunks && n.has(o); ) o++;
+                        return o < e.chunks ? a(o++, 0).then(l) : Promise.resolve();
+                    },
+                    u = [];
+                for (var d = 0; d < CHUNK_CONCURRENCY; d++) u.push(l());
+                return Promise.all(u).then(function () {
+                    return c()({ url: s + e.id + "/finish", method: "POST" }).then(function (t) {
+                        return window.localStorage.removeItem(r), t;
+                    });
+                });
+            });
+        }
         var ln = Object(i.e)({
                 props: { selector: { type: String, required: !0 } },
                 setup: function (t) {
@@ -28425,37 +28549,52 @@
                             },
                             uploadFiles: function (t) {
                                 t.preventDefault();
-                                var e = new FormData(n.value);
-                                e.append(
-                                    "location",
-                                    "/" + xn.currentRoute.value.params.path
-                                ),
-                                    r.files.forEach(function (t) {
+                                var e = new FormData(n.value),
+                                    d = "/" + xn.currentRoute.value.params.path,
+                                    s = "on" == e.get("upload_in_current_dir"),
+                                    a = [],
+                                    l = d,
+                                    u = function (t) {
+                                        a.push.apply(a, t.data.files),
+                                            (l = t.data.location);
+                                    },
+                                    f = r.files.filter(function (t) {
+                                        return t.size < CHUNKED_UPLOAD_THRESHOLD;
+                                    }),
+                                    h;
+                                e.append("location", d),
+                                    f.forEach(function (t) {
                                         e.append("upload_files", t.f);
                                     }),
                                     (r.loading = !0),
-                                    c()({
-                                        url: "/admin/mmanager/upload-file/",
-                                        method: "POST",
-                                        data: e,
-                                    })
-                                        .then(function (t) {
-                                            var n = t.data.files,
-                                                r = t.data.location,
-                                                s =
-                                                    (t.data.msg,
-                                                    "on" ==
-                                                        e.get(
-                                                            "upload_in_current_dir"
-                                                        ));
-                                            ne(n),
+                                    (h = f.length
+                                        ? c()({
+                                              url: "/admin/mmanager/upload-file/",
+                                              method: "POST",
+                                              data: e,
+                                          }).then(u)
+                                        : Promise.resolve()),
+                                    r.files
+                                        .filter(function (t) {
+                                            return t.size >= CHUNKED_UPLOAD_THRESHOLD;
+                                        })
+                                        .forEach(function (t) {
+                                            h = h
+                                                .then(function () {
+                                                    return chunkedUpload(t.f, d, s);
+                                                })
+                                                .then(u);
+                                        }),
+                                    h
+                                        .then(function () {
+                                            ne(a),
                                                 s
                                                     ? window.dispatchEvent(
                                                           new Event(
                                                               "update-files"
                                                           )
                                                       )
-                                                    : xn.push("/location" + r);
+                                                    : xn.push("/location" + l);
                                         })
                                         .catch(function (t) {
                                             console.log(t);
@@ -0,0 +1,320 @@
+import hashlib
+import io
+import json
+import os
+import socket
+import tempfile
+import time
+from collections import OrderedDict
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from tools.pycrop import Rendition, open_reduced, render
+from . import jobs, methods, search, uploads
+from .models import MediaFile
+
+LOCMEM = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "session": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "session"},
+}
+
+
+@override_settings(CACHES=LOCMEM)
+class JobTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def publish(self, **state) -> str:
+        job = jobs.ThumbnailJob(["a.jpg", "b.jpg"])
+        cache.set(jobs.job_key(job.id), {**job.state(), **state})
+        return job.id
+
+    def test_running_job_of_a_live_worker(self):
+        job_id = self.publish()
+
+        self.assertEqual(jobs.get_job(job_id)["status"], "running")
+
+    def test_job_of_a_dead_worker_fails(self):
+        # pid 2**22 + 1 is above the Linux pid_max limit, so no process has it
+        job_id = self.publish(owner=f"{socket.gethostname()}:{2 ** 22 + 1}")
+
+        self.assertEqual(jobs.get_job(job_id)["status"], "failed")
+        self.assertEqual(cache.get(jobs.job_key(job_id))["status"], "failed")
+
+    def test_stalled_job_of_another_host_fails(self):
+        job_id = self.publish(owner="elsewhere:1", updated_at=time.time() - jobs.JOB_STALL_SECONDS - 1)
+
+        self.assertEqual(jobs.get_job(job_id)["status"], "failed")
+
+
+class ChunkedUploadTests(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.media = folder.name
+        self.thumbs = os.path.join(folder.name, "_thumb")
+        patcher = mock.patch.object(uploads, "CHUNK_SIZE", 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start(self, data: bytes, name: str = "notes.bin", current_dir: bool = True) -> dict:
+        return uploads.create_upload(self.media, "docs", name, len(data), current_dir)
+
+    def send(self, session: dict, data: bytes, index: int, checksum: str = None):
+        chunk = data[index * 4: index * 4 + 4]
+        checksum = checksum or hashlib.sha256(chunk).hexdigest()
+        return uploads.write_chunk(self.media, session["id"], index * 4, len(chunk), io.BytesIO(chunk), checksum)
+
+    def upload(self, data: bytes, **kwargs) -> dict:
+        session = self.start(data, **kwargs)
+        for index in reversed(range(session["chunks"])):
+            self.send(session, data, index)
+        return uploads.finish_upload(self.media, self.thumbs, session["id"])
+
+    def read(self, item: dict) -> bytes:
+        with open(os.path.join(self.media, item["path"].lstrip("/")), "rb") as f:
+            return f.read()
+
+    def test_chunks_in_any_order(self):
+        data = b"0123456789"
+
+        result = self.upload(data)
+
+        self.assertEqual(self.read(result["files"][0]), data)
+        self.assertEqual(os.listdir(os.path.join(self.media, uploads.UPLOADS_DIR)), [])
+
+    def test_bad_checksum_leaves_the_chunk_missing(self):
+        data = b"0123456789"
+        session = self.start(data)
+
+        with self.assertRaises(uploads.UploadError) as e:
+            self.send(session, data, 0, checksum="0" * 64)
+
+        self.assertEqual(e.exception.status, 409)
+        self.assertEqual(uploads.upload_status(self.media, session["id"])["received"], [])
+
+    def test_unfinished_upload_is_refused(self):
+        data = b"0123456789"
+        session = self.start(data)
+        self.send(session, data, 0)
+
+        with self.assertRaises(uploads.UploadError) as e:
+            uploads.finish_upload(self.media, self.thumbs, session["id"])
+
+        self.assertEqual(e.exception.status, 409)
+        self.assertEqual(uploads.upload_status(self.media, session["id"])["received"], [0])
+
+    def test_finishing_twice(self):
+        data = b"0123456789"
+        session = self.start(data)
+        for index in range(session["chunks"]):
+            self.send(session, data, index)
+        uploads.finish_upload(self.media, self.thumbs, session["id"])
+
+        with self.assertRaises(uploads.UploadError) as e:
+            uploads.finish_upload(self.media, self.thumbs, session["id"])
+
+        self.assertEqual(e.exception.status, 404)
+
+    def test_chunk_racing_a_finish_is_refused(self):
+        data = b"0123456789"
+        session = self.start(data)
+        for index in range(session["chunks"]):
+            self.send(session, data, index)
+        load = uploads._load
+
+        def finish_first(*args):
+            # the session is read, then the finish wins the race
+            loaded = load(*args)
+            with mock.patch.object(uploads, "_load", load):
+                uploads.finish_upload(self.media, self.thumbs, session["id"])
+            return loaded
+
+        with mock.patch.object(uploads, "_load", side_effect=finish_first):
+            with self.assertRaises(uploads.UploadError) as e:
+                self.send(session, data, 0)
+
+        self.assertEqual(e.exception.status, 409)
+
+    def test_existing_file_is_not_overwritten(self):
+        first = self.upload(b"first file")
+        second = self.upload(b"second file")
+
+        self.assertEqual(first["files"][0]["name"], "notes.bin")
+        self.assertNotEqual(second["files"][0]["path"], first["files"][0]["path"])
+        self.assertEqual(self.read(first["files"][0]), b"first file")
+        self.assertEqual(self.read(second["files"][0]), b"second file")
+
+
+class ListingTests(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.media = folder.name
+        for name in ("b.txt", "a.txt", "_renditions", "uploads", "docs"):
+            path = os.path.join(self.media, name)
+            if name.endswith(".txt"):
+                open(path, "w").close()
+            else:
+                os.mkdir(path)
+
+        patchers = [
+            mock.patch.object(methods, "_listings", OrderedDict()),
+            mock.patch.object(methods, "_scan", side_effect=methods._scan),
+        ]
+        self.scan = [patcher.start() for patcher in patchers][1]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def names(self) -> list:
+        return [item["name"] for item in methods._get_location_data(self.media, self.media, limit=100)["result"]]
+
+    def touch_dir(self):
+        # directory mtimes may not move within one clock tick, so move it explicitly
+        st = os.stat(self.media)
+        os.utime(self.media, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    def test_uploads_first_then_folders_then_files(self):
+        names = self.names()
+
+        self.assertEqual(names[:2], ["uploads", "docs"])
+        self.assertEqual(sorted(names[2:]), ["a.txt", "b.txt"])
+
+    def test_unchanged_directory_is_not_rescanned(self):
+        self.names()
+        self.names()
+
+        self.assertEqual(self.scan.call_count, 1)
+
+    def test_changed_directory_is_rescanned(self):
+        self.names()
+        open(os.path.join(self.media, "c.txt"), "w").close()
+        self.touch_dir()
+
+        self.assertIn("c.txt", self.names())
+        self.assertEqual(self.scan.call_count, 2)
+
+    def test_writes_forget_the_listing(self):
+        self.names()
+        methods._create_directory(self.media, self.media, "docs")
+        self.assertIn("docs_1", self.names())
+
+        upload = SimpleUploadedFile("c.txt", b"c")
+        methods._upload_files(self.media, os.path.join(self.media, "_thumb"), "", [upload], True)
+        self.assertIn("c.txt", self.names())
+        self.assertEqual(self.scan.call_count, 3)
+
+    def test_cache_is_bounded(self):
+        folders = [os.path.join(self.media, name) for name in ("uploads", "docs", "_renditions")]
+        with mock.patch.object(methods, "LISTING_CACHE_SIZE", 2):
+            for folder in folders:
+                methods._get_location_data(self.media, folder)
+
+        self.assertEqual(list(methods._listings), folders[1:])
+
+
+class RenderTests(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def image(self, name: str, size, mode: str = "RGB") -> str:
+        path = os.path.join(self.folder, name)
+        Image.new(mode, size).save(path)
+        return path
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.folder, "out", name)
+
+    def test_output_sizes(self):
+        source = self.image("source.jpg", (2000, 1500))
+        renditions = [
+            Rendition(self.path("thumb.jpg"), (100, 100), "thumb"),
+            Rendition(self.path("cover.jpg"), (300, 300), "cover", point=(0, 0)),
+            Rendition(self.path("contain.webp"), (400, None), "contain"),
+            Rendition(self.path("large.jpg"), (4000, 4000), "thumb"),
+        ]
+
+        results = render(source, renditions)
+
+        expected = [(100, 75), (300, 300), (400, 300), (2000, 1500)]
+        self.assertEqual(results, [(r.savepath, size) for r, size in zip(renditions, expected)])
+        for rendition, size in zip(renditions, expected):
+            with Image.open(rendition.savepath) as img:
+                self.assertEqual(img.size, size)
+
+    def test_large_jpeg_is_decoded_reduced(self):
+        with Image.open(self.image("source.jpg", (4000, 3000))) as img:
+            reduced = open_reduced(img, (100, 75))
+
+        # never below REDUCING_GAP times the need, far below the full frame
+        self.assertGreaterEqual(reduced.width, 200)
+        self.assertGreaterEqual(reduced.height, 150)
+        self.assertLessEqual(reduced.width, 500)
+
+    def test_palette_source(self):
+        source = self.image("source.png", (800, 600), mode="P")
+
+        results = render(source, [Rendition(self.path("small.jpg"), (80, 80), "contain")])
+
+        self.assertEqual(results[0][1], (80, 60))
+        with Image.open(results[0][0]) as img:
+            self.assertEqual(img.mode, "RGB")
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        MediaFile.objects.bulk_create(
+            MediaFile(path=f"/docs/lesson-{i}.pdf", parent="/docs", name=f"lesson-{i}.pdf") for i in range(5)
+        )
+
+    def page(self, cursor: int = 0, limit: int = 2) -> list:
+        walking = search.search_generator("/docs", "lesson", cursor=cursor, limit=limit)
+        return [json.loads(line) for line in walking()]
+
+    def test_cursor_reaches_every_result(self):
+        names = []
+        cursor = 0
+
+        while True:
+            *rows, closing = self.page(cursor)
+            names += [row["name"] for row in rows]
+            cursor = closing["next"]
+            if cursor is None:
+                break
+
+        self.assertEqual(names, [f"lesson-{i}.pdf" for i in range(5)])
+
+    def test_cancelled_query_closes_the_stream(self):
+        with mock.patch.object(search, "_statement_timeout", side_effect=OperationalError("canceling statement")):
+            lines = self.page()
+
+        self.assertEqual(lines, [{"next": None, "count": 0, "timeout": True}])
+
+
+class TemporaryUploadTests(SimpleTestCase):
+    def test_temp_dir_is_created_on_first_upload(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        spool = os.path.join(folder.name, "_uploads", "tmp")
+        body = b"x" * 4096
+        data = (
+            b"--boundary\r\n"
+            b'Content-Disposition: form-data; name="upload_files"; filename="a.bin"\r\n'
+            b"Content-Type: application/octet-stream\r\n\r\n" + body + b"\r\n--boundary--\r\n"
+        )
+
+        with override_settings(FILE_UPLOAD_TEMP_DIR=spool, FILE_UPLOAD_MAX_MEMORY_SIZE=1024):
+            request = RequestFactory().post("/", data, content_type="multipart/form-data; boundary=boundary")
+            file = request.FILES["upload_files"]
+
+        self.assertEqual(os.path.dirname(file.temporary_file_path()), spool)
+        self.assertEqual(file.read(), body)
+        file.close()
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from os.path import join, splitext
+
+from django.conf import settings
+
+from .jobs import THUMB_EXTENSIONS, submit_thumbnails
+from .methods import _forget_listing, _upload_target
+from .utils import parse_item, slugify
+
+# sessions live inside the media tree (hidden by the "_" prefix), so finishing
+# an upload is a rename on the same filesystem instead of a copy
+UPLOADS_DIR = "_uploads"
+CHUNK_SIZE = getattr(settings, "MMANAGER_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+SESSION_TTL = getattr(settings, "MMANAGER_UPLOAD_SESSION_TTL", 60 * 60 * 24)
+READ_SIZE = 1024 * 1024
+
+SESSION_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 422):
+        self.status = status
+        super().__init__(message)
+
+
+def _paths(media_dir: str, upload_id: str):
+    if not SESSION_RE.match(upload_id or ""):
+        raise UploadError("ატვირთვა ვერ მოიძებნა", 404)
+
+    # <id>.json - session, <id>.part - the file itself, <id>.map - one byte per received chunk
+    base = join(media_dir, UPLOADS_DIR, upload_id)
+    return base + ".json", base + ".part", base + ".map"
+
+
+def _load(media_dir: str, upload_id: str) -> dict:
+    meta = _paths(media_dir, upload_id)[0]
+
+    try:
+        with open(meta) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadError("ატვირთვა ვერ მოიძებნა", 404)
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _clean_expired(folder: str):
+    cutoff = time.time() - SESSION_TTL
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".map"):
+                continue
+            try:
+                # every received chunk touches the map, so its mtime is the last activity
+                if entry.stat().st_mtime < cutoff:
+                    base = entry.path[: -len(".map")]
+                    _remove(base + ".json", base + ".part", base + ".part.finishing", entry.path)
+            except OSError:
+                continue
+
+
+def create_upload(media_dir: str, rellocation: str, name: str, size: int, upload_in_current_dir: bool):
+    if size <= 0:
+        raise UploadError("არასწორი პარამატრებია")
+
+    folder = join(media_dir, UPLOADS_DIR)
+    os.makedirs(folder, exist_ok=True)
+    _clean_expired(folder)
+
+    rellocation, filename = _upload_target(rellocation, name, upload_in_current_dir)
+    upload_id = uuid.uuid4().hex
+    meta, part, chunks = _paths(media_dir, upload_id)
+
+    session = {
+        "id": upload_id,
+        "location": rellocation,
+        "filename": filename,
+        "size": size,
+        "chunk_size": CHUNK_SIZE,
+        "chunks": -(-size // CHUNK_SIZE),
+    }
+
+    # both files are sparse until chunks land at their offsets
+    with open(part, "wb") as f:
+        f.truncate(size)
+    with open(chunks, "wb") as f:
+        f.truncate(session["chunks"])
+    with open(meta, "w") as f:
+        json.dump(session, f)
+
+    return {**session, "received": []}
+
+
+def upload_status(media_dir: str, upload_id: str) -> dict:
+    session = _load(media_dir, upload_id)
+
+    with open(_paths(media_dir, upload_id)[2], "rb") as f:
+        received = f.read()
+
+    return {**session, "received": [i for i, b in enumerate(received) if b]}
+
+
+def _open_session_file(path: str) -> int:
+    try:
+        return os.open(path, os.O_WRONLY)
+    except FileNotFoundError:
+        # finish_upload claimed the part (or the session expired) after the session was read
+        raise UploadError("ატვირთვა უკვე დასრულებულია", 409)
+
+
+def write_chunk(media_dir: str, upload_id: str, offset: int, length: int, stream, checksum: str) -> dict:
+    session = _load(media_dir, upload_id)
+    _, part, chunks = _paths(media_dir, upload_id)
+    size, chunk_size = session["size"], session["chunk_size"]
+
+    if offset < 0 or offset >= size or offset % chunk_size or length != min(chunk_size, size - offset):
+        raise UploadError("არასწორი პარამატრებია")
+    if not checksum:
+        raise UploadError("საკონტროლო ჯამი არ არის მითითებული")
+
+    digest = hashlib.sha256()
+    remaining = length
+    fd = _open_session_file(part)
+
+    try:
+        position = offset
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(fd, view, position)
+                view = view[written:]
+                position += written
+            remaining -= len(data)
+    finally:
+        os.close(fd)
+
+    # a bad chunk stays unmarked, the client just sends it again
+    if remaining or digest.hexdigest() != checksum.lower():
+        raise UploadError("საკონტროლო ჯამი არ ემთხვევა", 409)
+
+    index = offset // chunk_size
+    fd = _open_session_file(chunks)
+    try:
+        os.pwrite(fd, b"\x01", index)
+    finally:
+        os.close(fd)
+
+    return {"id": upload_id, "index": index}
+
+
+def _place(part: str, folder: str, filename: str) -> str:
+    # a hard link fails instead of replacing a file that is already there (uploads into
+    # the current directory keep their name), a taken name gets a stamp
+    name, ext = splitext(filename)
+    stamped = slugify(name, use_stamp=True)
+    candidates = [filename] + [f"{stamped}{f'-{i}' if i else ''}{ext}" for i in range(100)]
+
+    for candidate in candidates:
+        try:
+            os.link(part, join(folder, candidate))
+        except FileExistsError:
+            continue
+        _remove(part)
+        return candidate
+
+    raise UploadError("ფაილი ამ სახელით უკვე არსებობს", 409)
+
+
+def finish_upload(media_dir: str, thumb_dir: str, upload_id: str) -> dict:
+    status = upload_status(media_dir, upload_id)
+    meta, part, chunks = _paths(media_dir, upload_id)
+
+    if len(status["received"]) < status["chunks"]:
+        raise UploadError("ფაილი ბოლომდე არ არის ატვირთული", 409)
+
+    rellocation = status["location"]
+    location_media = join(media_dir, rellocation)
+    os.makedirs(location_media, exist_ok=True)
+
+    claimed = part + ".finishing"
+    try:
+        os.rename(part, claimed)
+    except FileNotFoundError:
+        # another request finished it first
+        raise UploadError("ატვირთვა ვერ მოიძებნა", 404)
+
+    try:
+        filename = _place(claimed, location_media, status["filename"])
+    except UploadError:
+        os.rename(claimed, part)
+        raise
+
+    filepath = join(location_media, filename)
+    os.utime(filepath)
+    _remove(meta, chunks)
+    _forget_listing(location_media)
+
+    item = parse_item(filepath, media_dir)
+    thumbs = []
+    if splitext(filename)[1] in THUMB_EXTENSIONS:
+        thumbs.append((filepath, join(thumb_dir, rellocation, filename), item["path"]))
+
+    return {
+        "msg": "ფაილები ატვირთულია",
+        "location": "/" + rellocation,
+        "files": [item],
+        "job": submit_thumbnails(thumbs),
+    }
+
+
+def abort_upload(media_dir: str, upload_id: str):
+    _load(media_dir, upload_id)
+    _remove(*_paths(media_dir, upload_id))
@@ -12,5 +12,9 @@ urlpatterns = [
     path("search", staff_member_required(views.search_view)),
     path("create-directory/", staff_member_required(views.create_dir_view)),
     path("upload-file/", staff_member_required(views.file_upload_view)),
+    path("jobs/<str:job_id>", staff_member_required(views.job_status_view)),
+    path("uploads/", staff_member_required(views.upload_create_view)),
+    path("uploads/<str:upload_id>", staff_member_required(views.upload_view)),
+    path("uploads/<str:upload_id>/finish", staff_member_required(views.upload_finish_view)),
     # path("/file-action/", views.file_action_view),
 ]
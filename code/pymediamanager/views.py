@@ -1,12 +1,15 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.http import JsonResponse, StreamingHttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
 from .base import MediaManager
+from .jobs import get_job
+from .search import SEARCH_LIMIT
+from .uploads import UploadError
 
 MEDIA_DIR = settings.MEDIA_ROOT
 
@@ -42,11 +45,20 @@ def search_view(request):
     q = request.GET.get("q", "")
 
     if len(q) == 0:
-        return {"error": '"q" is empty'}, 422
+        return JsonResponse({"error": '"q" is empty'}, status=422)
 
-    walking = mm.get_search_data(location, q)
+    try:
+        cursor = int(request.GET.get("cursor") or 0)
+        limit = int(request.GET.get("limit") or SEARCH_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "არასწორი პარამატრებია"}, status=422)
+
+    walking = mm.get_search_data(location, q, cursor, limit)
 
-    return StreamingHttpResponse(walking(), content_type="application/json")
+    response = StreamingHttpResponse(walking(), content_type="application/x-ndjson")
+    # let nginx pass the first rows through instead of buffering the whole stream
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @require_http_methods(["POST"])
@@ -78,6 +90,76 @@ def file_upload_view(request):
     return JsonResponse(data)
 
 
+@require_http_methods(["POST"])
+@csrf_exempt
+def upload_create_view(request):
+    location = request.POST.get("location")
+    name = request.POST.get("name")
+    upload_in_current_dir = request.POST.get("upload_in_current_dir") == "on"
+
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        size = 0
+
+    if location is None or not name:
+        return JsonResponse({"error": "არასწორი პარამატრებია"}, status=422)
+
+    try:
+        data = mm.create_upload(location, name, size, upload_in_current_dir)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    return JsonResponse(data, status=201)
+
+
+@require_http_methods(["GET", "PUT", "DELETE"])
+@csrf_exempt
+def upload_view(request, upload_id: str):
+    try:
+        if request.method == "GET":
+            return JsonResponse(mm.upload_status(upload_id))
+
+        if request.method == "DELETE":
+            mm.abort_upload(upload_id)
+            return HttpResponse(status=204)
+
+        try:
+            offset = int(request.GET.get("offset", ""))
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return JsonResponse({"error": "არასწორი პარამატრებია"}, status=422)
+
+        # the body is streamed straight into the file, never buffered whole
+        checksum = request.headers.get("X-Checksum-Sha256", "")
+        data = mm.write_chunk(upload_id, offset, length, request, checksum)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    return JsonResponse(data)
+
+
+@require_http_methods(["POST"])
+@csrf_exempt
+def upload_finish_view(request, upload_id: str):
+    try:
+        data = mm.finish_upload(upload_id)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    return JsonResponse(data)
+
+
+@require_http_methods(["GET"])
+def job_status_view(request, job_id: str):
+    job = get_job(job_id)
+
+    if job is None:
+        return JsonResponse({"error": "ვერ მოიძებნა"}, status=404)
+
+    return JsonResponse(job)
+
+
 @require_http_methods(["PUT"])
 def file_action_view(request):
     return {}
@@ -67,10 +67,10 @@ def url_beautify(url: str) -> str:
     return url
 
 
-def striptags(text: str) -> str:
+def striptags(text: str, repl: str = "") -> str:
     try:
         regex = r"(<([^>]+)>)"
-        return re.sub(regex, "", text).strip()
+        return re.sub(regex, repl, text).strip()
     except Exception:
         return text
 
@@ -0,0 +1,26 @@
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(values, list) or len(values) != size:
+        return None
+
+    return values
+
+
+def clamp_limit(limit: int, default: int = 20, maximum: int = 100) -> int:
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
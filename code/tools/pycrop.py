@@ -1,9 +1,12 @@
 import os
 import re
 from math import floor
+from typing import NamedTuple, Optional
 
 from PIL import Image
 
+JPEG_OPTIONS = {"subsampling": 0, "optimize": True}
+
 
 def default_save_path(path, size):
     savepath, ext = os.path.splitext(path)
@@ -62,42 +65,125 @@ def adjust_coords(coords, size, point):
     return tuple(floor(sum(coord)) for coord in zip(coords, 2 * vec))
 
 
-def cover(path, size, point, savepath=None, quality=90):
+# decode at least this many times the largest output, like Image.thumbnail does,
+# so the final LANCZOS pass still has enough pixels to work with
+REDUCING_GAP = 2.0
+
+
+class Rendition(NamedTuple):
+    savepath: str
+    size: tuple
+    # cover - fill `size` and crop around `point`, contain - fit inside `size`,
+    # thumb - like contain but never upscale
+    mode: str = "contain"
+    point: tuple = (50, 50)
+    format: Optional[str] = None
+    quality: int = 90
+    options: Optional[dict] = None
+
+
+def get_scaled_size(rendition: Rendition, img_size):
+    size = normilize_size(rendition.size, img_size)
+
+    if rendition.mode == "cover":
+        return get_cover_size(img_size, size)
+
+    scaled = get_contain_size(img_size, size)
+    if rendition.mode == "thumb" and scaled[0] > img_size[0]:
+        return tuple(img_size)
+    return tuple(max(s, 1) for s in scaled)
+
+
+def open_reduced(img: Image.Image, need) -> Image.Image:
+    want = (int(need[0] * REDUCING_GAP), int(need[1] * REDUCING_GAP))
+
+    # JPEG decodes straight to 1/2, 1/4 or 1/8 scale without touching every pixel
+    img.draft(None, want)
+    img.load()
+
+    factor = min(img.width // max(want[0], 1), img.height // max(want[1], 1))
+    if factor > 1 and img.mode not in ("1", "P"):
+        return img.reduce(factor)
+    return img
+
+
+def save_rendition(img: Image.Image, rendition: Rendition):
+    assure_path_exists(os.path.dirname(rendition.savepath))
+
+    ext = os.path.splitext(rendition.savepath)[1].lower()
+    format = rendition.format or Image.registered_extensions().get(ext)
+
+    if format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif format == "WEBP" and img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+    img.save(rendition.savepath, format, quality=rendition.quality, **(rendition.options or {}))
+
+
+def _closest(sources: list, size):
+    # smallest already resized image that still covers `size`
+    for img in reversed(sources):
+        if img.width >= size[0] and img.height >= size[1]:
+            return img
+    return sources[0]
+
+
+def render(path, renditions: list) -> list:
+    """
+    Produce every rendition of `path` from a single decode, sized for the
+    largest one. Smaller renditions are resized from the closest larger
+    intermediate instead of the full frame. Returns (savepath, size) pairs
+    in the given order.
+    """
+    results = {}
+
     with Image.open(path) as img:
-        size = normilize_size(size, img.size)
+        img_size = img.size
+        plans = [(i, r, get_scaled_size(r, img_size)) for i, r in enumerate(renditions)]
+        plans.sort(key=lambda p: p[2][0] * p[2][1], reverse=True)
+        need = (max(s[0] for _, _, s in plans), max(s[1] for _, _, s in plans))
 
-        if savepath is None:
-            savepath = default_save_path(path, size)
-        assure_path_exists(os.path.dirname(savepath))
+        sources = [open_reduced(img, need)]
 
-        cover_size = get_cover_size(img.size, size)
+        for i, rendition, scaled in plans:
+            source = _closest(sources, scaled)
+            out = source
+            if source.size != scaled:
+                out = source.resize(scaled, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+                sources.append(out)
 
-        coords = get_coords_from_center(cover_size, size)
-        coords = adjust_coords(coords, cover_size, point)
+            if rendition.mode == "cover":
+                size = normilize_size(rendition.size, img_size)
+                coords = get_coords_from_center(scaled, size)
+                out = out.crop(adjust_coords(coords, scaled, rendition.point))
 
-        img = img.resize(cover_size, Image.ANTIALIAS)
-        img = img.crop(coords)
+            save_rendition(out, rendition)
+            results[i] = (rendition.savepath, out.size)
 
-        img.save(savepath, subsampling=0, quality=quality, optimize=True)
-        return (True, savepath)
-    return (False, "")
+    return [results[i] for i in range(len(renditions))]
 
 
-def contain(path, size, savepath=None, quality=90):
+def cover(path, size, point, savepath=None, quality=90):
     with Image.open(path) as img:
         size = normilize_size(size, img.size)
 
-        if savepath is None:
-            savepath = default_save_path(path, size)
-        assure_path_exists(os.path.dirname(savepath))
+    if savepath is None:
+        savepath = default_save_path(path, size)
+
+    render(path, [Rendition(savepath, size, "cover", point, quality=quality, options=JPEG_OPTIONS)])
+    return (True, savepath)
+
 
-        contain_size = get_contain_size(img.size, size)
-        img = img.resize(contain_size, Image.ANTIALIAS)
+def contain(path, size, savepath=None, quality=90):
+    with Image.open(path) as img:
+        size = normilize_size(size, img.size)
 
-        img.save(savepath, subsampling=0, quality=quality, optimize=True)
+    if savepath is None:
+        savepath = default_save_path(path, size)
 
-        return (True, savepath)
-    return (False, "")
+    render(path, [Rendition(savepath, size, "contain", quality=quality, options=JPEG_OPTIONS)])
+    return (True, savepath)
 
 
 if __name__ == "__main__":
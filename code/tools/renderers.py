@@ -0,0 +1,55 @@
+import msgpack
+import orjson
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+__all__ = ["ORJSONRenderer", "MessagePackRenderer", "content_type", "negotiate"]
+
+# datetimes go through the Django encoder too, so both renderers match the old output
+_encoder = NinjaJSONEncoder()
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data) -> bytes:
+        return orjson.dumps(data, default=_default, option=self.options)
+
+    def render(self, request, data, *, response_status: int) -> bytes:
+        return self.dumps(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    # binary, a charset parameter would be meaningless
+    charset = None
+
+    def dumps(self, data) -> bytes:
+        return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
+
+    def render(self, request, data, *, response_status: int) -> bytes:
+        return self.dumps(data)
+
+
+JSON = ORJSONRenderer()
+MSGPACK = MessagePackRenderer()
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def negotiate(request) -> BaseRenderer:
+    accept = request.headers.get("Accept", "") if request is not None else ""
+    if any(media_type in accept for media_type in MSGPACK_TYPES):
+        return MSGPACK
+    return JSON
+
+
+def content_type(renderer: BaseRenderer) -> str:
+    if renderer.charset:
+        return f"{renderer.media_type}; charset={renderer.charset}"
+    return renderer.media_type
@@ -0,0 +1,12 @@
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler as BaseTemporaryFileUploadHandler
+
+
+class TemporaryFileUploadHandler(BaseTemporaryFileUploadHandler):
+    # FILE_UPLOAD_TEMP_DIR lives on the media mount, which may be empty on a fresh deploy
+    def new_file(self, *args, **kwargs):
+        if settings.FILE_UPLOAD_TEMP_DIR:
+            os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+        super().new_file(*args, **kwargs)